@@ -0,0 +1,179 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+
+log = logging.getLogger(__name__)
+
+DEFAULT_BUDGET_BYTES = 64 * 1024 * 1024
+
+DECODE_SECONDS = metrics.histogram("rift_decode_seconds", "Clip decode time, on a playback miss or while preloading", ("when",))
+
+
+def source_size(source):
+    """Best-effort size in bytes of a decoded clip."""
+    nbytes = getattr(source, "nbytes", None)
+    if nbytes is not None:
+        return nbytes
+    data = getattr(source, "_data", None)
+    if data is not None:
+        return len(data)
+    fmt = getattr(source, "audio_format", None)
+    duration = getattr(source, "duration", None) or 0.0
+    if fmt is None:
+        return 0
+    return int(duration * fmt.sample_rate * fmt.channels * fmt.sample_size // 8)
+
+
+class AudioCache:
+    """
+    LRU cache of decoded voice-pack clips, bounded by a memory budget.
+    The loader does the actual decoding, so this module stays free of pyglet.
+    """
+    def __init__(self, loader, budget_bytes=DEFAULT_BUDGET_BYTES, sizeof=source_size):
+        self.loader = loader
+        self.sizeof = sizeof
+        self.budget_bytes = budget_bytes
+        self.entries = OrderedDict()  # path -> (source, size)
+        self.used_bytes = 0
+        self.lock = threading.Lock()
+        self.pinned = set()  # warmed ahead of playing (see warm), never evicted
+
+        # Counters (playback lookups only, preloading doesn't count as a miss)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.preloaded = 0
+
+        # Bumped on every preload/clear so a stale preload thread stops early
+        self.generation = 0
+
+    def get(self, path):
+        """Returns the decoded clip for path, decoding it on a miss. Loader errors propagate."""
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is not None:
+                self.entries.move_to_end(path)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        start = time.perf_counter()
+        source = self.loader(path)
+        DECODE_SECONDS.labels("miss").observe(time.perf_counter() - start)
+        self._store(path, source)
+        return source
+
+    def warm(self, path):
+        """Decodes path if it isn't cached yet and keeps it from being evicted until unpin(). True if it had to decode."""
+        with self.lock:
+            self.pinned.add(path)
+            if path in self.entries: return False
+        start = time.perf_counter()
+        source = self.loader(path)
+        DECODE_SECONDS.labels("warm").observe(time.perf_counter() - start)
+        self._store(path, source)
+        return True
+
+    def unpin(self, path):
+        with self.lock:
+            self.pinned.discard(path)
+
+    def peek(self, path):
+        """Returns the cached clip or None, without touching counters or disk."""
+        with self.lock:
+            entry = self.entries.get(path)
+            return entry[0] if entry else None
+
+    def _store(self, path, source):
+        size = self.sizeof(source)
+        with self.lock:
+            old = self.entries.pop(path, None)
+            if old is not None:
+                self.used_bytes -= old[1]
+            self.entries[path] = (source, size)
+            self.used_bytes += size
+            # Evict least recently used, but never the entry we just stored or a warmed one
+            if self.used_bytes > self.budget_bytes:
+                for victim in list(self.entries):
+                    if self.used_bytes <= self.budget_bytes: break
+                    if victim == path or victim in self.pinned: continue
+                    self.used_bytes -= self.entries.pop(victim)[1]
+                    self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.pinned.clear()
+            self.used_bytes = 0
+            self.generation += 1
+
+    def preload(self, paths, on_done=None):
+        """Decodes paths on a background thread. A newer preload/clear cancels this one."""
+        with self.lock:
+            self.generation += 1
+            generation = self.generation
+
+        thread = threading.Thread(target=self._preload_worker, args=(list(paths), generation, on_done), daemon=True)
+        thread.start()
+        return thread
+
+    def _preload_worker(self, paths, generation, on_done):
+        start = time.perf_counter()
+        decode = DECODE_SECONDS.labels("preload")
+        loaded, missing = 0, []
+        for path in paths:
+            if self.generation != generation:
+                return
+            if self.peek(path) is not None:
+                continue
+            try:
+                began = time.perf_counter()
+                source = self.loader(path)
+                decode.observe(time.perf_counter() - began)
+            except FileNotFoundError:
+                missing.append(path)
+                continue
+            except Exception as e:
+                log.warning("[Cache] Failed to decode %s: %s", os.path.basename(path), e)
+                continue
+            if self.generation != generation:
+                return
+            self._store(path, source)
+            loaded += 1
+
+        with self.lock:
+            self.preloaded += loaded
+        elapsed = time.perf_counter() - start
+        log.info("[Cache] Preloaded %d clips (%.1f MB) in %.2fs", loaded, self.used_bytes / 1048576, elapsed)
+        for path in missing:
+            log.warning("[Cache] Missing: %s", os.path.basename(path))
+        if on_done:
+            on_done(loaded, missing)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "preloaded": self.preloaded,
+                "entries": len(self.entries),
+                "used_bytes": self.used_bytes,
+                "budget_bytes": self.budget_bytes,
+            }
+
+
+def pack_paths(pack_path, event_map):
+    """All clip paths the event map references inside a pack folder."""
+    paths = []
+    for sounds in event_map.values():
+        if not isinstance(sounds, dict): continue
+        for filename in sounds.values():
+            # Skips non-sound sections such as "scheduling"
+            if isinstance(filename, str):
+                paths.append(os.path.join(pack_path, filename))
+    return paths
@@ -0,0 +1,535 @@
+"""
+Announcer audio engine shared by the GUI and the headless entry point: priority queue,
+decoded-clip cache, and either the software mixer or one pyglet Player per clip.
+
+Nothing heavy is imported at module level; pyglet and numpy load when the engine is
+built with an output that needs them.
+"""
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+import logs
+import metrics
+from audio_cache import AudioCache
+from audio_queue import AnnouncementQueue
+from loudness import load_gains, update_index
+from pack_index import PackIndex, report_coverage
+from voice_pack import COMPILED_NAME, open_current
+
+ASSETS_DIR = "assets"
+CONFIG_FILE = "events.json"
+AUDIO_CACHE_MB = 64
+WAKE_SLACK = 0.01  # step just after a clip ends, not just before
+WARM_LINGER = 10.0  # a clip stays warm this long after it stops being expected: what fired it is still queued
+
+log = logging.getLogger(__name__)
+
+QUEUE_DEPTH = metrics.gauge("rift_audio_queue_depth", "Announcements waiting to play")
+QUEUE_WAIT = metrics.histogram("rift_audio_queue_wait_seconds", "Time from trigger to the clip starting")
+PLAY_SECONDS = metrics.histogram("rift_audio_play_seconds", "Time to load and start a clip", ("output",))
+CLIPS = metrics.counter("rift_audio_clips_total", "Announcements taken off the queue, by outcome", ("outcome",))
+WARMUP = metrics.counter("rift_warmup_total", "Clips started, by how ready they were: predicted (warmed ahead), "
+                         "cached, mapped (compiled pack) or cold", ("state",))
+WARM_CLIPS = metrics.gauge("rift_warm_clips", "Clips currently warmed ahead of an expected announcement")
+WARM_STATES = ("predicted", "cached", "mapped", "cold")
+
+
+def load_event_map(path=CONFIG_FILE):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except:
+        return {}
+
+
+def load_static_source(path):
+    import pyglet
+    return pyglet.media.load(path, streaming=False)
+
+
+def pcm_source(pcm, channels, sample_width, rate):
+    """pyglet source reading a compiled pack clip straight from its memoryview (one per play)."""
+    from pyglet.media.codecs.base import AudioData, AudioFormat, StreamingSource
+
+    class PcmSource(StreamingSource):
+        def __init__(self):
+            self.audio_format = AudioFormat(channels=channels, sample_size=sample_width * 8, sample_rate=rate)
+            self.video_format = None
+            self._duration = len(pcm) / float(self.audio_format.bytes_per_second)
+            self.position = 0
+
+        def is_precise(self):
+            return True
+
+        def seek(self, timestamp):
+            frame = self.audio_format.bytes_per_frame
+            offset = int(timestamp * self.audio_format.bytes_per_second) // frame * frame
+            self.position = min(max(offset, 0), len(pcm))
+
+        def get_audio_data(self, num_bytes, compensation_time=0.0):
+            if self.position >= len(pcm): return None
+            frame = self.audio_format.bytes_per_frame
+            end = min(self.position + max(int(num_bytes) // frame, 1) * frame, len(pcm))
+            data = bytes(pcm[self.position:end])
+            self.position = end
+            return AudioData(data, len(data))
+
+    return PcmSource()
+
+
+class WaveClip:
+    """Decoded clip for the null sink: raw frames plus duration, no pyglet/numpy needed."""
+    def __init__(self, path):
+        import wave
+        with wave.open(path, "rb") as w:
+            self._data = w.readframes(w.getnframes())
+            self.duration = w.getnframes() / float(w.getframerate())
+
+
+class PcmClip:
+    """Null-sink clip over a slice of a compiled pack."""
+    def __init__(self, pcm, bytes_per_second):
+        self._data = pcm
+        self.duration = len(pcm) / float(bytes_per_second)
+
+
+class LoopStats:
+    """
+    Wakeups of an event-driven audio/UI loop, by reason, and the CPU the whole process
+    used while the loop had nothing scheduled (waiting for the next trigger).
+    """
+    def __init__(self):
+        self.wakeups = {}
+        self.started = time.monotonic()
+        self.idle_since = None
+        self.idle_cpu_at = 0.0
+        self.idle_wall = 0.0
+        self.idle_cpu = 0.0
+
+    def wake(self, reason):
+        self.wakeups[reason] = self.wakeups.get(reason, 0) + 1
+        if self.idle_since is not None:
+            self.idle_wall += time.monotonic() - self.idle_since
+            self.idle_cpu += time.process_time() - self.idle_cpu_at
+            self.idle_since = None
+
+    def sleep(self, idle):
+        """Call before waiting; idle means nothing is scheduled, only new work wakes the loop."""
+        if idle and self.idle_since is None:
+            self.idle_since, self.idle_cpu_at = time.monotonic(), time.process_time()
+
+    def summary(self):
+        self.wake("exit")
+        wall = max(time.monotonic() - self.started, 1e-9)
+        total = sum(self.wakeups.values())
+        reasons = ", ".join(f"{r} {n}" for r, n in sorted(self.wakeups.items()))
+        idle_pct = 100.0 * self.idle_cpu / self.idle_wall if self.idle_wall else 0.0
+        return (f"Wakeups: {total} ({total / wall:.2f}/s: {reasons}) | "
+                f"Idle CPU: {idle_pct:.2f}% over {self.idle_wall:.0f}s idle")
+
+
+class AudioEngine:
+    """
+    output="pyglet" plays through the sound card, output="null" only keeps time
+    (headless smoke runs, benchmarks). use_mixer falls back to sequential players
+    when numpy is missing. analysis_workers is passed to loudness.update_index; 1 keeps
+    the analysis in-process (a daemon process such as the audio worker can't start a pool).
+    packs shares the caller's PackIndex of the assets folder instead of building another.
+    """
+    def __init__(self, event_map, use_mixer=True, output="pyglet", cache_mb=AUDIO_CACHE_MB, analysis_workers=None,
+                 packs=None):
+        self.event_map = event_map
+        self.output = output
+        self.queue = AnnouncementQueue(event_map.get("scheduling"))
+        self.pack_path = ""
+        self.pack = None  # compiled VoicePack for pack_path, if one is up to date
+        self.packs = packs or PackIndex(ASSETS_DIR, event_map)
+        self.pack_files = frozenset()  # files in pack_path, from the index
+        self.gains = {}   # filename -> linear gain from the pack's loudness sidecar
+        self.analysis_workers = analysis_workers
+        self.volume = 1.0
+        self.muted = False
+        self.on_wake = None  # called from any thread when step() has new work (see step)
+
+        # Predictive warm-up (see warmup.py): sounds expected soon, their files, the files ready.
+        # Only the engine's own thread (step/set_pack) touches this state; prepare() just
+        # leaves the latest list in `wanted` and warm_up threads report back through warm_done.
+        self.wanted = self.prepared = ()
+        self.warm = frozenset()
+        self.warmed = set()
+        self.lingering = {}  # no longer expected, released at this monotonic time or once played
+        self.warm_done = queue.SimpleQueue()  # (generation, filename) from warm_up threads
+        self.warm_generation = 0  # bumped by set_pack, so late results for the old pack are dropped
+        self.warm_stats = dict.fromkeys(WARM_STATES + ("warmed", "released"), 0)
+        WARM_CLIPS.set_function(lambda: len(self.warmed))
+
+        self.mixer = None
+        if use_mixer:
+            try:
+                from mixer import Mixer
+                self.mixer = Mixer()
+            except ImportError:  # numpy missing: fall back to one pyglet Player per clip
+                log.warning("[Audio] numpy not available, using one player per clip")
+
+        self.player = None
+        self.stream = None
+        if self.mixer:
+            from mixer import decode_wav
+            loader = decode_wav
+            if output == "pyglet":
+                import pyglet
+                from mixer import make_stream_source
+                # One endless stream for the whole session, every clip is mixed into it
+                self.player = pyglet.media.Player()
+                self.stream = make_stream_source(self.mixer)
+                self.player.queue(self.stream)
+                self.player.play()
+        else:
+            loader = load_static_source if output == "pyglet" else WaveClip
+        self.cache = AudioCache(loader, budget_bytes=cache_mb * 1024 * 1024)
+        QUEUE_DEPTH.set_function(self.queue.qsize)
+        self.play_seconds = PLAY_SECONDS.labels("mixer" if self.mixer else output)
+
+        # Sequential path: time-based busy check
+        self.busy_until = 0.0
+        self.playing_priority = None
+        self.playing_gain = 1.0
+        self.last_step = time.time()
+
+    # --- CONTROL ---
+    def set_pack(self, pack_path):
+        self.pack_path = pack_path
+        if self.pack is not None:
+            self.pack.close()
+            self.pack = None
+        self.cache.clear()
+        self.warm, self.warmed, self.lingering = frozenset(), set(), {}
+        self.warm_generation += 1
+        folder, name = os.path.split(pack_path)
+        if folder != self.packs.assets_dir:
+            self.packs = PackIndex(folder, self.event_map)
+        info = self.packs.pack(name)
+        if info is None:
+            log.warning("[Pack] No voice pack at %s", pack_path)
+            self.pack, self.pack_files, self.gains = None, frozenset(), {}
+            return
+        self.pack_files = info.files
+        report_coverage(info)
+        self.gains = load_gains(pack_path)
+        threading.Thread(target=self.refresh_gains, args=(pack_path, info.present), daemon=True).start()
+        # Compiled pack: clips are slices of one mmap, nothing to decode up front
+        self.pack = open_current(pack_path, self.event_map)
+        self.expect(self.prepared)
+        if self.pack:
+            log.info("[Audio] Mapped %s (%d clips)", os.path.basename(pack_path), len(self.pack.clips))
+            return
+        if COMPILED_NAME in info.files:
+            log.warning("[Audio] Compiled pack is out of date, using loose files (run voice_pack.py compile)")
+        # Decode the whole pack up front so playback never waits on disk
+        self.cache.preload([os.path.join(pack_path, f) for f in info.present])
+
+    def refresh_gains(self, pack_path, filenames):
+        """Analyses clips the loudness sidecar doesn't cover yet (new or edited files)."""
+        try:
+            import numpy  # decoding for analysis needs it, without it clips play unlevelled
+        except ImportError:
+            return
+        try:
+            _, analysed = update_index(pack_path, filenames, self.analysis_workers)
+        except Exception as e:
+            log.warning("[Loudness] Analysis failed: %s", e)
+            return
+        if analysed and self.pack_path == pack_path:
+            self.gains = load_gains(pack_path)
+            log.info("[Loudness] Levelled %d clips in %s", analysed, os.path.basename(pack_path))
+
+    def prepare(self, sounds):
+        """
+        Asks for the clips of sounds expected soon (see warmup.py) to be warmed. Safe from
+        any thread (the backend calls it): the engine's thread takes the latest list on
+        its next step, the same wakeup a trigger uses.
+        """
+        self.wanted = tuple(sounds)
+        self.notify()
+
+    def update_warm(self):
+        """Engine thread: applies a new prepare() list and takes in clips that finished warming."""
+        if self.wanted is not self.prepared:
+            self.expect(self.wanted)
+        while True:
+            try:
+                generation, filename = self.warm_done.get_nowait()
+            except queue.Empty:
+                return
+            if generation != self.warm_generation: continue  # set_pack cleared the cache and its pins
+            if filename not in self.warm and filename not in self.lingering:
+                self.cache.unpin(os.path.join(self.pack_path, filename))  # released while it was loading
+                continue
+            self.warmed.add(filename)
+            self.warm_stats["warmed"] += 1
+            log.debug("[Warmup] Ready: %s", filename)
+
+    def expect(self, sounds):
+        """Warms the files of sounds on a background thread and releases the ones no longer expected."""
+        self.prepared = sounds
+        wanted = (self.event_map.get(category, {}).get(key) for category, key in sounds)
+        files = frozenset(f for f in wanted if f in self.pack_files)
+        now = time.monotonic()
+        for filename in self.warm - files:
+            self.lingering[filename] = now + WARM_LINGER
+        for filename, until in list(self.lingering.items()):
+            if filename in files: del self.lingering[filename]
+            elif until <= now: self.release(filename)
+        new = files - self.warm - self.warmed
+        self.warm = files
+        if new:
+            threading.Thread(target=self.warm_up, args=(self.warm_generation, self.pack_path, self.pack, sorted(new)),
+                             daemon=True).start()
+
+    def warm_up(self, generation, pack_path, pack, filenames):
+        for filename in filenames:
+            try:
+                # Compiled pack: fault the clip's pages in; loose files: decode into the cache, pinned
+                if pack is not None: pack.warm(filename)
+                else: self.cache.warm(os.path.join(pack_path, filename))
+            except Exception as e:
+                log.debug("[Warmup] Could not warm %s: %s", filename, e)
+                continue
+            self.warm_done.put((generation, filename))
+
+    def release(self, filename):
+        self.lingering.pop(filename, None)
+        self.cache.unpin(os.path.join(self.pack_path, filename))
+        if filename in self.warmed:
+            self.warmed.discard(filename)
+            self.warm_stats["released"] += 1
+
+    def warm_state(self, filename):
+        """How ready a clip is as it starts: predicted, cached, mapped (compiled pack) or cold."""
+        if filename in self.warmed: return "predicted"
+        if self.pack is not None: return "mapped"
+        return "cached" if self.cache.peek(os.path.join(self.pack_path, filename)) is not None else "cold"
+
+    def load_clip(self, filename):
+        """Decoded clip for a pack file: a view into the compiled pack, else from the cache."""
+        pack = self.pack
+        pcm = pack.file_pcm(filename) if pack else None
+        if pcm is None:
+            return self.cache.get(os.path.join(self.pack_path, filename))
+        if self.mixer:
+            from mixer import pcm16_clip
+            return pcm16_clip(pcm, pack.channels)
+        if self.output != "pyglet":
+            return PcmClip(pcm, pack.bytes_per_second)
+        return pcm_source(pcm, pack.channels, pack.sample_width, pack.rate)
+
+    def set_volume(self, volume):
+        self.volume = float(volume)
+        if self.mixer:
+            self.mixer.master_volume = self.volume
+            return
+        # Try to update current player if it exists
+        try:
+            self.player.volume = self.volume * self.playing_gain
+        except: pass
+
+    def set_muted(self, muted):
+        self.muted = muted
+        if self.mixer:
+            self.mixer.muted = muted
+        if muted:
+            if self.mixer:
+                self.mixer.stop_all()
+            else:
+                try:
+                    self.player.pause()
+                except: pass
+            self.queue.clear()
+            self.busy_until = 0
+
+    def trigger(self, category, key):
+        if self.muted: return
+        if self.queue.put(category, key):
+            log.debug("[Queue] Added: %s", key)
+            self.notify()
+        else:
+            log.debug("[Queue] Merged: %s", key)
+
+    def notify(self):
+        if self.on_wake:
+            self.on_wake()
+
+    # --- WORKER ---
+    def step(self):
+        """
+        One worker tick: starts whatever the queue allows right now. Returns the seconds
+        until the next tick is needed (a clip ends and frees the way for queued ones),
+        or None when idle: then only on_wake (a new trigger) calls for another one.
+        """
+        now = time.time()
+        elapsed, self.last_step = now - self.last_step, now
+        self.update_warm()
+        if self.output == "pyglet":
+            import pyglet
+            # Important: Pump pyglet events to keep driver alive
+            pyglet.clock.tick()
+        if self.mixer:
+            if self.stream is None:
+                # Null output: advance the voices by the time that passed
+                self.mixer.advance(max(int(elapsed * self.mixer.rate), 1))
+            self.mix_step()
+            left = self.mixer.next_end()
+        else:
+            self.play_step(now)
+            if now < self.busy_until: left = self.busy_until - now
+            else: left = 0.0 if self.queue.qsize() and not self.muted else None  # one clip per tick
+        return None if left is None else left + WAKE_SLACK
+
+    def mix_step(self):
+        """
+        Mixer path: clips overlap instead of waiting, a more important one ducks the rest.
+        """
+        if self.muted: return
+        while True:
+            floor = self.mixer.start_floor()
+            if floor is None:
+                # All voices busy: only something much more important may cut the least one
+                if not self.queue.should_preempt(self.mixer.lowest_priority()): return
+                self.mixer.stop_lowest()
+                log.debug("[Audio] Preempted current clip")
+                continue
+
+            item = self.queue.get(min_priority=floor)
+            if not item: return
+            filename = self.event_map.get(item.category, {}).get(item.key)
+            # Gaps in the pack were reported when it was selected
+            if not filename or filename not in self.pack_files:
+                CLIPS.labels("missing").inc()
+                continue
+            try:
+                start, state = time.perf_counter(), self.warm_state(filename)
+                clip = self.load_clip(filename)
+                self.mixer.play(clip, item.priority, gain=self.gains.get(filename, 1.0), key=item.key)
+                self.played(item, filename, start, state)
+                log.debug("[Audio] Mixing: %s%s (%.2fs, %d voices)", item.key, f" x{item.count}" if item.count > 1 else "",
+                          clip.duration, self.mixer.active())
+            except FileNotFoundError:
+                CLIPS.labels("missing").inc()
+                log.error("[Audio Error] File Missing: %s", filename)
+            except Exception as e:
+                CLIPS.labels("failed").inc()
+                log.error("[Audio Error] Failed to play %s: %s", item.key, e)
+
+    def play_step(self, now):
+        """
+        Fallback path without the mixer: one fresh Player per sound, played sequentially.
+        """
+        # A much more important clip waiting (ace, pentakill...) cuts the current one
+        if not self.muted and now < self.busy_until and self.queue.should_preempt(self.playing_priority):
+            try: self.player.pause()
+            except: pass
+            log.debug("[Audio] Preempted current clip")
+            self.busy_until = now
+
+        # Only process if we are past the busy time
+        if self.muted or now < self.busy_until: return
+        item = self.queue.get()
+        if not item: return
+
+        key = item.key
+        filename = self.event_map.get(item.category, {}).get(key)
+        if not filename or filename not in self.pack_files:
+            CLIPS.labels("missing").inc()
+            return
+        try:
+            # Decoded clips come from the compiled pack or the cache (filled on pack switch)
+            start, state = time.perf_counter(), self.warm_state(filename)
+            source = self.load_clip(filename)
+            self.start_player(source, self.gains.get(filename, 1.0))
+            self.played(item, filename, start, state)
+            self.playing_priority = item.priority
+
+            # Block queue for duration
+            duration = source.duration
+            if duration is None: duration = 1.0
+
+            self.busy_until = now + duration + 0.1
+            log.debug("[Audio] Playing: %s%s (%.2fs)", key, f" x{item.count}" if item.count > 1 else "", duration)
+
+        except FileNotFoundError:
+            CLIPS.labels("missing").inc()
+            log.error("[Audio Error] File Missing: %s", filename)
+            self.busy_until = now
+        except Exception as e:
+            CLIPS.labels("failed").inc()
+            log.error("[Audio Error] Failed to play %s: %s", key, e)
+            self.busy_until = now
+
+    def played(self, item, filename, start, state):
+        """Metrics for a clip that just started; start is when loading it began (perf_counter)."""
+        took = time.perf_counter() - start
+        waited = self.queue.clock() - item.queued_at
+        self.play_seconds.observe(took)
+        QUEUE_WAIT.observe(waited)
+        CLIPS.labels("played").inc()
+        WARMUP.labels(state).inc()
+        self.warm_stats[state] += 1
+        if filename in self.lingering:
+            self.release(filename)  # fired, no longer expected
+        logs.trace("clip", key=item.key, count=item.count, wait_ms=round(waited * 1000.0, 2), play_ms=round(took * 1000.0, 3),
+                   warm=state)
+
+    def start_player(self, source, gain=1.0):
+        self.playing_gain = gain
+        if self.output != "pyglet": return
+        import pyglet
+        # FIX: CREATE A FRESH PLAYER FOR EVERY SOUND
+        # This ensures no "zombie" state from previous plays.
+        new_player = pyglet.media.Player()
+        new_player.queue(source)
+        new_player.volume = self.volume * gain
+        new_player.play()
+
+        # Update global ref so Mute/Volume controls work on it
+        self.player = new_player
+
+    def play_now(self, path):
+        """Plays a file immediately, cutting whatever is playing (test button)."""
+        filename = os.path.basename(path)
+        if os.path.dirname(path) == self.pack_path:
+            source = self.load_clip(filename)
+        else:
+            source = self.cache.get(path)
+        gain = self.gains.get(filename, 1.0)
+        if self.mixer:
+            self.mixer.stop_all()
+            self.mixer.play(source, gain=gain, key=filename)
+            self.notify()
+            return
+        # Stop old if playing
+        try: self.player.pause()
+        except: pass
+        self.start_player(source, gain)
+        self.playing_priority = None
+
+        # Set busy
+        duration = source.duration
+        if duration is None: duration = 1.0
+        self.busy_until = time.time() + duration + 0.1
+        self.notify()
+
+    def log_stats(self):
+        stats = self.cache.stats()
+        log.info("[Cache] Hits: %d | Misses: %d | Evictions: %d", stats["hits"], stats["misses"], stats["evictions"])
+        if self.mixer:
+            mixed = self.mixer.stats()
+            log.info("[Mixer] Clips: %d | Mixed: %.0fs", mixed["started"], mixed["seconds_mixed"])
+        dropped = self.queue.stats()
+        log.info("[Queue] Dropped: %s", ", ".join(f"{reason} {n}" for reason, n in dropped.items() if reason != "pending"))
+        w = self.warm_stats
+        log.info("[Warmup] Started: %d warmed ahead, %d cached, %d mapped, %d cold | Warmed %d, released %d",
+                 w["predicted"], w["cached"], w["mapped"], w["cold"], w["warmed"], w["released"])
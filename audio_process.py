@@ -0,0 +1,393 @@
+"""
+Audio engine in its own process, so Tk, the poller's JSON parsing and the GIL can't hold
+up playback.
+
+The UI side (AudioProcess) has the same surface as AudioEngine. Commands go to the
+worker through a single-producer / single-consumer ring in shared memory; health
+reports come back through a second ring. Each ring index is written by exactly one
+process, so the rings need no lock between processes; AudioProcess.send takes one only
+so that its own threads (Tk, backend, hub) count as a single producer. The worker sleeps on a doorbell event between commands
+(and clip ends), so an idle audio process costs nothing but its once-a-second report.
+
+Ring layout: head (u64, producer) and tail (u64, consumer) on separate cache lines,
+then the data area holding [u32 length][payload] records. A record that doesn't fit
+before the end wraps to the start behind a WRAP marker.
+
+    python audio_process.py check ["The Ancient Archmage"]
+    python audio_process.py senders [--threads 4] [--count 20000]
+
+check selects a copy of the pack without its loudness sidecar in a worker (null output)
+and fails unless every clip gets analysed there. senders floods the command ring from
+several threads at once and fails unless the worker receives every command.
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import signal
+import struct
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing import shared_memory
+
+import logs
+import metrics
+
+log = logging.getLogger(__name__)
+
+RING_HEADER = 128
+HEAD_OFFSET = 0
+TAIL_OFFSET = 64
+WRAP = 0xFFFFFFFF
+COMMAND_RING_BYTES = 64 * 1024
+REPORT_RING_BYTES = 16 * 1024
+
+REPORT_SECONDS = 1.0
+STALL_SECONDS = 2.5           # no report for this long = audio process stalled
+CHECK_TIMEOUT = 60.0
+SENDER_THREADS = 4
+SENDER_COMMANDS = 20000
+
+U64 = struct.Struct("<Q")
+U32 = struct.Struct("<I")
+
+# Decode/play timings are recorded inside the audio process; this side exports its reports
+HEALTH = metrics.gauge("rift_audio_process_health", "Latest health report from the audio process", ("field",))
+HEALTH_FIELDS = ("commands", "command_ms_p50", "command_ms_max", "step_ms_p95", "step_ms_max", "voices", "clips", "wakeups")
+
+
+class ShmRing:
+    """SPSC byte-record ring over a SharedMemory block. put() and get() never block."""
+    def __init__(self, shm):
+        self.shm = shm
+        self.buf = shm.buf
+        self.capacity = shm.size - RING_HEADER
+        self.full = 0  # put() calls rejected because the consumer is behind
+
+    @classmethod
+    def create(cls, size):
+        shm = shared_memory.SharedMemory(create=True, size=RING_HEADER + size)
+        shm.buf[:RING_HEADER] = bytes(RING_HEADER)
+        return cls(shm)
+
+    @classmethod
+    def attach(cls, name):
+        # Children share the creator's resource tracker, so the block is unlinked once, by the creator
+        return cls(shared_memory.SharedMemory(name=name))
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def put(self, payload):
+        buf, cap = self.buf, self.capacity
+        head = U64.unpack_from(buf, HEAD_OFFSET)[0]
+        tail = U64.unpack_from(buf, TAIL_OFFSET)[0]
+        need = U32.size + len(payload)
+        pos = head % cap
+        if pos + need > cap:
+            # Doesn't fit before the end: mark the rest as skipped and start over at 0
+            pad = cap - pos
+            if head + pad + need - tail > cap:
+                self.full += 1
+                return False
+            if pad >= U32.size:
+                U32.pack_into(buf, RING_HEADER + pos, WRAP)
+            head += pad
+            pos = 0
+        if head + need - tail > cap:
+            self.full += 1
+            return False
+        U32.pack_into(buf, RING_HEADER + pos, len(payload))
+        buf[RING_HEADER + pos + U32.size:RING_HEADER + pos + need] = payload
+        # Publishing the new head is what makes the record visible to the consumer
+        U64.pack_into(buf, HEAD_OFFSET, head + need)
+        return True
+
+    def get(self):
+        buf, cap = self.buf, self.capacity
+        tail = U64.unpack_from(buf, TAIL_OFFSET)[0]
+        head = U64.unpack_from(buf, HEAD_OFFSET)[0]
+        if tail == head: return None
+        pos = tail % cap
+        if cap - pos < U32.size or U32.unpack_from(buf, RING_HEADER + pos)[0] == WRAP:
+            tail += cap - pos
+            pos = 0
+        length = U32.unpack_from(buf, RING_HEADER + pos)[0]
+        start = RING_HEADER + pos + U32.size
+        payload = bytes(buf[start:start + length])
+        U64.pack_into(buf, TAIL_OFFSET, tail + U32.size + length)
+        return payload
+
+    def close(self, unlink=False):
+        self.buf = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+def encode(msg):
+    return json.dumps(msg, separators=(",", ":")).encode()
+
+
+def percentile(values, p):
+    if not values: return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))]
+
+
+def worker_main(command_name, report_name, doorbell, event_map, use_mixer, output, log_level="INFO"):
+    """Audio process entry point: drains commands, steps the engine, reports health."""
+    from audio_engine import AudioEngine, LoopStats
+
+    # Ctrl+C reaches the whole process group; the parent shuts us down with "quit"
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logs.setup(log_level)
+    commands = ShmRing.attach(command_name)
+    reports = ShmRing.attach(report_name)
+    # Daemon process: no pool of its own, new clips are loudness-analysed in here
+    engine = AudioEngine(event_map, use_mixer=use_mixer, output=output, analysis_workers=1)
+    ready = time.monotonic()
+    reports.put(encode({"type": "ready", "pid": multiprocessing.current_process().pid}))
+
+    # Latency windows are per report; an idle window keeps reporting the last measured one
+    latencies, step_ms, handled = [], [], 0
+    command_ms = (0.0, 0.0)
+    last_report = ready
+    next_step = None  # monotonic time the engine asked to be stepped again
+    loop = LoopStats()
+    running = True
+    while running:
+        got = 0
+        while True:
+            payload = commands.get()
+            if payload is None: break
+            got += 1
+            op = None
+            try:
+                cmd = json.loads(payload)
+                op = cmd["op"]
+                # Commands sent while the engine was still starting count from when it was ready
+                latencies.append((time.monotonic() - max(cmd["t"], ready)) * 1000.0)
+                handled += 1
+                if op == "trigger": engine.trigger(cmd["category"], cmd["key"])
+                elif op == "volume": engine.set_volume(cmd["volume"])
+                elif op == "mute": engine.set_muted(cmd["muted"])
+                elif op == "pack": engine.set_pack(cmd["path"])
+                elif op == "play_now": engine.play_now(cmd["path"])
+                elif op == "prepare": engine.prepare([tuple(sound) for sound in cmd["sounds"]])
+                elif op == "quit": running = False
+            except Exception as e:
+                if op is None:
+                    log.error("[Audio Process] Skipped a bad command record (%d bytes): %s", len(payload), e)
+                else:
+                    log.error("[Audio Process] %s failed: %s", op, e)
+
+        now = time.monotonic()
+        if got or (next_step is not None and now >= next_step):
+            loop.wake("command" if got else "clip")
+            start = time.perf_counter()
+            try:
+                delay = engine.step()
+            except Exception as e:
+                log.error("[Worker Error] %s", e)
+                delay = None
+            step_ms.append((time.perf_counter() - start) * 1000.0)
+            next_step = None if delay is None else now + delay
+
+        if now - last_report >= REPORT_SECONDS or not running:
+            loop.wake("report")
+            if latencies:
+                command_ms = (percentile(latencies, 50), max(latencies))
+            mixer = engine.mixer.stats() if engine.mixer else {}
+            reports.put(encode({
+                "type": "health", "t": now, "commands": handled,
+                "command_ms_p50": command_ms[0], "command_ms_max": command_ms[1],
+                "step_ms_p95": percentile(step_ms, 95), "step_ms_max": max(step_ms, default=0.0),
+                "pending": engine.queue.qsize(), "voices": mixer.get("active", 0), "clips": mixer.get("started", 0),
+                "dropped": engine.queue.stats(), "cache": engine.cache.stats(), "wakeups": sum(loop.wakeups.values()),
+                "warm": engine.warm_stats,
+            }))
+            latencies, step_ms = [], []
+            last_report = now
+
+        # Sleep until a command rings, the next clip ends or the next report is due
+        timeout = last_report + REPORT_SECONDS - now
+        if next_step is not None: timeout = min(timeout, next_step - now)
+        loop.sleep(next_step is None)
+        if running and doorbell.wait(max(timeout, 0.0)):
+            doorbell.clear()
+
+    log.info("[Audio Process] %s", loop.summary())
+    engine.log_stats()
+    commands.close()
+    reports.close()
+    logs.stop()  # the process exits without running atexit: write out what is still queued
+
+
+class AudioProcess:
+    """AudioEngine look-alike that forwards everything to the audio process."""
+    def __init__(self, event_map, use_mixer=True, output="pyglet"):
+        from audio_engine import QUEUE_DEPTH
+        self.commands = ShmRing.create(COMMAND_RING_BYTES)
+        self.reports = ShmRing.create(REPORT_RING_BYTES)
+        self.doorbell = multiprocessing.Event()
+        self.send_lock = threading.Lock()  # the Tk thread and the backend/hub thread both send
+        self.process = multiprocessing.Process(
+            target=worker_main, args=(self.commands.name, self.reports.name, self.doorbell, event_map, use_mixer, output,
+                                      logging.getLevelName(logging.getLogger().getEffectiveLevel())),
+            name="rift-echo-audio", daemon=True)
+        self.process.start()
+        self.health = {}
+        for field in HEALTH_FIELDS:
+            HEALTH.labels(field).set_function(lambda field=field: self.health.get(field, 0))
+        HEALTH.labels("stalled").set_function(lambda: int(self.stalled()))
+        QUEUE_DEPTH.set_function(lambda: self.health.get("pending", 0))
+        self.last_report = time.monotonic()
+        self.dropped_commands = 0
+        self.on_wake = None  # AudioEngine compatibility: commands wake the worker, not the caller
+
+    def send(self, op, **fields):
+        """False if the ring was full. Safe from any thread: the lock makes this side the ring's single producer."""
+        fields["op"] = op
+        fields["t"] = time.monotonic()
+        payload = encode(fields)
+        with self.send_lock:
+            sent = self.commands.put(payload)
+            if not sent: self.dropped_commands += 1
+            self.doorbell.set()
+        if not sent:
+            log.warning("[Audio Process] Command ring full, dropped %s", op)
+        return sent
+
+    # Same calls as AudioEngine
+    def set_pack(self, pack_path):
+        self.send("pack", path=pack_path)
+
+    def set_volume(self, volume):
+        self.send("volume", volume=float(volume))
+
+    def set_muted(self, muted):
+        self.send("mute", muted=muted)
+
+    def trigger(self, category, key):
+        self.send("trigger", category=category, key=key)
+
+    def play_now(self, path):
+        self.send("play_now", path=path)
+
+    def prepare(self, sounds):
+        self.send("prepare", sounds=[list(sound) for sound in sounds])
+
+    def step(self):
+        """Drains health reports; returns when to look again (the worker reports once a second)."""
+        while True:
+            payload = self.reports.get()
+            if payload is None: break
+            report = json.loads(payload)
+            self.last_report = time.monotonic()
+            if report["type"] == "health":
+                self.health = report
+        return REPORT_SECONDS
+
+    def stalled(self):
+        return self.process.is_alive() is False or time.monotonic() - self.last_report > STALL_SECONDS
+
+    def log_stats(self):
+        self.send("quit")
+        self.process.join(timeout=3)
+        if self.process.is_alive():
+            self.process.terminate()
+        h = self.health
+        if h:
+            log.info("[Audio Process] Commands: %d | Ring latency p50 %.2f ms, max %.2f ms | Step p95 %.2f ms",
+                     h["commands"], h["command_ms_p50"], h["command_ms_max"], h["step_ms_p95"])
+        if self.dropped_commands:
+            log.warning("[Audio Process] Dropped commands (ring full): %d", self.dropped_commands)
+        self.commands.close(unlink=True)
+        self.reports.close(unlink=True)
+
+
+def check_pack(pack_dir, event_map, timeout=CHECK_TIMEOUT):
+    """Selects a sidecar-less copy of pack_dir in the worker; returns (clips analysed, clips in the pack)."""
+    from audio_cache import pack_paths
+    from loudness import INDEX_NAME, load_index
+    from voice_pack import COMPILED_NAME
+
+    filenames = {os.path.basename(p) for p in pack_paths(pack_dir, event_map) if os.path.exists(p)}
+    with tempfile.TemporaryDirectory(prefix="rift-echo-check-") as tmp:
+        copy = os.path.join(tmp, os.path.basename(pack_dir))
+        shutil.copytree(pack_dir, copy, ignore=shutil.ignore_patterns(INDEX_NAME, COMPILED_NAME, "*.tmp"))
+        audio = AudioProcess(event_map, output="null")
+        try:
+            audio.set_pack(copy)
+            deadline = time.monotonic() + timeout
+            while len(load_index(copy)) < len(filenames) and time.monotonic() < deadline and audio.process.is_alive():
+                time.sleep(0.1)
+            return len(load_index(copy)), len(filenames)
+        finally:
+            audio.log_stats()
+
+
+def check_senders(event_map, threads=SENDER_THREADS, count=SENDER_COMMANDS, timeout=CHECK_TIMEOUT):
+    """
+    count commands from each of threads threads at once, each one retried while the ring is
+    full. Returns (commands the worker handled, commands sent, refusals because the ring was full).
+    """
+    audio = AudioProcess(event_map, use_mixer=False, output="null")
+    level = log.level
+    log.setLevel(logging.ERROR)  # a full ring is expected here, it's the retry that matters
+    try:
+        def flood():
+            for _ in range(count):
+                while not audio.send("volume", volume=1.0):
+                    time.sleep(0.001)
+
+        senders = [threading.Thread(target=flood) for _ in range(threads)]
+        for sender in senders: sender.start()
+        for sender in senders: sender.join()
+        sent = threads * count
+        deadline = time.monotonic() + timeout
+        while audio.health.get("commands", 0) < sent and time.monotonic() < deadline and audio.process.is_alive():
+            time.sleep(0.1)
+            audio.step()
+        return audio.health.get("commands", 0), sent, audio.dropped_commands
+    finally:
+        log.setLevel(level)
+        audio.log_stats()
+
+
+def main(argv=None):
+    from audio_engine import ASSETS_DIR, load_event_map
+
+    parser = argparse.ArgumentParser(description="Checks of the audio process: levelling a new pack, concurrent senders")
+    parser.add_argument("command", choices=("check", "senders"))
+    parser.add_argument("packs", nargs="*", help="check: pack folders under assets/ (default: all)")
+    parser.add_argument("--threads", type=int, default=SENDER_THREADS, help="senders: threads sending at once")
+    parser.add_argument("--count", type=int, default=SENDER_COMMANDS, help="senders: commands per thread")
+    args = parser.parse_args(argv)
+
+    logs.setup()
+    event_map = load_event_map()
+    if args.command == "senders":
+        handled, sent, dropped = check_senders(event_map, args.threads, args.count)
+        ok = handled == sent
+        print(f"[Audio Process] {args.threads} threads x {args.count}: {handled}/{sent} commands received, "
+              f"{dropped} retried (ring full){'' if ok else ' FAILED'}")
+        return int(not ok)
+    packs = args.packs or sorted(d for d in os.listdir(ASSETS_DIR) if os.path.isdir(os.path.join(ASSETS_DIR, d)))
+    status = 0
+    for name in packs:
+        analysed, total = check_pack(os.path.join(ASSETS_DIR, name), event_map)
+        ok = analysed == total
+        print(f"[Audio Process] {name}: {analysed}/{total} clips levelled in the worker{'' if ok else ' FAILED'}")
+        status = status or int(not ok)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+import heapq
+import threading
+import time
+
+DEFAULT_PRIORITY = 50
+
+
+class Announcement:
+    __slots__ = ("category", "key", "priority", "queued_at", "count", "payload", "alive")
+
+    def __init__(self, category, key, priority, queued_at, payload=None):
+        self.category = category
+        self.key = key
+        self.priority = priority
+        self.queued_at = queued_at
+        self.count = 1          # >1 once redundant callouts were merged into this one
+        self.payload = payload  # opaque, handed back untouched (used by benchmarks)
+        self.alive = True
+
+
+class AnnouncementQueue:
+    """
+    Thread-safe scheduling queue for announcements, configured by the "scheduling"
+    section of events.json:
+
+        priorities   key -> 0..100, higher plays first (FIFO within a priority)
+        max_age      key or category -> seconds before a pending clip is dropped (null = never)
+        coalesce     keys where a new callout merges into one already waiting
+        supersedes   key -> keys it makes redundant (e.g. ace_us drops pending ally_slain)
+        preempt_margin   a pending clip this much more important cuts the playing one
+        max_pending  overflow drops the least important pending clip
+
+    Drops are counted per reason in self.dropped.
+    """
+    def __init__(self, config=None, clock=time.monotonic):
+        config = config or {}
+        self.default_priority = config.get("default_priority", DEFAULT_PRIORITY)
+        self.priorities = config.get("priorities", {})
+        self.max_age = config.get("max_age", {})
+        self.coalesce = set(config.get("coalesce", []))
+        self.supersedes = {k: set(v) for k, v in config.get("supersedes", {}).items()}
+        self.preempt_margin = config.get("preempt_margin", 30)
+        self.max_pending = config.get("max_pending", 16)
+        self.clock = clock
+
+        self.lock = threading.Lock()
+        self.heap = []     # (-priority, seq, Announcement)
+        self.pending = {}  # key -> [Announcement] still alive, for coalesce/supersede
+        self.size = 0
+        self.seq = 0
+        self.dropped = {"coalesced": 0, "superseded": 0, "stale": 0, "overflow": 0, "preempted": 0, "cleared": 0}
+
+    def priority_of(self, key):
+        return self.priorities.get(key, self.default_priority)
+
+    def age_limit(self, item):
+        if item.key in self.max_age: return self.max_age[item.key]
+        return self.max_age.get(item.category)
+
+    def _kill(self, item, reason):
+        item.alive = False
+        self.size -= 1
+        self.dropped[reason] += 1
+        same_key = self.pending.get(item.key)
+        if same_key:
+            same_key.remove(item)
+
+    def put(self, category, key, payload=None):
+        """Queues a callout. Returns False if it was merged into one already waiting."""
+        now = self.clock()
+        with self.lock:
+            if key in self.coalesce and self.pending.get(key):
+                self.pending[key][0].count += 1
+                self.dropped["coalesced"] += 1
+                return False
+
+            for redundant in self.supersedes.get(key, ()):
+                for item in list(self.pending.get(redundant, ())):
+                    self._kill(item, "superseded")
+
+            item = Announcement(category, key, self.priority_of(key), now, payload)
+            heapq.heappush(self.heap, (-item.priority, self.seq, item))
+            self.seq += 1
+            self.pending.setdefault(key, []).append(item)
+            self.size += 1
+
+            if self.size > self.max_pending:
+                # Least important, then newest, goes first
+                victim = max((entry for entry in self.heap if entry[2].alive), key=lambda e: (e[0], e[1]))
+                self._kill(victim[2], "overflow")
+            return True
+
+    def get(self, min_priority=None):
+        """
+        Next announcement to play, or None. Stale clips are dropped on the way.
+        With min_priority, a best candidate below it stays queued and None is returned.
+        """
+        now = self.clock()
+        with self.lock:
+            while self.heap:
+                entry = heapq.heappop(self.heap)
+                item = entry[2]
+                if not item.alive: continue
+                limit = self.age_limit(item)
+                if limit is not None and now - item.queued_at > limit:
+                    self._kill(item, "stale")
+                    continue
+                if min_priority is not None and item.priority < min_priority:
+                    heapq.heappush(self.heap, entry)
+                    return None
+                item.alive = False
+                self.size -= 1
+                self.pending[item.key].remove(item)
+                return item
+            return None
+
+    def peek_priority(self):
+        with self.lock:
+            while self.heap and not self.heap[0][2].alive:
+                heapq.heappop(self.heap)
+            return self.heap[0][2].priority if self.heap else None
+
+    def should_preempt(self, playing_priority):
+        """True if a waiting clip matters enough to cut the one that is playing."""
+        top = self.peek_priority()
+        if top is None or playing_priority is None: return False
+        if top >= playing_priority + self.preempt_margin:
+            with self.lock:
+                self.dropped["preempted"] += 1
+            return True
+        return False
+
+    def clear(self):
+        with self.lock:
+            for _, _, item in self.heap:
+                if item.alive:
+                    item.alive = False
+                    self.dropped["cleared"] += 1
+            self.heap.clear()
+            self.pending.clear()
+            self.size = 0
+
+    def empty(self):
+        return self.size == 0
+
+    def qsize(self):
+        return self.size
+
+    def stats(self):
+        with self.lock:
+            return dict(self.dropped, pending=self.size)
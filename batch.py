@@ -0,0 +1,314 @@
+"""
+Runs the announcer logic over many recorded matches at once, for tuning packs and
+scheduling. Each match goes through RiftBackend tick by tick exactly as run() would
+(timers, then the tick's events through the rules), so the timeline is what the app
+would have announced. Timers fire at their deadlines even between recorded ticks.
+The sounds are then played through the AnnouncementQueue against the pack's clip
+lengths, in game time, to see the backlog and what was dropped.
+
+    python batch.py recordings/ more.rec.gz [--out timeline.parquet] [--pack NAME]
+    python batch.py --synth 200 --minutes 40 --out timeline.csv [--workers N]
+
+Matches are spread over a process pool; the timeline (one row per sound) is written as
+matches finish, in input order, and queue waits go into a fixed-size histogram
+(WaitHistogram), so memory stays flat however many matches there are. It is
+columnar when --out ends in .parquet or .feather/.arrow: one row group (or record batch)
+per match, through pyarrow (pip install pyarrow), which is optional. Any other name
+gets CSV, which needs nothing beyond the standard library.
+"""
+import argparse
+import bisect
+import csv
+import glob
+import json
+import os
+import sys
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor
+
+from audio_engine import ASSETS_DIR, load_event_map
+from audio_queue import AnnouncementQueue
+from event_rules import load_rules
+from rift_backend import LatencyHistogram, RiftBackend
+
+COLUMNS = ("match", "game_time", "source", "category", "key", "outcome", "start", "wait")
+COLUMN_TYPES = ("string", "float64", "string", "string", "string", "string", "float64", "float64")
+ARROW_EXTENSIONS = (".parquet", ".feather", ".arrow")
+DEFAULT_CLIP_SECONDS = 2.0
+CLIP_GAP = 0.1  # pause after each clip, as the sequential player does
+
+# Per worker process, filled by init_worker
+worker = {}
+
+
+class WaitHistogram(LatencyHistogram):
+    """
+    Queue waits (milliseconds) in 50 ms buckets up to a minute, plus one for clips that
+    started at once. Workers send theirs back per match and main() merges them.
+    """
+    BUCKETS_MS = (0,) + tuple(range(50, 60001, 50))
+
+    def record(self, ms):
+        self.counts[bisect.bisect_left(self.BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        if ms > self.max_ms: self.max_ms = ms
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total_ms += other.total_ms
+        self.max_ms = max(self.max_ms, other.max_ms)
+
+
+class TimelineApp:
+    """app_interface that writes down every sound with when and why it was asked for."""
+    def __init__(self):
+        self.sounds = []  # (game_time, source, category, key)
+        self.at = 0.0
+        self.source = ""
+
+    def trigger_audio(self, category, key, log_msg=""):
+        self.sounds.append((self.at, self.source, category, key))
+
+    def set_status(self, connected):
+        pass
+
+
+class TimelineBackend(RiftBackend):
+    """RiftBackend fed from a recording instead of the Live Client API."""
+    def dispatch_event(self, event, game_time):
+        self.app.at, self.app.source = game_time, event.get("EventName", "")
+        super().dispatch_event(event, game_time)
+
+    def fire_timers(self, game_time):
+        """
+        Fires every timer due by game_time at its own deadline, as run() waking up for it
+        would, not at the next recorded tick. A deadline already behind the timeline
+        (scheduled from an older event) is announced as soon as it was seen.
+        """
+        tracker = self.tracker
+        while True:
+            deadline = tracker.next_deadline()
+            if deadline is None or deadline > game_time: return
+            self.app.at, self.app.source = max(deadline, self.app.at), "timer"
+            for category, key in tracker.check_timers(deadline):
+                self.app.trigger_audio(category, key)
+
+
+def clip_seconds(pack_dir, event_map):
+    """(category, key) -> clip length in seconds, from the WAV headers of a pack."""
+    lengths = {}
+    for category, sounds in event_map.items():
+        if not isinstance(sounds, dict): continue
+        for key, filename in sounds.items():
+            if not isinstance(filename, str): continue
+            try:
+                with wave.open(os.path.join(pack_dir, filename), "rb") as w:
+                    lengths[category, key] = w.getnframes() / float(w.getframerate())
+            except (OSError, EOFError, wave.Error):
+                pass
+    return lengths
+
+
+def init_worker(pack_dir):
+    event_map = load_event_map()
+    worker["event_map"] = event_map
+    worker["rules"] = load_rules()
+    worker["lengths"] = clip_seconds(pack_dir, event_map) if pack_dir else {}
+
+
+def load_match(source):
+    from replay import Recording, synthetic_match
+    if isinstance(source, tuple):
+        _, seed, minutes = source
+        return f"synth-{seed}", synthetic_match(minutes, seed=seed)
+    return os.path.basename(source), Recording.load(source)
+
+
+def timeline(rec):
+    """Every (game_time, source, category, key) the backend announces over the recording."""
+    app = TimelineApp()
+    backend = TimelineBackend(app, worker["event_map"], rules=worker["rules"])
+    backend.fetch_api = lambda endpoint: rec.static.get(endpoint)
+    backend.tracker.quiet = True
+    backend.setup_identity()  # logs at INFO; batch.py never sets logging up, so only warnings show
+    for _, game_time, new_events in rec.ticks:
+        backend.fire_timers(game_time)
+        for ev in new_events:
+            backend.process_event(ev, game_time)
+    return app.sounds
+
+
+def simulate(sounds, lengths, scheduling):
+    """
+    Plays sounds through the queue one clip at a time (with preemption), in game time.
+    Returns (outcome, start) per sound and the queue's drop counters and peak backlog.
+    """
+    clock = [0.0]
+    queue = AnnouncementQueue(scheduling, clock=lambda: clock[0])
+    results = [("dropped", None)] * len(sounds)
+    busy_until, playing = 0.0, None
+    peak = 0
+
+    def start_due(until):
+        # Starts clips back to back while the player frees up before `until`
+        nonlocal busy_until, playing
+        while not queue.empty() and busy_until <= until:
+            clock[0] = max(busy_until, clock[0])
+            item = queue.get()
+            if item is None: return
+            results[item.payload] = ("played", clock[0])
+            playing = item.priority
+            busy_until = clock[0] + lengths.get((item.category, item.key), DEFAULT_CLIP_SECONDS) + CLIP_GAP
+
+    for i, (game_time, _, category, key) in enumerate(sounds):
+        start_due(game_time)
+        clock[0] = game_time
+        if not queue.put(category, key, i):
+            results[i] = ("merged", None)
+        peak = max(peak, queue.qsize())
+        if game_time < busy_until and queue.should_preempt(playing):
+            busy_until = game_time
+        start_due(game_time)
+    start_due(float("inf"))
+    return results, queue.stats(), peak
+
+
+def analyse(source):
+    """One match -> (name, rows, summary). Runs in a pool worker."""
+    start = time.perf_counter()
+    name, rec = load_match(source)
+    sounds = timeline(rec)
+    results, dropped, peak = simulate(sounds, worker["lengths"], worker["event_map"].get("scheduling"))
+    rows, waits = [], WaitHistogram()
+    for (game_time, origin, category, key), (outcome, started) in zip(sounds, results):
+        wait = None if started is None else started - game_time
+        if wait is not None: waits.record(wait * 1000.0)
+        rows.append((name, round(game_time, 3), origin, category, key, outcome,
+                     None if started is None else round(started, 3), None if wait is None else round(wait, 3)))
+    dropped.pop("pending", None)
+    summary = {"minutes": (rec.ticks[-1][1] if rec.ticks else 0.0) / 60.0, "sounds": len(sounds),
+               "played": waits.count, "dropped": dropped, "peak_backlog": peak, "waits": waits,
+               "seconds": time.perf_counter() - start}
+    return name, rows, summary
+
+
+class CsvTimeline:
+    def __init__(self, path):
+        self.file = open(path, "w", newline="")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(COLUMNS)
+
+    def write(self, rows):
+        self.writer.writerows(rows)  # None (not played) comes out as an empty field
+
+    def close(self):
+        self.file.close()
+
+
+class ArrowTimeline:
+    """Parquet, or Arrow IPC for .feather/.arrow; each write() is one row group / record batch."""
+    def __init__(self, path):
+        import pyarrow as pa
+        self.pa = pa
+        self.schema = pa.schema([(name, kind) for name, kind in zip(COLUMNS, COLUMN_TYPES)])
+        if path.lower().endswith(".parquet"):
+            import pyarrow.parquet as pq
+            self.writer = pq.ParquetWriter(path, self.schema)
+        else:
+            self.writer = pa.ipc.new_file(path, self.schema)
+
+    def write(self, rows):
+        if not rows: return
+        columns = [self.pa.array(values, type=field.type) for values, field in zip(zip(*rows), self.schema)]
+        self.writer.write_table(self.pa.Table.from_arrays(columns, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+def open_timeline(path):
+    """Columnar writer for ARROW_EXTENSIONS, CSV otherwise. ImportError if pyarrow is needed and missing."""
+    if path.lower().endswith(ARROW_EXTENSIONS):
+        return ArrowTimeline(path)
+    return CsvTimeline(path)
+
+
+def find_matches(paths):
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            found.extend(sorted(glob.glob(os.path.join(path, "*.rec.gz"))))
+        else:
+            found.append(path)
+    return found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Announcer timelines and queue stats over many recorded matches")
+    parser.add_argument("paths", nargs="*", help="replay.py recordings or folders of *.rec.gz")
+    parser.add_argument("--synth", type=int, default=0, help="also analyse this many synthetic matches")
+    parser.add_argument("--minutes", type=float, default=40, help="length of the synthetic matches")
+    parser.add_argument("--pack", help="voice pack for clip lengths (default: first in assets/)")
+    parser.add_argument("--out", help="timeline, one row per sound: .parquet/.feather (needs pyarrow) or CSV")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: one per core)")
+    parser.add_argument("--json", help="write the aggregate stats to this file")
+    args = parser.parse_args(argv)
+
+    sources = find_matches(args.paths) + [("synth", seed, args.minutes) for seed in range(args.synth)]
+    if not sources:
+        parser.error("nothing to analyse: give recordings or --synth N")
+    packs = sorted(d for d in os.listdir(ASSETS_DIR) if os.path.isdir(os.path.join(ASSETS_DIR, d))) if os.path.isdir(ASSETS_DIR) else []
+    pack = args.pack or (packs[0] if packs else None)
+    pack_dir = os.path.join(ASSETS_DIR, pack) if pack else None
+    workers = args.workers or os.cpu_count() or 1
+
+    totals = {"matches": 0, "minutes": 0.0, "sounds": 0, "played": 0, "dropped": {}, "peak_backlog": 0}
+    waits, busy = WaitHistogram(), 0.0
+    try:
+        out = open_timeline(args.out) if args.out else None
+    except ImportError:
+        parser.error(f"{args.out}: columnar output needs pyarrow (pip install pyarrow), or use a .csv name")
+    start = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(pack_dir,)) as pool:
+            chunk = max(1, len(sources) // (workers * 8))
+            for name, rows, summary in pool.map(analyse, sources, chunksize=chunk):
+                if out: out.write(rows)
+                totals["matches"] += 1
+                totals["minutes"] += summary["minutes"]
+                totals["sounds"] += summary["sounds"]
+                totals["played"] += summary["played"]
+                totals["peak_backlog"] = max(totals["peak_backlog"], summary["peak_backlog"])
+                for reason, n in summary["dropped"].items():
+                    totals["dropped"][reason] = totals["dropped"].get(reason, 0) + n
+                waits.merge(summary["waits"])
+                busy += summary["seconds"]
+    finally:
+        if out: out.close()
+    wall = time.perf_counter() - start
+
+    minutes = max(totals["minutes"], 1e-9)
+    sounds = max(totals["sounds"], 1)
+    # Percentiles are bucket upper bounds, within 50 ms
+    totals.update({"clips_per_minute": totals["played"] / minutes, "wait_p50": waits.percentile(50) / 1000.0,
+                   "wait_p95": waits.percentile(95) / 1000.0, "wait_max": waits.max_ms / 1000.0,
+                   "wall_seconds": wall, "workers": workers, "pack": pack})
+    print(f"{totals['matches']} matches, {totals['minutes']:.0f} game minutes, pack '{pack}', "
+          f"{wall:.2f}s on {workers} workers ({totals['matches'] / wall:.1f} matches/s, "
+          f"{busy / wall:.1f}x parallel)")
+    print(f"sounds: {totals['sounds']} asked, {totals['played']} played "
+          f"({totals['clips_per_minute']:.2f} clips/game minute)")
+    print(f"backlog: wait p50 <={totals['wait_p50']:.2f}s, p95 <={totals['wait_p95']:.2f}s, "
+          f"max {totals['wait_max']:.2f}s; peak {totals['peak_backlog']} pending")
+    print("dropped: " + ", ".join(f"{reason} {n} ({100.0 * n / sounds:.1f}%)" for reason, n in totals["dropped"].items()))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(totals, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
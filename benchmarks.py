@@ -0,0 +1,807 @@
+"""
+Headless benchmarks and soak checks for Rift Echo. No game or GUI needed.
+
+    python benchmarks.py dedup [--events N]
+    python benchmarks.py latency [--recording match.rec.gz] [--speed 5] [--mixer] [--tick 50] [--json out.json]
+    python benchmarks.py rules [--recording match.rec.gz] [--events N]
+    python benchmarks.py startup [--runs 5]
+    python benchmarks.py rebuild [--recording match.rec.gz] [--minutes 40] [--runs 5]
+    python benchmarks.py parse [--recording match.rec.gz] [--minutes 40] [--runs 5]
+    python benchmarks.py fanout [--events N]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+
+from audio_cache import AudioCache, pack_paths
+from audio_engine import WaveClip
+from audio_queue import AnnouncementQueue
+from rift_backend import GameStateTracker, PollPolicy, RiftBackend
+
+ORDER = [f"Ally{i}" for i in range(5)]
+CHAOS = [f"Enemy{i}" for i in range(5)]
+
+
+class NullApp:
+    """Stands in for the GUI: counts what the backend asks for, plays nothing."""
+    def __init__(self):
+        self.triggered = 0
+        self.connected = False
+
+    def trigger_audio(self, category, key, log_msg=""):
+        self.triggered += 1
+
+    def set_status(self, connected):
+        self.connected = connected
+
+
+def make_backend(app=None):
+    backend = RiftBackend(app or NullApp(), {})
+    backend.my_summoner = ORDER[0]
+    backend.my_team = "ORDER"
+    for name in ORDER: backend.player_team_cache[name] = "ORDER"
+    for name in CHAOS: backend.player_team_cache[name] = "CHAOS"
+    backend.update_roles()
+    return backend
+
+
+def synthetic_events(count, seed=0, reorder=0.02, duplicate=0.05):
+    """Kill/turret stream with monotonically increasing EventIDs, some swapped and repeated."""
+    rng = random.Random(seed)
+    events = []
+    for event_id in range(count):
+        if rng.random() < 0.9:
+            killer, victim = rng.sample(ORDER + CHAOS, 2)
+            ev = {"EventID": event_id, "EventName": "ChampionKill", "KillerName": killer, "VictimName": victim}
+        else:
+            ev = {"EventID": event_id, "EventName": "TurretKilled", "KillerName": rng.choice(ORDER + CHAOS)}
+        events.append(ev)
+        if events and rng.random() < duplicate:
+            events.append(rng.choice(events[-8:]))
+        if len(events) > 1 and rng.random() < reorder:
+            events[-1], events[-2] = events[-2], events[-1]
+    return events
+
+
+def bench_dedup(args):
+    backend = make_backend()
+    events = synthetic_events(args.events)
+    checkpoints = {len(events) // 10, len(events) // 2, len(events)}
+
+    tracemalloc.start()
+    samples = []
+    start = time.perf_counter()
+    for i, ev in enumerate(events, 1):
+        backend.process_event(ev, 600.0)
+        if i in checkpoints:
+            samples.append((i, tracemalloc.get_traced_memory()[0]))
+    elapsed = time.perf_counter() - start
+    tracemalloc.stop()
+
+    for i, current in samples:
+        print(f"  after {i:>9,} events: {current / 1024:8.1f} KB traced")
+    growth = samples[-1][1] - samples[0][1]
+    per_event_us = elapsed / len(events) * 1e6
+    print(f"dedup: {len(events):,} events in {elapsed:.2f}s ({per_event_us:.2f} us/event), growth {growth / 1024:.1f} KB")
+    # The set-based version grew by ~60 bytes per event; the window must stay flat
+    if growth > 16 * 1024:
+        print("FAIL: de-dup memory grows with the event stream")
+        return 1
+    print("OK: de-dup memory is flat")
+    return 0
+
+
+# --- EVENT-TO-SOUND LATENCY ---
+
+STAGES = ("poll", "parse", "process", "queue", "tick", "decode", "total")
+
+
+def clip_loader():
+    try:
+        import pyglet
+        pyglet.options["headless"] = True
+        import pyglet.media
+        return lambda path: pyglet.media.load(path, streaming=False)
+    except Exception:
+        return WaveClip
+
+
+def percentiles(values):
+    if not values: return {"n": 0}
+    ordered = sorted(values)
+    def pick(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))]
+    return {"n": len(ordered), "p50": pick(50), "p95": pick(95), "p99": pick(99), "max": ordered[-1]}
+
+
+class TracedBackend(RiftBackend):
+    """RiftBackend that stamps each event on its way through fetch and process_event."""
+    def __init__(self, app, event_map, **kwargs):
+        super().__init__(app, event_map, **kwargs)
+        self.received_at = 0.0
+        self.received_parse_ms = 0.0
+        self.current = None
+
+    def parse(self, endpoint, body, *args):
+        data = super().parse(endpoint, body, *args)
+        if data is not None:
+            self.received_at = time.monotonic()
+            name = endpoint.split("?", 1)[0]
+            self.received_parse_ms = self.payload.endpoints[name]["last_parse_ms"]
+        return data
+
+    def process_event(self, event, game_time):
+        trace = {"id": event.get("EventID"), "received": self.received_at, "parse_ms": self.received_parse_ms}
+        self.current = trace
+        start = time.perf_counter()
+        super().process_event(event, game_time)
+        trace["process_ms"] = (time.perf_counter() - start) * 1000.0
+        self.current = None
+
+
+class NullAudioApp(NullApp):
+    """
+    Headless copy of RiftEchoGUI's audio path: the same priority queue and a worker woken
+    by triggers and clip ends (or polled every `tick` seconds, like the old 50 ms loop),
+    either with busy_until gating and preemption (sequential players) or with the
+    software mixer, and playback replaced by a null sink that only honours durations.
+    Clip durations are divided by time_scale so an accelerated replay keeps the backlog
+    proportional to the game.
+    """
+    def __init__(self, event_map, pack_path, loader, tick=None, time_scale=1.0, mixer=None):
+        super().__init__()
+        self.event_map = event_map
+        self.pack_path = pack_path
+        self.audio_queue = AnnouncementQueue(event_map.get("scheduling"), clock=self.game_clock)
+        self.audio_cache = AudioCache(loader)
+        self.mixer = mixer
+        self.tick = tick
+        self.time_scale = time_scale
+        self.busy_until = 0.0
+        self.blocked_at = 0.0
+        self.playing_priority = None
+        self.backend = None
+        self.played = []
+        self.running = True
+        self.wake = threading.Event()
+        self.wakeups = 0
+
+    def game_clock(self):
+        # Staleness limits are in game seconds
+        return time.monotonic() * self.time_scale
+
+    def trigger_audio(self, category, key, log_msg=""):
+        self.triggered += 1
+        trace = self.backend.current if self.backend else None
+        if self.audio_queue.put(category, key, (trace, time.monotonic())):
+            self.wake.set()
+
+    def load(self, item):
+        """(clip or None, decode ms)"""
+        filename = self.event_map.get(item.category, {}).get(item.key)
+        if not filename: return None, 0.0
+        start = time.perf_counter()
+        try:
+            clip = self.audio_cache.get(os.path.join(self.pack_path, filename))
+        except OSError:
+            clip = None
+        return clip, (time.perf_counter() - start) * 1000.0
+
+    def record(self, item, ready_at, now, decode_ms):
+        trace, queued_at = item.payload
+        if trace is not None:
+            # A preempting clip can start before the voice it was waiting on would have ended
+            self.played.append((trace, queued_at, min(max(queued_at, ready_at), now), now, decode_ms))
+
+    def step_sequential(self, now):
+        if now < self.busy_until and self.audio_queue.should_preempt(self.playing_priority):
+            self.busy_until = now
+        if now < self.busy_until: return
+        item = self.audio_queue.get()
+        if not item: return
+        clip, decode_ms = self.load(item)
+        duration = (clip.duration or 1.0) if clip else 0.0
+        self.playing_priority = item.priority
+        self.record(item, self.busy_until, now, decode_ms)
+        self.busy_until = now + (duration + 0.1) / self.time_scale
+
+    def step_mixer(self, now, elapsed):
+        # Advance the voices by the game time that passed, output goes nowhere
+        self.mixer.advance(max(int(elapsed * self.time_scale * self.mixer.rate), 1))
+        while True:
+            floor = self.mixer.start_floor()
+            if floor is None:
+                if not self.audio_queue.should_preempt(self.mixer.lowest_priority()):
+                    break
+                self.mixer.stop_lowest()
+                continue
+            item = self.audio_queue.get(min_priority=floor)
+            if not item: break
+            clip, decode_ms = self.load(item)
+            if clip is not None:
+                self.mixer.play(clip, item.priority, key=item.key)
+            self.record(item, self.blocked_at, now, decode_ms)
+        if not self.audio_queue.empty():
+            # Whatever is waiting can start once the first voice ends
+            left = self.mixer.next_end()
+            self.blocked_at = now + (left / self.time_scale if left else 0.0)
+
+    def next_step(self, now):
+        """Seconds until the worker has something to do, None until the next trigger (as AudioEngine.step)."""
+        if self.mixer:
+            left = self.mixer.next_end()
+            return None if left is None else left / self.time_scale
+        if now < self.busy_until: return self.busy_until - now
+        return None if self.audio_queue.empty() else 0.0
+
+    def worker(self):
+        last = time.monotonic()
+        while self.running:
+            now = time.monotonic()
+            self.wakeups += 1
+            if self.mixer:
+                self.step_mixer(now, now - last)
+            else:
+                self.step_sequential(now)
+            last = now
+            if self.tick:
+                time.sleep(self.tick)
+                continue
+            delay = self.next_step(now)
+            # Capped so the worker notices self.running going False
+            if self.wake.wait(0.5 if delay is None else min(delay, 0.5)):
+                self.wake.clear()
+
+
+def bench_latency(args):
+    from replay import Recording, ReplayServer, synthetic_match
+
+    with open("events.json") as f:
+        event_map = json.load(f)
+    packs = sorted(d for d in os.listdir("assets") if os.path.isdir(os.path.join("assets", d)))
+    pack_path = os.path.join("assets", args.pack or packs[0])
+
+    if args.recording:
+        rec = Recording.load(args.recording)
+    else:
+        # Teamfight-heavy match so bursts dominate the tail
+        rec = synthetic_match(args.minutes, seed=1, teamfight_start=90.0, teamfight_gap=(20.0, 40.0))
+    emitted = {}
+    for (t, _, new_events) in rec.ticks:
+        for ev in new_events:
+            emitted[ev.get("EventID")] = t
+
+    mixer, buffer_ms = None, 0.0
+    if args.mixer:
+        from mixer import STREAM_BUFFER_SECONDS, Mixer, decode_wav
+        mixer = Mixer()
+        buffer_ms = STREAM_BUFFER_SECONDS * 1000.0
+    loader = decode_wav if mixer else clip_loader()
+    app = NullAudioApp(event_map, pack_path, loader, tick=args.tick / 1000.0 if args.tick else None,
+                       time_scale=args.speed, mixer=mixer)
+    if not args.cold:
+        app.audio_cache.preload(pack_paths(pack_path, event_map)).join()
+
+    server = ReplayServer(rec, speed=args.speed)
+    base_url = server.start()
+    backend = TracedBackend(app, event_map, base_url=base_url, poll_policy=PollPolicy())
+    backend.daemon = True
+    app.backend = backend
+    worker = threading.Thread(target=app.worker, daemon=True)
+
+    print(f"latency: {len(rec.events)} events over {rec.duration / 60:.1f} game minutes at {args.speed}x "
+          f"(~{rec.duration / args.speed:.0f}s wall), pack '{os.path.basename(pack_path)}', "
+          f"{'mixer' if mixer else 'sequential players'}")
+    worker.start()
+    backend.start()
+    try:
+        while not server.clock.finished:
+            time.sleep(0.2)
+        deadline = time.monotonic() + 30
+        while not app.audio_queue.empty() and time.monotonic() < deadline:
+            time.sleep(0.1)
+    finally:
+        backend.stop()
+        app.running = False
+        server.stop()
+
+    samples = {stage: [] for stage in STAGES}
+    for trace, queued_at, ready_at, got_at, decode_ms in app.played:
+        emit = server.clock.start + emitted.get(trace["id"], 0.0) / args.speed
+        poll_ms = max((trace["received"] - emit) * 1000.0 - trace["parse_ms"], 0.0)
+        samples["poll"].append(poll_ms)
+        samples["parse"].append(trace["parse_ms"])
+        samples["process"].append(trace.get("process_ms", 0.0))
+        # Backlog behind other clips is in game time, scale it back up
+        queue_ms = (ready_at - queued_at) * 1000.0 * args.speed
+        tick_ms = (got_at - ready_at) * 1000.0
+        samples["queue"].append(queue_ms)
+        samples["tick"].append(tick_ms)
+        samples["decode"].append(decode_ms)
+        # The mixer's stream adds its output buffer on top
+        samples["total"].append(poll_ms + trace["parse_ms"] + trace.get("process_ms", 0.0) + queue_ms + tick_ms + decode_ms + buffer_ms)
+
+    results = {stage: percentiles(values) for stage, values in samples.items()}
+    print(f"{'stage':<8} {'n':>6} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'max ms':>10}")
+    for stage in STAGES:
+        r = results[stage]
+        if not r["n"]: continue
+        print(f"{stage:<8} {r['n']:>6} {r['p50']:>10.2f} {r['p95']:>10.2f} {r['p99']:>10.2f} {r['max']:>10.2f}")
+    cache = app.audio_cache.stats()
+    dropped = app.audio_queue.stats()
+    print(f"cache: {cache['hits']} hits / {cache['misses']} misses")
+    print(f"worker wakeups: {app.wakeups} ({'every %g ms' % args.tick if args.tick else 'on trigger / clip end'})")
+    print("dropped: " + ", ".join(f"{reason} {n}" for reason, n in dropped.items() if reason != "pending"))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"speed": args.speed, "mixer": bool(mixer), "events": len(rec.events), "stages": results, "cache": cache, "wakeups": app.wakeups,
+                       "dropped": dropped}, f, indent=2)
+    return 0
+
+
+# --- RULE DISPATCH ---
+
+class LegacyBackend(RiftBackend):
+    """
+    Frozen copy of the if/elif process_event chain that rules.json replaced, kept as the
+    reference the rule table is checked and timed against. Don't update it.
+    """
+    grubs_killed = grubs_ally_score = grubs_enemy_score = 0
+
+    def handle_kill_logic(self, killer, victim):
+        sounds = []
+        killer_team = self.player_team_cache.get(killer)
+        victim_team = self.player_team_cache.get(victim)
+        is_execution = killer not in self.player_team_cache
+        
+        if is_execution:
+            if victim == self.my_summoner: sounds.append(("player", "executed"))
+            elif victim_team == self.my_team: sounds.append(("team", "executed_ally"))
+            else: sounds.append(("team", "executed_enemy"))
+            return sounds
+
+        current_streak = self.tracker.add_kill(killer)
+        was_shutdown = self.tracker.reset_streak(victim)
+
+        if victim == self.my_summoner: sounds.append(("player", "death"))
+        elif killer == self.my_summoner: sounds.append(("player", "kill"))
+        elif victim_team == self.my_team: sounds.append(("team", "ally_slain"))
+        elif killer_team == self.my_team: sounds.append(("team", "enemy_slain"))
+
+        spree_key = None
+        if current_streak == 3: spree_key = "rampage"
+        elif current_streak == 6: spree_key = "godlike"
+        elif current_streak >= 8: spree_key = "legendary"
+
+        if spree_key:
+            if killer == self.my_summoner: sounds.append(("player", spree_key))
+            elif killer_team == self.my_team: sounds.append(("team", f"ally_{spree_key}"))
+            else: sounds.append(("team", f"enemy_{spree_key}"))
+
+        if was_shutdown:
+            if killer == self.my_summoner: sounds.append(("player", "shutdown"))
+            elif killer_team == self.my_team: sounds.append(("team", "shutdown_enemy"))
+            else: sounds.append(("team", "shutdown_ally"))
+        return sounds
+
+    def process_event(self, event, game_time):
+        name = event["EventName"]
+        event_id = event.get("EventID")
+        if event_id is not None:
+            if self.tracker.processed_events.is_duplicate(event_id): return
+
+        category, key = None, None
+        
+        if name == "GameStart":
+            # Don't schedule if we are reconnecting late
+            if game_time < 30: 
+                category, key = "global", "GameStart"
+                self.tracker.schedule_timer(game_time, 15.0, "global", "minions_soon")
+        elif name == "MinionsSpawning":
+            category, key = "global", "MinionsSpawning"
+        elif name == "GameEnd":
+            result = event.get("Result")
+            key = "victory" if result == "Win" else "defeat"
+            category = "global"
+        elif name == "InhibKilled":
+            killer_team = self.player_team_cache.get(event["KillerName"])
+            if killer_team == self.my_team: category, key = "team", "inhib_destroy"
+            else: category, key = "team", "inhib_lost"
+            # Each inhibitor respawns on its own clock
+            inhib = event.get("InhibKilled", "")
+            self.tracker.schedule_timer(game_time, 285.0, "warnings", "inhib_respawning", slot=f"inhib_respawning:{inhib}")
+            self.tracker.schedule_timer(game_time, 300.0, "warnings", "inhib_live", slot=f"inhib_live:{inhib}")
+        elif name == "DragonKill":
+            killer_team = self.player_team_cache.get(event["KillerName"])
+            if killer_team == self.my_team: category, key = "team", "dragon_taken"
+            else: category, key = "team", "dragon_lost"
+            self.tracker.schedule_timer(game_time, 270.0, "warnings", "dragon_spawning")
+            self.tracker.schedule_timer(game_time, 300.0, "warnings", "dragon_live")
+        elif name == "BaronKill":
+            killer_team = self.player_team_cache.get(event["KillerName"])
+            if killer_team == self.my_team: category, key = "team", "baron_taken"
+            else: category, key = "team", "baron_lost"
+            self.tracker.schedule_timer(game_time, 330.0, "warnings", "baron_spawning")
+            self.tracker.schedule_timer(game_time, 360.0, "warnings", "baron_live")
+        elif name == "HordeKill":
+            killer_team = self.player_team_cache.get(event["KillerName"])
+            if killer_team == self.my_team: self.grubs_ally_score += 1
+            else: self.grubs_enemy_score += 1
+            self.grubs_killed += 1
+            if self.grubs_killed >= 3:
+                if self.grubs_ally_score > self.grubs_enemy_score: category, key = "team", "grubs_taken"
+                else: category, key = "team", "grubs_lost"
+                self.grubs_killed = 0
+                self.grubs_ally_score = 0
+                self.grubs_enemy_score = 0
+            else: return 
+        elif name == "HeraldKill":
+            if self.player_team_cache.get(event["KillerName"]) == self.my_team: category, key = "team", "herald_taken"
+            else: category, key = "team", "herald_lost"
+        elif name == "TurretKilled":
+            killer = event["KillerName"]
+            killer_team = self.player_team_cache.get(killer)
+            if killer == self.my_summoner or killer_team == self.my_team: category, key = "team", "turret_destroy"
+            else: category, key = "team", "turret_lost"
+        elif name == "Multikill":
+            if event["KillerName"] == self.my_summoner: category, key = "player", f"multikill_{event['KillStreak']}"
+        elif name == "Ace":
+            acing_team = event.get("AcingTeam")
+            key = "ace_enemy" if acing_team == self.my_team else "ace_us"
+            category = "global"
+        elif name == "ChampionKill":
+            kill_sounds = self.handle_kill_logic(event["KillerName"], event["VictimName"])
+            for cat, k in kill_sounds: self.app.trigger_audio(cat, k)
+            return
+        if category and key:
+            self.app.trigger_audio(category, key)
+
+
+class CollectingApp(NullApp):
+    def __init__(self):
+        super().__init__()
+        self.sounds = []
+
+    def trigger_audio(self, category, key, log_msg=""):
+        self.sounds.append((category, key))
+
+
+RULES_MIN_PASS = 2000
+
+
+def run_stream(backend, stream, reps):
+    """Seconds to push stream through process_event reps times, fresh match state each time."""
+    elapsed = 0.0
+    for _ in range(reps):
+        backend.tracker = GameStateTracker(backend.rules.static_timers)
+        backend.grubs_killed = backend.grubs_ally_score = backend.grubs_enemy_score = 0
+        backend.app.sounds.clear()
+        start = time.perf_counter()
+        for game_time, ev in stream:
+            backend.process_event(ev, game_time)
+        elapsed += time.perf_counter() - start
+    return elapsed
+
+
+def bench_rules(args):
+    from replay import Recording, synthetic_match
+
+    rec = Recording.load(args.recording) if args.recording else synthetic_match(max(args.minutes, 40), seed=1)
+    match = [(ev.get("EventTime", 0.0), ev) for ev in rec.events]
+    kills = [(600.0, ev) for ev in synthetic_events(args.events // 4)]
+
+    backends = {}
+    for name, cls in (("legacy", LegacyBackend), ("rules", RiftBackend)):
+        backend = cls(CollectingApp(), {})
+        backend.fetch_api = lambda endpoint: rec.static.get(endpoint)
+        with contextlib.redirect_stdout(io.StringIO()):
+            backend.setup_identity()
+        backends[name] = backend
+
+    print(f"rules: {len(match)} match events ({len(rec.ticks)} ticks), {len(kills):,} kill-stream events")
+    print(f"{'stream':<16} {'events':>9} {'legacy ns':>10} {'rules ns':>10} {'speedup':>8}  same sounds")
+    streams = [("match", match), ("kill stream", kills)]
+    by_name = {}
+    for _, ev in match:
+        by_name.setdefault(ev["EventName"], []).append((ev.get("EventTime", 0.0), ev))
+    streams += [(f"  {name}", evs) for name, evs in sorted(by_name.items())]
+
+    results = {}
+    # Timer scheduling logs every call, keep that out of the numbers
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for label, stream in streams:
+            count = len(stream)
+            # Short streams are repeated without EventIDs (de-dup would drop the copies),
+            # so each timed pass is long enough to measure
+            if len(stream) < RULES_MIN_PASS:
+                stream = [(t, {k: v for k, v in ev.items() if k != "EventID"}) for t, ev in stream]
+                stream = stream * (RULES_MIN_PASS // len(stream) + 1)
+            reps = max(1, args.events // len(stream))
+            row = {}
+            for name, backend in backends.items():
+                row[name] = run_stream(backend, stream, reps) / (reps * len(stream)) * 1e9
+                row[f"{name}_sounds"] = list(backend.app.sounds)
+            same = row["legacy_sounds"] == row["rules_sounds"]
+            results[label.strip()] = {"events": count, "legacy_ns": row["legacy"], "rules_ns": row["rules"], "same": same}
+            print(f"{label:<16} {count:>9,} {row['legacy']:>10.0f} {row['rules']:>10.0f} "
+                  f"{row['legacy'] / row['rules']:>7.2f}x  {'yes' if same else 'NO'}", file=sys.__stdout__)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0 if all(r["same"] for r in results.values()) else 1
+
+
+# --- LATE CONNECT ---
+
+def tracker_state(tracker):
+    """What a late connect has to get right: streaks, tallies and pending timers."""
+    timers = sorted((slot, e[0], e[3], e[4]) for slot, e in tracker.timers.slots.items())
+    return {k: v for k, v in tracker.streaks.items() if v}, tracker.tallies, timers
+
+
+def bench_rebuild(args):
+    from replay import Recording, synthetic_match
+
+    rec = Recording.load(args.recording) if args.recording else synthetic_match(max(args.minutes, 40), seed=1)
+    events = rec.events
+    game_time = rec.ticks[-1][1] if rec.ticks else events[-1].get("EventTime", 0.0)
+
+    backend = RiftBackend(CollectingApp(), {})
+    backend.fetch_api = lambda endpoint: rec.static.get(endpoint)
+    with contextlib.redirect_stdout(io.StringIO()):
+        backend.setup_identity()
+
+    # Reference: the same history through the normal path (sounds and timers announced)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        backend.tracker = GameStateTracker(backend.rules.static_timers)
+        for ev in events:
+            backend.fire_timers(ev.get("EventTime", 0.0))
+            backend.process_event(ev, ev.get("EventTime", 0.0))
+        backend.fire_timers(game_time)
+        expected = tracker_state(backend.tracker)
+        announced = len(backend.app.sounds)
+        backend.app.sounds.clear()
+
+    times = []
+    for _ in range(max(args.runs, 1) * 20):
+        start = time.perf_counter()
+        tracker = backend.rebuild_state(events, game_time)
+        times.append((time.perf_counter() - start) * 1000.0)
+    same = tracker_state(tracker) == expected
+    silent = not backend.app.sounds
+    times.sort()
+
+    streaks, tallies, timers = tracker_state(tracker)
+    print(f"rebuild: {len(events)} events, {game_time / 60:.0f} min of game ({announced} sounds if replayed aloud)")
+    print(f"  rebuild   p50 {times[len(times) // 2]:.2f} ms, max {times[-1]:.2f} ms ({len(times)} runs)")
+    print(f"  state     {len(streaks)} live streaks, {len(tallies)} tallies, {len(timers)} pending timers")
+    print(f"  matches the announced replay: {'yes' if same else 'NO'}, silent: {'yes' if silent else 'NO'}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"events": len(events), "game_time": game_time, "p50_ms": times[len(times) // 2],
+                       "max_ms": times[-1], "same": same, "silent": silent}, f, indent=2)
+    return 0 if same and silent else 1
+
+
+# --- PAYLOAD PARSING ---
+
+def allgamedata_body(rec, count=None):
+    """The allgamedata document replay.py serves once count events are known, as bytes."""
+    body = dict(rec.base)
+    body["gameData"] = dict(rec.base.get("gameData", {}), gameTime=rec.ticks[-1][1] if rec.ticks else 0.0)
+    body["events"] = {"Events": rec.events[:count]}
+    return json.dumps(body).encode()
+
+
+def measure_parse(fn, runs):
+    """(p50 ms, peak KB allocated while parsing, KB still held by the result) for fn()."""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000.0)
+    times.sort()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    result = fn()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return times[len(times) // 2], (peak - base) / 1024, (current - base) / 1024
+
+
+def bench_parse(args):
+    import live_json
+    from replay import Recording, synthetic_match
+
+    rec = Recording.load(args.recording) if args.recording else synthetic_match(max(args.minutes, 40), seed=1)
+    body = allgamedata_body(rec)
+    total = len(rec.events)
+
+    def whole(decode, skip):
+        # What poll_full did before: the whole document, then two keys out of it
+        data = decode(body)
+        return data["gameData"]["gameTime"], data["events"]["Events"][skip:], len(data["events"]["Events"])
+
+    parsers = [("json.loads (before)", lambda skip: whole(json.loads, skip)),
+               ("selective, json", lambda skip: live_json.parse_allgamedata(body, skip, json.loads))]
+    if live_json.orjson:
+        parsers += [("orjson.loads", lambda skip: whole(live_json.orjson.loads, skip)),
+                    ("selective, orjson", lambda skip: live_json.parse_allgamedata(body, skip, live_json.orjson.loads))]
+
+    # Resync in a late game (a few new events) and a first connect (every event wanted)
+    cases = [("resync", max(total - 3, 0)), ("connect", 0)]
+    runs = max(args.runs, 1) * 200
+    print(f"parse: allgamedata {len(body) / 1024:.1f} KB, {total} events, {runs} runs each"
+          + ("" if live_json.orjson else " (orjson not installed)"))
+    print(f"{'case':<9} {'parser':<20} {'p50 ms':>8} {'peak KB':>9} {'kept KB':>9}")
+    results, same = {}, True
+    for case, skip in cases:
+        expected = whole(json.loads, skip)
+        for name, parse in parsers:
+            same = same and parse(skip) == expected
+            p50, peak, kept = measure_parse(lambda: parse(skip), runs)
+            print(f"{case:<9} {name:<20} {p50:>8.3f} {peak:>9.1f} {kept:>9.1f}")
+            results[f"{case}/{name}"] = {"p50_ms": p50, "peak_kb": peak, "kept_kb": kept}
+    print(f"same events and game time from every parser: {'yes' if same else 'NO'}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"bytes": len(body), "events": total, "results": results, "same": same}, f, indent=2)
+    return 0 if same else 1
+
+
+# --- STARTUP ---
+
+# What each entry point has to import before it can poll (headless pulls the backend in from main())
+STARTUP_TARGETS = {
+    "headless": "import headless, rift_backend",
+    "headless+mixer": "import headless, rift_backend, mixer",
+    "gui": "import main",
+}
+
+
+def import_times(statement):
+    """Runs statement under -X importtime in a fresh interpreter: (wall ms, {module: cumulative us}) or None."""
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", statement], capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - start) * 1000.0
+    if proc.returncode != 0:
+        return None
+    modules = {}
+    for line in proc.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line: continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not name.startswith("  "):  # top level only, nested imports are inside the cumulative
+            modules[name.strip()] = int(cumulative)
+    return wall_ms, modules
+
+
+def bench_startup(args):
+    results = {}
+    print(f"{'target':<16} {'wall ms':>9} {'import ms':>10}  heaviest imports")
+    for target, statement in STARTUP_TARGETS.items():
+        runs = [import_times(statement) for _ in range(args.runs)]
+        if None in runs:
+            print(f"{target:<16} {'n/a':>9} {'n/a':>10}  (import failed)")
+            continue
+        wall_ms = sorted(r[0] for r in runs)[len(runs) // 2]
+        modules = runs[-1][1]
+        import_ms = sum(modules.values()) / 1000.0
+        heaviest = sorted(modules.items(), key=lambda m: -m[1])[:4]
+        print(f"{target:<16} {wall_ms:>9.0f} {import_ms:>10.0f}  " + ", ".join(f"{m} {us / 1000.0:.0f}" for m, us in heaviest))
+        results[target] = {"wall_ms": wall_ms, "import_ms": import_ms, "heaviest": dict(heaviest)}
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+# --- HUB FAN-OUT ---
+
+FANOUT_SLOW_MS = 0.5
+FANOUT_BURST = 100       # messages per poll, published back to back
+FANOUT_POLL_MS = 20      # the slow subscriber keeps up with announcements, not with hints
+
+
+def fanout_stream(count, seed=0):
+    """Hub traffic shaped like a busy fight: mostly ticks and prepare hints, some sounds."""
+    rng = random.Random(seed)
+    for i in range(count):
+        roll = rng.random()
+        if roll < 0.1:
+            yield {"type": "sound", "category": "kills", "key": "double", "seq": i}
+        elif roll < 0.15:
+            yield {"type": "status", "connected": True}
+        elif roll < 0.3:
+            yield {"type": "event", "event": {"EventID": i, "EventName": "ChampionKill"}, "game_time": i / 10}
+        elif roll < 0.6:
+            yield {"type": "prepare", "sounds": [["kills", "triple"]]}
+        else:
+            yield {"type": "tick", "game_time": i / 10}
+
+
+def bench_fanout(args):
+    """A fast and a slow local subscriber on one hub: the slow one may lose hints, never sounds."""
+    from hub import Hub
+
+    hub = Hub()
+    received = {"fast": [], "slow": []}
+
+    def fast(msg):
+        received["fast"].append(msg)
+
+    def slow(msg):
+        received["slow"].append(msg)
+        time.sleep(FANOUT_SLOW_MS / 1000)
+
+    subs = {"fast": hub.subscribe(fast, "fast"), "slow": hub.subscribe(slow, "slow")}
+    messages = list(fanout_stream(args.events // 20))
+    publish_s = 0.0
+    for i in range(0, len(messages), FANOUT_BURST):
+        start = time.perf_counter()
+        for msg in messages[i:i + FANOUT_BURST]:
+            hub.publish(msg)
+        publish_s += time.perf_counter() - start
+        time.sleep(FANOUT_POLL_MS / 1000)
+    deadline = time.monotonic() + 60
+    while any(sub.buffer for sub in subs.values()) and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    sent = [m["seq"] for m in messages if m["type"] == "sound"]
+    print(f"fanout: {len(messages):,} messages, {len(sent):,} sounds, "
+          f"{publish_s / len(messages) * 1e6:.1f} us/publish, bursts of {FANOUT_BURST} every {FANOUT_POLL_MS} ms, "
+          f"slow handler {FANOUT_SLOW_MS} ms")
+    print(f"{'subscriber':<10} {'received':>9} {'dropped':>8} {'sounds':>8}  every sound in order")
+    results = {}
+    for name, msgs in received.items():
+        got = [m["seq"] for m in msgs if m["type"] == "sound"]
+        ok = got == sent
+        results[name] = {"received": len(msgs), "dropped": subs[name].dropped, "sounds": len(got), "ok": ok}
+        print(f"{name:<10} {len(msgs):>9,} {subs[name].dropped:>8,} {len(got):>8,}  {'yes' if ok else 'NO'}")
+    for sub in subs.values():
+        hub.remove(sub)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0 if all(r["ok"] for r in results.values()) else 1
+
+
+BENCHMARKS = {
+    "dedup": bench_dedup,
+    "fanout": bench_fanout,
+    "latency": bench_latency,
+    "parse": bench_parse,
+    "rebuild": bench_rebuild,
+    "rules": bench_rules,
+    "startup": bench_startup,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rift Echo headless benchmarks")
+    parser.add_argument("name", choices=sorted(BENCHMARKS))
+    parser.add_argument("--events", type=int, default=200_000, help="synthetic events to replay")
+    parser.add_argument("--recording", help="replay file from replay.py instead of a synthetic match")
+    parser.add_argument("--minutes", type=float, default=4, help="length of the synthetic match")
+    parser.add_argument("--speed", type=float, default=5, help="replay speed multiplier")
+    parser.add_argument("--pack", help="voice pack folder under assets/")
+    parser.add_argument("--cold", action="store_true", help="don't preload the pack (measure decode on demand)")
+    parser.add_argument("--mixer", action="store_true", help="model the software mixer instead of one player per clip")
+    parser.add_argument("--tick", type=float, default=0, help="latency: poll the audio worker every N ms (old loop) instead of waking it")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per startup target (rebuild: x20 passes)")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args(argv)
+    return BENCHMARKS[args.name](args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,260 @@
+"""
+Event rules from rules.json, compiled once into a dispatch table keyed by EventName.
+
+Sounds are written "category/key" (keys may use {EventField} placeholders). Players are
+resolved to a role relative to us once per match (RiftBackend.update_roles):
+
+    self    the active player
+    ally    same team (self falls back to ally)
+    enemy   other team
+    none    not a player: minions, turrets, monsters (executions)
+
+Role tables are expanded with their "*" fallback at load, so every lookup at dispatch
+time is a single dict get. Rule kinds:
+
+    sound/sounds   one sound, or a table by the role/value of "field" ("as": player|team|value)
+    before         only while game time is below this (late reconnects skip it)
+    timers         [{"delay", "sound", "slot"}] scheduled on the tracker
+    tally          count events per side, announce the side with more every N events (grubs)
+    kill           champion kills: executions, slain chain, sprees, shutdowns
+"""
+import json
+import logging
+from string import Formatter
+
+log = logging.getLogger(__name__)
+
+RULES_FILE = "rules.json"
+ROLES = ("self", "ally", "enemy", "none")
+FALLBACK = {"self": ("self", "ally", "*"), "ally": ("ally", "*"), "enemy": ("enemy", "*"), "none": ("none", "*")}
+# Roles a rule condition matches ("ally" includes ourselves)
+MATCHES = {"self": ("self",), "ally": ("self", "ally"), "enemy": ("enemy",), "none": ("none",)}
+
+
+class Template:
+    """
+    "{EventField}" placeholders filled from an event (missing fields -> ""). Results are
+    memoized by the field values, which only take a handful of values per match.
+    """
+    __slots__ = ("text", "fields", "cache")
+    MAX_CACHED = 256
+
+    def __init__(self, text):
+        self.text = text
+        self.fields = tuple(name for _, name, _, _ in Formatter().parse(text) if name)
+        self.cache = {}
+
+    def __call__(self, event):
+        fields = self.fields
+        values = event.get(fields[0], "") if len(fields) == 1 else tuple([event.get(f, "") for f in fields])
+        text = self.cache.get(values)
+        if text is None:
+            if len(self.cache) >= self.MAX_CACHED: self.cache.clear()
+            mapping = {fields[0]: values} if len(fields) == 1 else dict(zip(fields, values))
+            text = self.cache[values] = self.text.format_map(mapping)
+        return text
+
+
+def parse_sound(spec):
+    """"category/key" -> (category, key)."""
+    category, _, key = spec.partition("/")
+    if not key:
+        raise ValueError(f"Sound '{spec}' must be 'category/key'")
+    return category, key
+
+
+class TemplatedResult:
+    """A result tuple whose keys have placeholders, rendered (and memoized) per event."""
+    __slots__ = ("sounds",)
+
+    def __init__(self, sounds):
+        self.sounds = tuple((category, Template(key)) for category, key in sounds)
+
+    def __call__(self, event):
+        return tuple((category, key(event)) for category, key in self.sounds)
+
+
+def role_table(spec):
+    """{role or "*": sound} -> {role: sound or None} for every role, fallbacks applied."""
+    sounds = {role: parse_sound(s) for role, s in spec.items()}
+    return {role: next((sounds[r] for r in FALLBACK[role] if r in sounds), None) for role in ROLES}
+
+
+def result(sound):
+    """What fire() returns for one optional sound: a ready-made tuple, shared by every call."""
+    return (sound,) if sound else ()
+
+
+class SoundRule:
+    """
+    One optional sound per event, from a table keyed by whatever "as" resolves the field
+    to. compile() turns it into a closure over the table for that kind of lookup; the
+    before / timers / placeholder wrapper is only added for rules that use them.
+    """
+    __slots__ = ("name", "field", "resolve", "table", "default", "before", "timers", "templated", "fire")
+
+    def __init__(self, name, spec):
+        self.name = name
+        self.field = spec.get("field")
+        self.before = spec.get("before")
+        self.timers = [(t["delay"],) + parse_sound(t["sound"]) + (Template(t["slot"]) if t.get("slot") else None,)
+                       for t in spec.get("timers", ())]
+        self.resolve = spec.get("as", "value")
+        self.table, self.default = {}, ()
+        if "sound" in spec:
+            self.default = result(parse_sound(spec["sound"]))
+            self.resolve = None
+        elif self.resolve == "value":
+            sounds = dict(spec.get("sounds", {}))
+            default = sounds.pop("*", None)
+            self.table = {value: result(parse_sound(s)) for value, s in sounds.items()}
+            self.default = result(parse_sound(default) if default else None)
+        else:
+            self.table = {role: result(s) for role, s in role_table(spec.get("sounds", {})).items()}
+        self.templated = any("{" in key for sounds in list(self.table.values()) + [self.default] for _, key in sounds)
+        if self.templated:
+            self.table = {k: TemplatedResult(v) if v else v for k, v in self.table.items()}
+            self.default = TemplatedResult(self.default) if self.default else self.default
+        self.fire = self.compile()
+
+    def compile(self):
+        table, default, field = self.table, self.default, self.field
+        if self.resolve is None:
+            def lookup(ctx, event, game_time):
+                return default
+        elif self.resolve == "value":
+            def lookup(ctx, event, game_time):
+                return table.get(event.get(field), default)
+        elif self.resolve == "player":
+            def lookup(ctx, event, game_time):
+                return table[ctx.roles.get(event.get(field), "none")]
+        elif self.resolve == "team":
+            def lookup(ctx, event, game_time):
+                return table["ally" if event.get(field) == ctx.my_team else "enemy"]
+        else:
+            raise ValueError(f"Rule {self.name}: unknown \"as\": {self.resolve}")
+
+        before, timers, templated = self.before, self.timers, self.templated
+        if before is None and not timers and not templated:
+            return lookup
+
+        def fire(ctx, event, game_time):
+            if before is not None and game_time >= before: return ()
+            for delay, category, key, slot in timers:
+                ctx.tracker.schedule_timer(game_time, delay, category, key, slot=slot(event) if slot else None)
+            sounds = lookup(ctx, event, game_time)
+            return sounds(event) if templated and sounds else sounds
+        return fire
+
+
+class TallyRule:
+    """Credits each event to the killer's side; every `every` events the side with more gets its sound."""
+    __slots__ = ("name", "field", "every", "results")
+
+    def __init__(self, name, spec):
+        self.name = name
+        self.field = spec.get("field", "KillerName")
+        self.every = spec["tally"]["every"]
+        self.results = {side: result(parse_sound(s)) for side, s in spec["tally"]["sounds"].items()}
+
+    def fire(self, ctx, event, game_time):
+        # [events, ally, enemy] per rule, kept on the tracker so it resets with the match
+        tally = ctx.tracker.tallies.get(self.name)
+        if tally is None:
+            tally = ctx.tracker.tallies[self.name] = [0, 0, 0]
+        tally[0] += 1
+        tally[1 if ctx.roles.get(event.get(self.field)) in ("self", "ally") else 2] += 1
+        if tally[0] < self.every: return ()
+        winner = "ally" if tally[1] > tally[2] else "enemy"
+        tally[0] = tally[1] = tally[2] = 0
+        return self.results.get(winner, ())
+
+
+class KillRule:
+    """
+    ChampionKill: executions by victim role, otherwise the first matching "slain" check,
+    then the killer's spree and a shutdown if the victim was on one. The slain chain is
+    expanded into a (killer role, victim role) table and sprees into a list by streak.
+    """
+    __slots__ = ("name", "executed", "slain", "sprees", "shutdown_streak", "shutdown")
+
+    def __init__(self, name, spec):
+        self.name = name
+        spec = spec["kill"]
+        self.executed = {role: result(s) for role, s in role_table(spec.get("executed", {})).items()}
+        chain = [(who, role, parse_sound(s)) for who, role, s in spec.get("slain", ())]
+        self.slain = {}
+        for killer in ROLES:
+            for victim in ROLES:
+                roles = {"killer": killer, "victim": victim}
+                self.slain[killer, victim] = next((s for who, role, s in chain if roles[who] in MATCHES[role]), None)
+
+        # {"3": "rampage", "8+": "legendary"} -> [None, None, None, "rampage", ..., "legendary"],
+        # the last entry covers every longer streak ("+") or none of them
+        thresholds = spec.get("sprees", {})
+        names = {int(k.rstrip("+")): v for k, v in thresholds.items()}
+        names = [names.get(n) for n in range(max(names, default=0) + 1)]
+        if not any(k.endswith("+") for k in thresholds):
+            names.append(None)
+        self.sprees = {role: [(s[0], s[1].format(spree=n)) if (s and n) else None for n in names]
+                       for role, s in role_table(spec.get("spree", {})).items()}
+        self.shutdown_streak = spec.get("shutdown_streak", 3)
+        self.shutdown = role_table(spec.get("shutdown", {}))
+
+    def fire(self, ctx, event, game_time):
+        roles = ctx.roles
+        killer, victim = event["KillerName"], event["VictimName"]
+        killer_role = roles.get(killer, "none")
+        if killer_role == "none":
+            return self.executed[roles.get(victim, "none")]
+
+        tracker = ctx.tracker
+        streak = tracker.add_kill(killer)
+        was_shutdown = tracker.reset_streak(victim, self.shutdown_streak)
+        sounds = []
+        slain = self.slain[killer_role, roles.get(victim, "none")]
+        if slain: sounds.append(slain)
+        sprees = self.sprees[killer_role]
+        spree = sprees[streak if streak < len(sprees) else -1]
+        if spree: sounds.append(spree)
+        if was_shutdown:
+            shutdown = self.shutdown[killer_role]
+            if shutdown: sounds.append(shutdown)
+        return sounds
+
+    def next_sounds(self, ctx):
+        """What the next kill by or of a player on a streak would announce: the next spree, the shutdown."""
+        roles, sounds = ctx.roles, set()
+        for player, streak in ctx.tracker.streaks.items():
+            role = roles.get(player, "none")
+            if not streak or role == "none": continue
+            sprees = self.sprees[role]
+            spree = sprees[streak + 1 if streak + 1 < len(sprees) else -1]
+            if spree: sounds.add(spree)
+            if streak >= self.shutdown_streak:
+                # Ended by someone on the other side
+                for killer_role in (("enemy",) if role != "enemy" else ("self", "ally")):
+                    if self.shutdown[killer_role]: sounds.add(self.shutdown[killer_role])
+        return sounds
+
+
+class EventRules:
+    """Compiled rules: dispatch maps EventName to fire(ctx, event, game_time) -> ((category, key), ...)."""
+    def __init__(self, spec):
+        self.static_timers = [(t,) + parse_sound(s) for t, s in spec.get("static_timers", ())]
+        self.rules = {}
+        for name, rule in spec.get("events", {}).items():
+            if "kill" in rule: self.rules[name] = KillRule(name, rule)
+            elif "tally" in rule: self.rules[name] = TallyRule(name, rule)
+            else: self.rules[name] = SoundRule(name, rule)
+        self.dispatch = {name: rule.fire for name, rule in self.rules.items()}
+
+
+def load_rules(path=RULES_FILE):
+    try:
+        with open(path, "r") as f:
+            spec = json.load(f)
+    except (OSError, ValueError) as e:
+        log.warning("[Rules] Could not load %s: %s", path, e)
+        spec = {}
+    return EventRules(spec)
@@ -0,0 +1,135 @@
+"""
+Rift Echo without the window: same backend and announcer, no customtkinter or Tk.
+Meant to be started as a background service when the game launches.
+
+    python headless.py [--pack NAME] [--volume 0.5] [--sequential] [--null] [--url URL] [--hub] [--process]
+                       [--log-level DEBUG] [--metrics-port 29998] [--trace trace.jsonl]
+
+--null keeps time without opening an audio device (smoke runs against replay.py).
+--process moves decoding and playback into a worker process (audio_process.py).
+Metrics are served on 127.0.0.1:29998/metrics unless --metrics-port 0 (metrics.py).
+Ctrl+C stops it and prints the session stats.
+"""
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+
+import logs
+import metrics
+from audio_engine import ASSETS_DIR, AudioEngine, LoopStats, load_event_map
+from pack_index import PackIndex
+
+log = logging.getLogger(__name__)
+
+ALIVE_CHECK_SECONDS = 1.0  # how often an idle loop checks the backend is still running
+
+
+class HeadlessAnnouncer:
+    """The app_interface RiftBackend talks to: audio goes to the engine, status to the console."""
+    def __init__(self, engine):
+        self.engine = engine
+        self.connected = None
+
+    def trigger_audio(self, category, key, log_msg=""):
+        self.engine.trigger(category, key)
+
+    def prepare_audio(self, sounds):
+        self.engine.prepare(sounds)
+
+    def set_status(self, connected):
+        if connected == self.connected: return
+        self.connected = connected
+        log.info("[Status] CONNECTED" if connected else "[Status] DISCONNECTED")
+
+
+def default_pack(event_map):
+    packs = PackIndex(ASSETS_DIR, event_map)
+    packs.refresh()
+    names = packs.names()
+    return names[0] if names else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rift Echo announcer without the GUI")
+    parser.add_argument("--pack", help="voice pack folder under assets/ (default: first one)")
+    parser.add_argument("--volume", type=float, default=0.5)
+    parser.add_argument("--sequential", action="store_true", help="one player per clip instead of the mixer")
+    parser.add_argument("--null", action="store_true", help="no audio device, only keep time")
+    parser.add_argument("--url", help="Live Client API base URL (e.g. from replay.py serve)")
+    parser.add_argument("--hub", action="store_true", help="share the game poller through hub.py (join or start it)")
+    parser.add_argument("--process", action="store_true", help="run the audio engine in its own process")
+    parser.add_argument("--log-level", help="DEBUG shows every queued clip, poll and timer (default: INFO, or $RIFT_ECHO_LOG)")
+    parser.add_argument("--metrics-port", type=int, default=metrics.METRICS_PORT, help="Prometheus text endpoint, 0 to turn it off")
+    parser.add_argument("--trace", help="append fetch/event/clip timings as JSON lines to this (rotating) file")
+    args = parser.parse_args(argv)
+    logs.setup(args.log_level, args.trace)
+    if args.metrics_port:
+        metrics.serve(args.metrics_port)
+
+    event_map = load_event_map()
+    output = "null" if args.null else "pyglet"
+    if args.process:
+        from audio_process import AudioProcess
+        engine = AudioProcess(event_map, use_mixer=not args.sequential, output=output)
+    else:
+        engine = AudioEngine(event_map, use_mixer=not args.sequential, output=output)
+    engine.set_volume(args.volume)
+    pack = args.pack or default_pack(event_map)
+    if pack:
+        engine.set_pack(os.path.join(ASSETS_DIR, pack))
+        log.info("[Audio] Voice pack: %s", pack)
+    else:
+        log.warning("[Audio] No voice pack found in %s/", ASSETS_DIR)
+
+    # Imported only now: requests/urllib3 are the bulk of the backend's import time
+    from rift_backend import LIVE_CLIENT_URL, RiftBackend
+    announcer = HeadlessAnnouncer(engine)
+    if args.hub:
+        from hub import deliver, join_or_start
+        backend = join_or_start(event_map, lambda msg: deliver(announcer, msg), "headless", args.url or LIVE_CLIENT_URL)
+        alive = lambda: True
+    else:
+        backend = RiftBackend(announcer, event_map, base_url=args.url or LIVE_CLIENT_URL)
+        backend.start()
+        alive = backend.is_alive
+
+    # The loop sleeps until a trigger wakes it or the engine's next clip ends
+    wake = threading.Event()
+    engine.on_wake = wake.set
+    loop = LoopStats()
+    next_step = time.monotonic()
+    stalled = False
+    try:
+        while alive():
+            timeout = ALIVE_CHECK_SECONDS if next_step is None else min(max(next_step - time.monotonic(), 0.0), ALIVE_CHECK_SECONDS)
+            woke = wake.wait(timeout)
+            if not woke and (next_step is None or time.monotonic() < next_step): continue
+            wake.clear()
+            loop.wake("trigger" if woke else "scheduled")
+            try:
+                delay = engine.step()
+                if args.process and engine.stalled() != stalled:
+                    stalled = not stalled
+                    if stalled: log.warning("[Audio Process] Stalled: no health report")
+                    else: log.info("[Audio Process] Recovered")
+            except Exception as e:
+                log.error("[Worker Error] %s", e)
+                delay = None
+            next_step = None if delay is None else time.monotonic() + delay
+            loop.sleep(next_step is None)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        backend.stop()
+        if not args.hub:
+            backend.join(timeout=2)
+        log.info("[Loop] %s", loop.summary())
+        engine.log_stats()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
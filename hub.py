@@ -0,0 +1,384 @@
+"""
+Hub mode: one RiftBackend polls the Live Client API and fans out what it sees to any
+number of local subscribers (the Tk UI, headless announcer, overlays, stats loggers).
+
+Transport is newline-delimited JSON over TCP on 127.0.0.1. Every message has a "type":
+
+    hello    {"version", "connected"} sent first on every connection
+    status   {"connected"}
+    event    {"game_time", "event"}       raw Live Client event, after de-dup
+    sound    {"category", "key"}          what the rules announce for that event
+    timer    {"game_time", "category", "key"}  objective / respawn timer firing
+    tick     {"game_time"}                at most once per game second while in a game
+    prepare  {"sounds"}                   [category, key] pairs likely soon, to warm up (warmup.py)
+    dropped  {"count"}                    this subscriber fell behind, count messages lost
+
+The backend never waits on a subscriber: each one has a bounded buffer. When it can't
+keep up, hints (prepare, tick) are dropped first, oldest first; sound, timer, status and
+event messages are only dropped past four times the buffer, for a subscriber that has
+stopped reading altogether (status is re-sent after a drop).
+
+    python hub.py [--port 29999] [--url https://127.0.0.1:2999/liveclientdata]
+"""
+import argparse
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+from collections import deque
+
+import logs
+from rift_backend import LIVE_CLIENT_URL, RiftBackend
+
+log = logging.getLogger(__name__)
+
+HUB_HOST = "127.0.0.1"
+HUB_PORT = 29999
+HUB_VERSION = 1
+SUBSCRIBER_BUFFER = 256
+DROPPABLE = frozenset(("prepare", "tick"))  # hints: a newer one makes an older one pointless
+RECONNECT_SECONDS = 1.0
+
+
+class Subscriber:
+    """
+    Bounded mailbox for one consumer. offer() never blocks. Past maxlen it drops the
+    oldest hint (DROPPABLE); announcements only go, oldest first, past hard_limit.
+    """
+    def __init__(self, name, maxlen=SUBSCRIBER_BUFFER):
+        self.name = name
+        self.buffer = deque()
+        self.maxlen = maxlen
+        self.hard_limit = 4 * maxlen  # only a subscriber that stopped reading gets here
+        self.cond = threading.Condition()
+        self.closed = False
+        self.lost = 0       # dropped since the last "dropped" notice
+        self.sent = 0
+        self.dropped = 0
+
+    def offer(self, item):
+        with self.cond:
+            if self.closed: return
+            self.buffer.append(item)
+            if len(self.buffer) > self.maxlen and not self._drop_hint() and len(self.buffer) > self.hard_limit:
+                self.buffer.popleft()
+                self.lost += 1
+                self.dropped += 1
+            self.cond.notify()
+
+    def _drop_hint(self):
+        for i, (msg, _) in enumerate(self.buffer):
+            if msg["type"] in DROPPABLE:
+                del self.buffer[i]
+                self.lost += 1
+                self.dropped += 1
+                return True
+        return False
+
+    def take(self, timeout=None):
+        """Next item, ("dropped", n) after an overflow, or None when closed/timed out."""
+        with self.cond:
+            self.cond.wait_for(lambda: self.buffer or self.closed, timeout)
+            if self.closed or not self.buffer: return None
+            if self.lost:
+                lost, self.lost = self.lost, 0
+                return ("dropped", lost)
+            self.sent += 1
+            return self.buffer.popleft()
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+class Hub:
+    """Publishes messages to local (callback) and socket subscribers."""
+    def __init__(self, host=HUB_HOST, port=HUB_PORT, buffer=SUBSCRIBER_BUFFER):
+        self.host = host
+        self.port = port
+        self.buffer = buffer
+        self.subscribers = []
+        self.lock = threading.Lock()
+        self.connected = False
+        self.published = 0
+        self.server = None
+        self.backend = None
+        self.running = False
+
+    # --- PUBLISHING ---
+    def publish(self, msg):
+        """Encodes once, then hands the same (dict, bytes) pair to every subscriber."""
+        line = (json.dumps(msg, separators=(",", ":")) + "\n").encode()
+        with self.lock:
+            subscribers = list(self.subscribers)
+            self.published += 1
+        for sub in subscribers:
+            sub.offer((msg, line))
+
+    def set_connected(self, connected):
+        self.connected = connected
+        self.publish({"type": "status", "connected": connected})
+
+    def hello(self):
+        msg = {"type": "hello", "version": HUB_VERSION, "connected": self.connected}
+        return msg, (json.dumps(msg) + "\n").encode()
+
+    # --- SUBSCRIBERS ---
+    def add(self, sub):
+        with self.lock:
+            self.subscribers.append(sub)
+        sub.offer(self.hello())
+        return sub
+
+    def remove(self, sub):
+        sub.close()
+        with self.lock:
+            if sub in self.subscribers:
+                self.subscribers.remove(sub)
+
+    def subscribe(self, handler, name="local"):
+        """In-process subscriber: handler(msg dict) runs on its own thread."""
+        sub = self.add(Subscriber(name, self.buffer))
+        threading.Thread(target=self._local_worker, args=(sub, handler), daemon=True).start()
+        return sub
+
+    def _local_worker(self, sub, handler):
+        while True:
+            item = sub.take()
+            if item is None: return
+            if item[0] == "dropped":
+                handler({"type": "dropped", "count": item[1]})
+                handler({"type": "status", "connected": self.connected})
+                continue
+            try:
+                handler(item[0])
+            except Exception as e:
+                log.error("[Hub] Subscriber %s failed: %s", sub.name, e)
+
+    # --- SOCKET SERVER ---
+    def start(self):
+        """Listens for socket subscribers. Returns False if the port is taken (another hub)."""
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        if os.name == "nt":
+            # Windows SO_REUSEADDR would let a second hub bind the same port
+            server.setsockopt(socket.SOL_SOCKET, socket.SO_EXCLUSIVEADDRUSE, 1)
+        else:
+            # Restarting right after a hub exits: don't fail on its TIME_WAIT connections
+            server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            server.bind((self.host, self.port))
+        except OSError:
+            server.close()
+            return False
+        server.listen(8)
+        self.port = server.getsockname()[1]
+        self.server = server
+        self.running = True
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        log.info("[Hub] Serving on %s:%s", self.host, self.port)
+        return True
+
+    def _accept_loop(self):
+        while self.running:
+            try:
+                conn, addr = self.server.accept()
+            except OSError:
+                return
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sub = self.add(Subscriber(f"{addr[0]}:{addr[1]}", self.buffer))
+            threading.Thread(target=self._socket_writer, args=(sub, conn), daemon=True).start()
+            log.info("[Hub] Subscriber connected: %s", sub.name)
+
+    def _socket_writer(self, sub, conn):
+        try:
+            while True:
+                item = sub.take()
+                if item is None: return
+                if item[0] == "dropped":
+                    conn.sendall(json.dumps({"type": "dropped", "count": item[1]}).encode() + b"\n")
+                    conn.sendall(json.dumps({"type": "status", "connected": self.connected}).encode() + b"\n")
+                    continue
+                conn.sendall(item[1])
+        except OSError:
+            pass
+        finally:
+            self.remove(sub)
+            conn.close()
+            log.info("[Hub] Subscriber left: %s (sent %d, dropped %d)", sub.name, sub.sent, sub.dropped)
+
+    def stop(self):
+        self.running = False
+        if self.backend:
+            self.backend.stop()
+        if self.server:
+            # shutdown() first: a bare close() leaves the port bound while accept() is blocked on it
+            try: self.server.shutdown(socket.SHUT_RDWR)
+            except OSError: pass
+            self.server.close()
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for sub in subscribers:
+            self.remove(sub)
+
+    def stats(self):
+        with self.lock:
+            return {"published": self.published,
+                    "subscribers": {s.name: {"sent": s.sent, "dropped": s.dropped, "pending": len(s.buffer)} for s in self.subscribers}}
+
+
+class HubPublisher:
+    """app_interface for a RiftBackend that only feeds the hub."""
+    def __init__(self, hub):
+        self.hub = hub
+
+    def trigger_audio(self, category, key, log_msg=""):
+        self.hub.publish({"type": "sound", "category": category, "key": key})
+
+    def prepare_audio(self, sounds):
+        self.hub.publish({"type": "prepare", "sounds": [list(sound) for sound in sounds]})
+
+    def set_status(self, connected):
+        self.hub.set_connected(connected)
+
+
+class HubBackend(RiftBackend):
+    """RiftBackend that also publishes raw events and tells timer firings apart from event sounds."""
+    def __init__(self, hub, config_map, **kwargs):
+        super().__init__(HubPublisher(hub), config_map, **kwargs)
+        self.hub = hub
+        self.last_tick = None
+
+    def dispatch_event(self, event, game_time):
+        self.hub.publish({"type": "event", "game_time": game_time, "event": event})
+        super().dispatch_event(event, game_time)
+
+    def fire_timers(self, game_time):
+        for category, key in self.tracker.check_timers(game_time):
+            self.hub.publish({"type": "timer", "game_time": game_time, "category": category, "key": key})
+        if self.last_tick is None or int(game_time) != self.last_tick:
+            self.last_tick = int(game_time)
+            self.hub.publish({"type": "tick", "game_time": game_time})
+
+
+class HubClient(threading.Thread):
+    """
+    Socket subscriber: handler(msg dict) per message, reconnecting while the hub is down.
+    With an event_map it takes over when the hub goes away: the first client to bind the
+    port becomes the hub (and polls the game), the others reconnect to it.
+    """
+    def __init__(self, handler, host=HUB_HOST, port=HUB_PORT, event_map=None, base_url=LIVE_CLIENT_URL, name="client"):
+        super().__init__(daemon=True)
+        self.handler = handler
+        self.host = host
+        self.port = port
+        self.event_map = event_map
+        self.base_url = base_url
+        self.name = name
+        self.running = True
+        self.sock = None
+        self.hub = None  # the Hub this client became, if it took over
+
+    def run(self):
+        while self.running:
+            try:
+                self.sock = socket.create_connection((self.host, self.port), timeout=RECONNECT_SECONDS)
+                self.sock.settimeout(None)
+                for line in self.sock.makefile("rb"):
+                    self.handler(json.loads(line))
+            except (OSError, ValueError):
+                pass
+            if not self.running: return
+            # Hub gone: report it like a lost game connection, then become it or retry
+            self.handler({"type": "status", "connected": False})
+            if self.take_over(): return
+            time.sleep(RECONNECT_SECONDS)
+
+    def take_over(self):
+        if self.event_map is None: return False
+        hub = start_hub(self.event_map, self.port, self.base_url)
+        if hub is None: return False
+        log.info("[Hub] Hub on port %s went away, taking over", self.port)
+        hub.subscribe(self.handler, self.name)
+        self.hub = hub
+        if not self.running: hub.stop()  # stop() came in while the hub was starting
+        return True
+
+    def stop(self):
+        self.running = False
+        if self.hub:
+            self.hub.stop()
+        if self.sock:
+            try: self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError: pass
+
+
+def start_hub(event_map, port=HUB_PORT, base_url=LIVE_CLIENT_URL):
+    """Starts a hub with its backend, or returns None if the port is already taken."""
+    hub = Hub(port=port)
+    if not hub.start(): return None
+    backend = HubBackend(hub, event_map, base_url=base_url)
+    backend.daemon = True
+    backend.start()
+    hub.backend = backend
+    return hub
+
+
+def join_or_start(event_map, handler, name, base_url=LIVE_CLIENT_URL, port=HUB_PORT):
+    """
+    Subscribes handler to the hub on port, becoming that hub (with the one backend) if
+    none is running yet, or later if the hub it joined exits. Returns the Hub or
+    HubClient, both have stop().
+    """
+    hub = start_hub(event_map, port, base_url)
+    if hub:
+        hub.subscribe(handler, name)
+        return hub
+    log.info("[Hub] Joining the hub already running on port %s", port)
+    client = HubClient(handler, port=port, event_map=event_map, base_url=base_url, name=name)
+    client.start()
+    return client
+
+
+def deliver(app, msg):
+    """Feeds a hub message to an app_interface (trigger_audio / set_status)."""
+    kind = msg["type"]
+    if kind == "sound" or kind == "timer":
+        app.trigger_audio(msg["category"], msg["key"])
+    elif kind == "status" or kind == "hello":
+        app.set_status(msg["connected"])
+    elif kind == "prepare" and hasattr(app, "prepare_audio"):
+        app.prepare_audio([tuple(sound) for sound in msg["sounds"]])
+
+
+def main(argv=None):
+    from audio_engine import load_event_map
+
+    parser = argparse.ArgumentParser(description="Poll the game once and fan out events to local subscribers")
+    parser.add_argument("--port", type=int, default=HUB_PORT)
+    parser.add_argument("--url", default=LIVE_CLIENT_URL, help="Live Client API base URL")
+    parser.add_argument("--log-level", help="DEBUG shows every poll and timer (default: INFO, or $RIFT_ECHO_LOG)")
+    args = parser.parse_args(argv)
+    logs.setup(args.log_level)
+
+    hub = start_hub(load_event_map(), args.port, args.url)
+    if hub is None:
+        log.error("[Hub] Port %s is already in use (another hub running?)", args.port)
+        return 1
+    try:
+        while hub.backend.is_alive():
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for name, s in hub.stats()["subscribers"].items():
+            log.info("[Hub] %s: sent %d, dropped %d", name, s["sent"], s["dropped"])
+        hub.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""
+Selective parsing of Live Client API payloads.
+
+From an allgamedata document the backend needs gameData.gameTime and the events it
+hasn't seen yet. Most of the bytes, and most of the parse time, are everything else:
+each player's items, runes and scores, and the active player's abilities and stats.
+parse_allgamedata() reads the game clock with a regex and decodes only the tail of
+events.Events from `skip` on. The events before that are counted and stepped over at
+bytes.find speed, and no objects are built for them. If anything doesn't look the
+way the API sends it, the whole document is decoded as before.
+
+Events are found by their "EventName" key. Inside a JSON string the quotes would be
+escaped, so that byte sequence only ever appears as the key, exactly once per event.
+
+orjson is used for the decoding when it is installed (pip install orjson), json otherwise.
+"""
+import json
+import re
+
+import metrics
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+FAST_JSON = orjson is not None
+
+GAME_DATA = re.compile(rb'"gameData"\s*:\s*\{')
+GAME_TIME = re.compile(rb'"gameTime"\s*:\s*(-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)')
+EVENTS = re.compile(rb'"Events"\s*:\s*\[\s*')
+EVENT_NAME = b'"EventName"'
+# Rest of the last event (flat: strings, numbers, lists of strings such as Assisters) and the ]
+LAST_EVENT_END = re.compile(rb'(?:[^{}"]|"(?:[^"\\]|\\.)*")*\}\s*\]')
+
+PARSES = metrics.counter("rift_allgamedata_parses_total", "allgamedata parses, selective or whole-document fallback", ("path",))
+
+
+def loads(body):
+    return orjson.loads(body) if orjson else json.loads(body)
+
+
+def game_time_of(body):
+    """gameData.gameTime as a float, or None."""
+    data = GAME_DATA.search(body)
+    if not data: return None
+    m = GAME_TIME.search(body, data.end())
+    # gameData is flat: a } before the key means gameTime isn't in it
+    if not m or body.find(b"}", data.end(), m.start()) != -1: return None
+    return float(m.group(1))
+
+
+def events_tail(body, skip, decode=loads):
+    """(events[skip:], len(events)) from the Events array in body, or None if it can't be cut out."""
+    m = EVENTS.search(body)
+    if not m: return None
+    start = m.end()
+    count = body.count(EVENT_NAME, start)
+    if not count:
+        return ([], 0) if body[start:start + 1] == b"]" else None
+    if skip >= count: return [], count
+
+    at = start - 1
+    for _ in range(skip + 1):
+        at = body.find(EVENT_NAME, at + 1)
+    first = body.rfind(b"{", start - 1, at)
+    end = LAST_EVENT_END.match(body, body.rfind(EVENT_NAME))
+    if first < 0 or not end: return None
+    try:
+        tail = decode(b"[" + body[first:end.end()])
+    except ValueError:
+        return None
+    return (tail, count) if len(tail) == count - skip else None
+
+
+def parse_allgamedata(body, skip=0, decode=loads):
+    """(gameTime, events[skip:], len(events)) from an allgamedata body; None if either is missing."""
+    game_time = game_time_of(body)
+    tail = events_tail(body, skip, decode) if game_time is not None else None
+    if tail is not None:
+        PARSES.labels("selective").inc()
+        return game_time, tail[0], tail[1]
+
+    PARSES.labels("full").inc()
+    data = decode(body)
+    try:
+        game_time = data["gameData"]["gameTime"]
+        events = data["events"]["Events"]
+    except (KeyError, TypeError):
+        return None
+    return game_time, events[skip:], len(events)
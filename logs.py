@@ -0,0 +1,89 @@
+"""
+Logging for the app and the headless announcer: leveled, and buffered so the threads
+that log (backend poll, audio loop, Tk) only put a record on a queue. A listener
+thread does the formatting and writing.
+
+    setup(level="INFO", trace_path=None)
+
+Per-event chatter ([Queue] Added, [Audio] Mixing, [Timer] Scheduled, [Poll]) is DEBUG;
+set RIFT_ECHO_LOG=DEBUG (or --log-level) to see it. Without setup() only warnings and
+errors reach stderr, which is what the benchmarks and CLI tools want.
+
+With trace_path, trace(kind, **fields) appends one JSON object per line to a rotating
+file (TRACE_MAX_BYTES, TRACE_BACKUPS old files kept): fetches, events and clips with
+their timings, for working out afterwards where the time went.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+LOG_LEVEL_ENV = "RIFT_ECHO_LOG"
+TRACE_LOGGER = "rift_echo.trace"
+TRACE_MAX_BYTES = 10 * 1024 * 1024
+TRACE_BACKUPS = 3
+QUIET_LOGGERS = ("urllib3", "requests")  # their DEBUG is a line per request
+
+trace_log = logging.getLogger(TRACE_LOGGER)
+trace_log.propagate = False
+tracing = False
+listener = None
+
+
+class JsonLines(logging.Formatter):
+    def format(self, record):
+        entry = {"t": round(record.created, 6), "kind": record.msg}
+        entry.update(getattr(record, "fields", {}))
+        return json.dumps(entry, separators=(",", ":"))
+
+
+def setup(level=None, trace_path=None):
+    """Routes every logger through one queue; safe to call again (e.g. in a child process)."""
+    global listener, tracing
+    stop()
+    level = (level or os.environ.get(LOG_LEVEL_ENV) or "INFO").upper()
+    records = queue.SimpleQueue()
+
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(logging.Formatter("%(message)s"))
+    console.addFilter(lambda record: record.name != TRACE_LOGGER)
+    handlers = [console]
+
+    root = logging.getLogger()
+    root.handlers[:] = [logging.handlers.QueueHandler(records)]
+    root.setLevel(level)
+    for name in QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    trace_log.handlers[:] = []
+    tracing = bool(trace_path)
+    if tracing:
+        trace_file = logging.handlers.RotatingFileHandler(trace_path, maxBytes=TRACE_MAX_BYTES, backupCount=TRACE_BACKUPS,
+                                                          encoding="utf-8", delay=True)
+        trace_file.setFormatter(JsonLines())
+        trace_file.addFilter(logging.Filter(TRACE_LOGGER))
+        handlers.append(trace_file)
+        trace_log.addHandler(logging.handlers.QueueHandler(records))
+        trace_log.setLevel(logging.INFO)
+
+    listener = logging.handlers.QueueListener(records, *handlers)
+    listener.start()
+
+
+def stop():
+    """Writes out whatever is still queued."""
+    global listener
+    if listener is not None:
+        listener.stop()
+        listener = None
+
+
+def trace(kind, **fields):
+    if tracing:
+        trace_log.info(kind, extra={"fields": fields})
+
+
+atexit.register(stop)
@@ -0,0 +1,183 @@
+"""
+Offline loudness levelling for voice packs.
+
+Every clip is measured once (gated block RMS in the spirit of BS.1770, without the
+K-weighting filter, plus sample peak) and the results are kept in a sidecar next to
+the WAVs. Playback only looks up a precomputed gain per file.
+
+    python loudness.py ["The Ancient Archmage" ...] [--workers N]
+
+The sidecar is keyed by size + mtime, with a content hash as fallback, so touching a
+file doesn't force a re-analysis and only clips that really changed are decoded again.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+log = logging.getLogger(__name__)
+
+INDEX_NAME = "loudness.json"
+INDEX_VERSION = 1
+
+TARGET_DB = -16.0       # every clip is levelled to this gated loudness
+MAX_BOOST_DB = 12.0
+MAX_CUT_DB = 18.0
+PEAK_CEILING_DB = -1.0  # a boost never pushes the peak above this
+BLOCK_SECONDS = 0.4
+ABSOLUTE_GATE_DB = -70.0
+RELATIVE_GATE_DB = -10.0
+PARALLEL_MIN = 8        # fewer stale clips than this are analysed in-process
+
+
+def index_path(pack_dir):
+    return os.path.join(pack_dir, INDEX_NAME)
+
+
+def file_digest(path):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def measure(samples, rate):
+    """(loudness dB, peak dBFS) of float samples shaped (frames, channels)."""
+    import numpy as np
+
+    if len(samples) == 0:
+        return ABSOLUTE_GATE_DB, ABSOLUTE_GATE_DB
+    power = np.square(samples, dtype=np.float64).mean(axis=1)
+    block = max(int(rate * BLOCK_SECONDS), 1)
+    if len(power) <= block:
+        blocks = np.array([power.mean()])
+    else:
+        # 75% overlapping blocks from one cumulative sum
+        total = np.concatenate(([0.0], np.cumsum(power)))
+        starts = np.arange(0, len(power) - block + 1, block // 4)
+        blocks = (total[starts + block] - total[starts]) / block
+    blocks_db = 10.0 * np.log10(blocks + 1e-12)
+    gated = blocks[blocks_db > ABSOLUTE_GATE_DB]
+    if len(gated) == 0:
+        loudness = ABSOLUTE_GATE_DB
+    else:
+        relative = 10.0 * np.log10(gated.mean()) + RELATIVE_GATE_DB
+        gated = gated[10.0 * np.log10(gated) > relative]
+        loudness = float(10.0 * np.log10(gated.mean()))
+    peak = float(np.abs(samples).max())
+    return loudness, float(20.0 * np.log10(max(peak, 1e-9)))
+
+
+def analyse_file(path, digest=None):
+    """Decodes and measures one clip. Runs in worker processes, so it only takes a path."""
+    from mixer import MIX_RATE, decode_wav
+
+    st = os.stat(path)
+    loudness, peak = measure(decode_wav(path).samples, MIX_RATE)
+    return {"hash": digest or file_digest(path), "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+            "loudness_db": round(loudness, 2), "peak_db": round(peak, 2)}
+
+
+def gain_db(entry, target=TARGET_DB):
+    gain = min(max(target - entry["loudness_db"], -MAX_CUT_DB), MAX_BOOST_DB)
+    return min(gain, PEAK_CEILING_DB - entry["peak_db"])
+
+
+def load_index(pack_dir):
+    try:
+        with open(index_path(pack_dir), "r") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if index.get("version") != INDEX_VERSION:
+        return {}
+    return index.get("clips", {})
+
+
+def load_gains(pack_dir, target=TARGET_DB):
+    """filename -> linear gain from the sidecar, without touching the WAVs."""
+    return {filename: 10.0 ** (gain_db(entry, target) / 20.0) for filename, entry in load_index(pack_dir).items()}
+
+
+def update_index(pack_dir, filenames, workers=None):
+    """
+    Brings the sidecar up to date for filenames and returns (clips, analysed).
+    Clips whose size+mtime match are trusted; otherwise the hash decides.
+    """
+    clips = load_index(pack_dir)
+    fresh, stale = {}, {}
+    for filename in sorted(set(filenames)):
+        path = os.path.join(pack_dir, filename)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        entry = clips.get(filename)
+        if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+            fresh[filename] = entry
+            continue
+        digest = file_digest(path)
+        if entry and entry["hash"] == digest:
+            fresh[filename] = dict(entry, size=st.st_size, mtime_ns=st.st_mtime_ns)
+            continue
+        stale[filename] = digest
+
+    if stale:
+        paths = [os.path.join(pack_dir, f) for f in stale]
+        if len(stale) < PARALLEL_MIN or workers == 1:
+            results = [safe_analyse(p, d) for p, d in zip(paths, stale.values())]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(safe_analyse, paths, stale.values()))
+        for filename, entry in zip(stale, results):
+            if entry: fresh[filename] = entry
+
+    if fresh != clips:
+        tmp_path = index_path(pack_dir) + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": INDEX_VERSION, "clips": fresh}, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, index_path(pack_dir))
+    return fresh, len(stale)
+
+
+def safe_analyse(path, digest=None):
+    try:
+        return analyse_file(path, digest)
+    except Exception as e:
+        log.warning("[Loudness] Failed to analyse %s: %s", os.path.basename(path), e)
+        return None
+
+
+def main(argv=None):
+    from audio_cache import pack_paths
+    from audio_engine import ASSETS_DIR, load_event_map
+
+    parser = argparse.ArgumentParser(description="Measure voice pack loudness and write the gain sidecar")
+    parser.add_argument("packs", nargs="*", help="pack folders under assets/ (default: all)")
+    parser.add_argument("--workers", type=int, help="analysis processes (default: one per core)")
+    parser.add_argument("--verbose", action="store_true", help="print every clip")
+    args = parser.parse_args(argv)
+
+    event_map = load_event_map()
+    packs = args.packs or sorted(d for d in os.listdir(ASSETS_DIR) if os.path.isdir(os.path.join(ASSETS_DIR, d)))
+    for name in packs:
+        pack_dir = os.path.join(ASSETS_DIR, name)
+        start = time.perf_counter()
+        filenames = [os.path.basename(p) for p in pack_paths(pack_dir, event_map)]
+        clips, analysed = update_index(pack_dir, filenames, args.workers)
+        gains = sorted(gain_db(entry) for entry in clips.values())
+        spread = f", gain {gains[0]:+.1f}..{gains[-1]:+.1f} dB" if gains else ""
+        print(f"[Loudness] {name}: {len(clips)} clips ({analysed} analysed) in {time.perf_counter() - start:.2f}s{spread}")
+        if args.verbose:
+            for filename, entry in sorted(clips.items()):
+                print(f"    {filename:<28} {entry['loudness_db']:>7.1f} dB  peak {entry['peak_db']:>6.1f}  gain {gain_db(entry):+.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
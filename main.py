@@ -1,17 +1,30 @@
 import customtkinter as ctk
+import logging
 import os
-import json
-import pyglet
+import queue
 import random
-import threading
 import shutil
-import queue 
-import time  
+import time
+import logs
+import metrics
 from rift_backend import RiftBackend
+from hub import deliver, join_or_start
+from audio_engine import ASSETS_DIR, AudioEngine, LoopStats, load_event_map
+from audio_process import AudioProcess
+from pack_index import PackIndex
 
 # --- CONFIGURATION ---
-ASSETS_DIR = "assets"
-CONFIG_FILE = "events.json"
+USE_MIXER = True
+USE_HUB = True  # share one game poller with overlays/loggers (see hub.py)
+USE_AUDIO_PROCESS = False  # decode and play in a separate process (see audio_process.py)
+PACK_WATCH_MS = 2000  # how often the assets folder is checked for added/removed packs
+LOG_LEVEL = None  # None: INFO, or $RIFT_ECHO_LOG; DEBUG shows every queued clip, poll and timer
+METRICS_PORT = metrics.METRICS_PORT  # Prometheus text on 127.0.0.1 (see metrics.py), None to turn off
+TRACE_FILE = None  # e.g. "trace.jsonl": fetch/event/clip timings as JSON lines, rotated
+
+log = logging.getLogger(__name__)
+
+UI_LAG = metrics.histogram("rift_ui_lag_seconds", "How late the Tk loop ran posted calls and after() callbacks", ("source",))
 
 # --- HEXTECH THEME PALETTE ---
 LOL_BG_DARK     = "#010A13"
@@ -33,13 +46,27 @@ class RiftEchoGUI(ctk.CTk):
         super().__init__()
         
         # --- AUDIO INIT (PYGLET) ---
-        self.player = pyglet.media.Player()
-        self.audio_queue = queue.Queue()
+        self.event_map = self.load_config()
+        if not os.path.exists(ASSETS_DIR): os.makedirs(ASSETS_DIR)
+        self.packs = PackIndex(ASSETS_DIR, self.event_map)
+        if USE_AUDIO_PROCESS:
+            self.audio = AudioProcess(self.event_map, use_mixer=USE_MIXER)
+        else:
+            # Same thread as watch_packs, so the engine reads the window's index
+            self.audio = AudioEngine(self.event_map, use_mixer=USE_MIXER, packs=self.packs)
         self.current_pack_path = ""
         self.is_muted = False
-        
-        # Time-based busy check
-        self.busy_until = 0.0
+
+        # Backend/hub threads never touch Tk: they post() calls that run on the Tk thread
+        self.inbox = queue.SimpleQueue()
+        self.inbox_pending = False
+        self.bind("<<Notify>>", self.drain_inbox)
+        self.audio.on_wake = lambda: self.post(self.audio_worker, "trigger")
+        self.audio_after = None
+        self.audio_due = None
+        self.loop_stats = LoopStats()
+        self.post_lag = UI_LAG.labels("post")
+        self.after_lag = UI_LAG.labels("after")
         
         # --- GUI SETUP ---
         self.title("HexVox")
@@ -56,26 +83,28 @@ class RiftEchoGUI(ctk.CTk):
         self.grid_rowconfigure(1, weight=1)
         
         self.create_widgets()
+        self.audio.set_volume(self.vol_slider.get())
         
         # --- BACKEND INIT ---
-        self.event_map = self.load_config()
         self.update_pack_path()
         
         # Start Audio Loop
         self.audio_worker()
+        self.watch_due = time.monotonic() + PACK_WATCH_MS / 1000.0
+        self.after(PACK_WATCH_MS, self.watch_packs)
         
         self.after(100, self.start_backend)
 
     def start_backend(self):
+        if USE_HUB:
+            # Join a running hub, or become it; either way the UI is just one subscriber
+            self.hub = join_or_start(self.event_map, lambda msg: deliver(self, msg), "ui")
+            return
         self.backend = RiftBackend(self, self.event_map)
         self.backend.start()
 
     def load_config(self):
-        try:
-            with open(CONFIG_FILE, "r") as f:
-                return json.load(f)
-        except:
-            return {}
+        return load_event_map()
 
     def create_widgets(self):
         # HEADER
@@ -94,6 +123,9 @@ class RiftEchoGUI(ctk.CTk):
         self.status_text = ctk.CTkLabel(self.status_frame, text="DISCONNECTED", font=("Arial", 10, "bold"), text_color=LOL_TEXT_DIM)
         self.status_text.pack(side="left", padx=(0, 8), pady=3)
 
+        self.audio_health = ctk.CTkLabel(self.header_frame, text="", font=("Arial", 9, "bold"), text_color=LOL_TEXT_DIM)
+        self.audio_health.pack(side="right", padx=(0, 10))
+
         # MAIN PANEL
         self.main_panel = ctk.CTkFrame(self, fg_color=LOL_PANEL, corner_radius=4, border_width=1, border_color=LOL_GOLD)
         self.main_panel.grid(row=1, column=0, sticky="nsew", padx=25, pady=(5, 25))
@@ -170,69 +202,88 @@ class RiftEchoGUI(ctk.CTk):
         self.mute_btn.pack(side="left")
 
     # --- LOGIC ---
-    def audio_worker(self):
+    def post(self, fn, *args):
+        """Runs fn(*args) on the Tk thread. Safe from any thread; one Tk event per burst."""
+        self.inbox.put((fn, args, time.monotonic()))
+        if self.inbox_pending: return
+        self.inbox_pending = True
+        try:
+            self.event_generate("<<Notify>>", when="tail")
+        except Exception as e:
+            # Window closing, or Tk refused the event: let the next post() try again
+            self.inbox_pending = False
+            log.warning("[UI] Could not queue <<Notify>>: %s", e)
+
+    def drain_inbox(self, event=None):
+        # Cleared before draining, so a post() racing with us raises a fresh event
+        self.inbox_pending = False
+        while True:
+            try:
+                fn, args, posted = self.inbox.get_nowait()
+            except queue.Empty:
+                return
+            self.post_lag.observe(time.monotonic() - posted)
+            fn(*args)
+
+    def audio_worker(self, reason="scheduled"):
         """
-        Background Loop that plays sounds sequentially.
+        Starts queued sounds by priority. Runs when a trigger arrives or when the engine
+        asked for another step (a clip ends); nothing is scheduled while it is idle.
         """
+        self.loop_stats.wake(reason)
+        if reason == "scheduled" and self.audio_due is not None:
+            self.after_lag.observe(max(time.monotonic() - self.audio_due, 0.0))
+        if self.audio_after is not None:
+            self.after_cancel(self.audio_after)
+            self.audio_after = None
         try:
-            # Important: Pump pyglet events to keep driver alive
-            pyglet.clock.tick()
-            
-            now = time.time()
-            
-            # Only process if we are past the busy time
-            if not self.is_muted and now >= self.busy_until:
-                try:
-                    category, key = self.audio_queue.get_nowait()
-                    filename = self.event_map.get(category, {}).get(key)
-                    
-                    if filename:
-                        full_path = os.path.join(self.current_pack_path, filename)
-                        if os.path.exists(full_path):
-                            try:
-                                # FIX: CREATE A FRESH PLAYER FOR EVERY SOUND
-                                # This ensures no "zombie" state from previous plays.
-                                new_player = pyglet.media.Player()
-                                source = pyglet.media.load(full_path, streaming=False)
-                                
-                                new_player.queue(source)
-                                new_player.volume = self.vol_slider.get()
-                                new_player.play()
-                                
-                                # Update global ref so Mute/Volume controls work on it
-                                self.player = new_player
-                                
-                                # Block queue for duration
-                                duration = source.duration
-                                if duration is None: duration = 1.0
-                                
-                                self.busy_until = now + duration + 0.1
-                                print(f"[Audio] Playing: {key} ({duration:.2f}s)")
-                                
-                            except Exception as e:
-                                print(f"[Audio Error] Failed to play {key}: {e}")
-                                self.busy_until = now 
-                        else:
-                            print(f"[Audio Error] File Missing: {filename}")
-                            self.busy_until = now
-                except queue.Empty:
-                    pass
-                    
+            delay = self.audio.step()
+            if USE_AUDIO_PROCESS: self.show_audio_health()
         except Exception as e:
-            print(f"[Worker Error] {e}")
-        
-        self.after(50, self.audio_worker)
+            log.error("[Worker Error] %s", e)
+            delay = None
+        self.audio_due = None
+        if delay is not None:
+            ms = max(int(delay * 1000), 1)
+            self.audio_due = time.monotonic() + ms / 1000.0
+            self.audio_after = self.after(ms, self.audio_worker)
+        self.loop_stats.sleep(delay is None)
+
+    def show_audio_health(self):
+        if self.audio.stalled():
+            text, color = "AUDIO STALLED", LOL_RED
+        else:
+            text, color = f"AUDIO {self.audio.health.get('command_ms_max', 0.0):.1f} ms", LOL_TEXT_DIM
+        if self.audio_health.cget("text") != text:
+            self.audio_health.configure(text=text, text_color=color)
 
     def trigger_audio(self, category, key, log_msg=""):
-        if self.is_muted: return
-        print(f"[Queue] Added: {key}")
-        self.audio_queue.put((category, key))
+        self.audio.trigger(category, key)
+
+    def prepare_audio(self, sounds):
+        self.audio.prepare(sounds)
 
     def scan_voice_packs(self):
-        if not os.path.exists(ASSETS_DIR): os.makedirs(ASSETS_DIR)
-        packs = [d for d in os.listdir(ASSETS_DIR) if os.path.isdir(os.path.join(ASSETS_DIR, d))]
+        self.packs.refresh()
+        packs = self.packs.names()
         return packs if packs else ["Default"]
 
+    def watch_packs(self):
+        """Picks up packs added or removed while running (one stat per pack when nothing changed)."""
+        self.after_lag.observe(max(time.monotonic() - self.watch_due, 0.0))
+        try:
+            name = self.pack_var.get()
+            before = self.packs.packs.get(name)
+            if self.packs.refresh():
+                self.refresh_packs()
+                # Files added to / removed from the pack in use: let the engine pick them up
+                if self.pack_var.get() == name and self.packs.packs.get(name) is not before:
+                    self.update_pack_path()
+        except OSError as e:
+            log.warning("[Pack] Scan failed: %s", e)
+        self.watch_due = time.monotonic() + PACK_WATCH_MS / 1000.0
+        self.after(PACK_WATCH_MS, self.watch_packs)
+
     def refresh_packs(self):
         self.pack_options = self.scan_voice_packs()
         self.pack_dropdown.configure(values=self.pack_options)
@@ -245,8 +296,13 @@ class RiftEchoGUI(ctk.CTk):
 
     def update_pack_path(self):
         self.current_pack_path = os.path.join(ASSETS_DIR, self.pack_var.get())
+        self.audio.set_pack(self.current_pack_path)
 
     def set_status(self, connected):
+        # Called from the backend / hub thread
+        self.post(self.show_status, connected)
+
+    def show_status(self, connected):
         if connected:
             self.status_dot.configure(text_color=LOL_GREEN)
             self.status_text.configure(text="CONNECTED", text_color=LOL_CYAN)
@@ -259,56 +315,35 @@ class RiftEchoGUI(ctk.CTk):
     def update_volume(self, val):
         percent = int(val * 100)
         self.vol_label_var.set(f"MASTER VOLUME: {percent}%")
-        # Try to update current player if it exists
-        try:
-            self.player.volume = float(val)
-        except: pass
+        self.audio.set_volume(val)
 
     def toggle_mute(self):
         self.is_muted = (self.mute_var.get() == "on")
+        self.audio.set_muted(self.is_muted)
         if self.is_muted:
-            try:
-                self.player.pause()
-            except: pass
-            self.audio_queue.queue.clear()
-            self.busy_until = 0
             self.mute_btn.configure(text_color=LOL_RED)
         else:
             self.mute_btn.configure(text_color=LOL_TEXT_DIM)
 
     def play_test_sound(self):
         try:
-            files = [f for f in os.listdir(self.current_pack_path) if f.endswith(".wav") or f.endswith(".mp3")]
+            pack = self.packs.pack(self.pack_var.get())
+            files = pack.clips if pack else []
             if files:
                 f = random.choice(files)
                 full_path = os.path.join(self.current_pack_path, f)
-                
-                # Create fresh player for test too
-                new_player = pyglet.media.Player()
-                source = pyglet.media.load(full_path, streaming=False)
-                
-                # Stop old if playing
-                try: self.player.pause() 
-                except: pass
-                
-                new_player.queue(source)
-                new_player.volume = self.vol_slider.get()
-                new_player.play()
-                
-                self.player = new_player
-                
-                # Set busy
-                duration = source.duration
-                if duration is None: duration = 1.0
-                self.busy_until = time.time() + duration + 0.1
-                
-                print(f"Testing: {f}")
+                self.audio.play_now(full_path)
+                log.info("Testing: %s", f)
         except Exception as e:
-            print(f"Test Audio Failed: {e}")
+            log.error("Test Audio Failed: %s", e)
 
     def on_close(self):
         if hasattr(self, 'backend'):
             self.backend.stop()
+        if hasattr(self, 'hub'):
+            self.hub.stop()
+        log.info("[UI] %s", self.loop_stats.summary())
+        self.audio.log_stats()
         self.destroy()
         try:
             cache_dir = "__pycache__"
@@ -317,6 +352,9 @@ class RiftEchoGUI(ctk.CTk):
         except: pass
 
 if __name__ == "__main__":
+    logs.setup(LOG_LEVEL, TRACE_FILE)
+    if METRICS_PORT:
+        metrics.serve(METRICS_PORT)
     app = RiftEchoGUI()
     app.protocol("WM_DELETE_WINDOW", app.on_close)
     app.mainloop()
\ No newline at end of file
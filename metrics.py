@@ -0,0 +1,186 @@
+"""
+Low-overhead metrics: counters, gauges and fixed-bucket histograms in one registry,
+rendered in the Prometheus text format and served on 127.0.0.1.
+
+    curl http://127.0.0.1:29998/metrics
+
+Recording a sample is a couple of attribute updates, no lock: each series has one
+writer thread in practice, and a lost increment under contention doesn't matter here.
+A gauge can be given a function instead, which is only called when scraped.
+Labelled series are created on first use; hot paths keep the child they got from
+labels() to skip the lookup.
+"""
+import bisect
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+log = logging.getLogger(__name__)
+
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 29998
+SECONDS_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, n=1):
+        self.value += n
+
+    def samples(self, name, labels):
+        yield name, labels, self.value
+
+
+class Gauge:
+    __slots__ = ("value", "fn")
+
+    def __init__(self):
+        self.value = 0.0
+        self.fn = None
+
+    def set(self, value):
+        self.value = value
+
+    def set_function(self, fn):
+        self.fn = fn
+
+    def samples(self, name, labels):
+        if self.fn is None:
+            yield name, labels, self.value
+            return
+        try:
+            yield name, labels, self.fn()
+        except Exception:
+            return
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds=SECONDS_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name, labels):
+        seen = 0
+        for bound, n in zip(self.bounds + (float("inf"),), self.counts):
+            seen += n
+            yield f"{name}_bucket", labels + (("le", "+Inf" if bound == float("inf") else repr(bound)),), seen
+        yield f"{name}_sum", labels, self.sum
+        yield f"{name}_count", labels, self.count
+
+
+class Family:
+    """A named metric and its series, one per combination of label values."""
+    def __init__(self, kind, name, help, labels, make):
+        self.kind = kind
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.make = make
+        self.children = {}
+        self.lock = threading.Lock()
+        # Unlabelled metrics are used directly: family.inc() / .observe() / .set()
+        self.default = None if labels else self.labels()
+
+    def labels(self, *values):
+        child = self.children.get(values)
+        if child is None:
+            with self.lock:
+                child = self.children.setdefault(values, self.make())
+        return child
+
+    def __getattr__(self, attr):
+        default = self.__dict__.get("default")
+        if default is None: raise AttributeError(attr)
+        return getattr(default, attr)
+
+    def render(self, lines):
+        lines.append(f"# HELP {self.name} {self.help}")
+        lines.append(f"# TYPE {self.name} {self.kind}")
+        for values, child in list(self.children.items()):
+            for name, labels, value in child.samples(self.name, tuple(zip(self.label_names, values))):
+                text = ",".join(f'{k}="{escape(str(v))}"' for k, v in labels)
+                lines.append(f"{name}{{{text}}} {value}" if text else f"{name} {value}")
+
+
+def escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Registry:
+    def __init__(self):
+        self.families = {}
+        self.lock = threading.Lock()
+
+    def _family(self, kind, name, help, labels, make):
+        with self.lock:
+            family = self.families.get(name)
+            if family is None:
+                family = self.families[name] = Family(kind, name, help, labels, make)
+            return family
+
+    def counter(self, name, help, labels=()):
+        return self._family("counter", name, help, labels, Counter)
+
+    def gauge(self, name, help, labels=()):
+        return self._family("gauge", name, help, labels, Gauge)
+
+    def histogram(self, name, help, labels=(), buckets=SECONDS_BUCKETS):
+        return self._family("histogram", name, help, labels, lambda: Histogram(buckets))
+
+    def render(self):
+        lines = []
+        with self.lock:
+            families = list(self.families.values())
+        for family in families:
+            family.render(lines)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port=METRICS_PORT, host=METRICS_HOST):
+    """Serves REGISTRY on a daemon thread. Returns the server, or None if the port is taken."""
+    try:
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+    except OSError as e:
+        log.warning("[Metrics] Could not listen on %s:%s: %s", host, port, e)
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    log.info("[Metrics] Serving on http://%s:%s/metrics", host, server.server_address[1])
+    return server
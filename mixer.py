@@ -0,0 +1,249 @@
+"""
+Software mixer: pre-decoded PCM clips in NumPy buffers, mixed into one output stream.
+
+Several voices can play at once. Whenever a more important voice is talking the others
+are ducked, and master volume / mute are applied as a gain ramp over the mixed block.
+make_stream_source() wraps the mixer as a single endless pyglet source, so one Player
+serves the whole session.
+"""
+import threading
+import wave
+
+import numpy as np
+
+MIX_RATE = 44100
+MIX_CHANNELS = 2
+MAX_VOICES = 3
+DUCK_LEVEL = 0.35   # gain of voices under a more important one
+RAMP_SECONDS = 0.05  # duck / volume changes fade over this long, no clicks
+
+# pyglet keeps ~0.9s queued per player by default; for a live mixer that is pure latency
+STREAM_BUFFER_SECONDS = 0.1
+
+
+class Clip:
+    """
+    Decoded clip: samples shaped (frames, channels) at MIX_RATE, float32 in [-1, 1] or
+    int16 straight out of a compiled pack with scale 1/32768.
+    """
+    __slots__ = ("samples", "duration", "scale")
+
+    def __init__(self, samples, scale=1.0):
+        self.samples = samples
+        self.duration = len(samples) / float(MIX_RATE)
+        self.scale = scale
+
+    @property
+    def nbytes(self):
+        return self.samples.nbytes
+
+
+def pcm_to_float(raw, sample_width, channels):
+    """Interleaved little-endian PCM bytes -> float32 array (frames, channels) in [-1, 1]."""
+    if sample_width == 1:
+        data = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif sample_width == 2:
+        data = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    elif sample_width == 3:
+        b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        ints = b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)
+        ints = np.where(ints & 0x800000, ints - 0x1000000, ints)
+        data = ints.astype(np.float32) / 8388608.0
+    elif sample_width == 4:
+        data = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648.0
+    else:
+        raise ValueError(f"Unsupported sample width: {sample_width}")
+    data = data.reshape(-1, channels)
+    if channels > 2:
+        data = data.mean(axis=1, keepdims=True)
+    return data
+
+
+def resample(data, rate):
+    """Linear resample to MIX_RATE, good enough for voice lines."""
+    if rate == MIX_RATE or len(data) == 0:
+        return data
+    frames = int(round(len(data) * MIX_RATE / float(rate)))
+    src = np.arange(len(data), dtype=np.float64)
+    dst = np.linspace(0, len(data) - 1, frames)
+    return np.stack([np.interp(dst, src, data[:, c]) for c in range(data.shape[1])], axis=1).astype(np.float32)
+
+
+def pcm16_clip(pcm, channels=MIX_CHANNELS):
+    """Zero-copy clip over interleaved int16 PCM (e.g. a slice of a memory-mapped pack)."""
+    return Clip(np.frombuffer(pcm, dtype="<i2").reshape(-1, channels), scale=1.0 / 32768.0)
+
+
+def decode_wav(path):
+    with wave.open(path, "rb") as w:
+        channels, width, rate = w.getnchannels(), w.getsampwidth(), w.getframerate()
+        raw = w.readframes(w.getnframes())
+    data = resample(pcm_to_float(raw, width, channels), rate)
+    return Clip(np.ascontiguousarray(data, dtype=np.float32))
+
+
+class Voice:
+    __slots__ = ("clip", "pos", "priority", "gain", "duck", "key")
+
+    def __init__(self, clip, priority, gain, key):
+        self.clip = clip
+        self.pos = 0
+        self.priority = priority
+        self.gain = gain
+        self.duck = 1.0
+        self.key = key
+
+
+def ramp(start, target, frames, step):
+    """Per-frame gain moving from start toward target by at most step per frame."""
+    if start == target:
+        return None, target
+    direction = 1.0 if target > start else -1.0
+    env = start + direction * step * np.arange(1, frames + 1, dtype=np.float32)
+    env = np.minimum(env, target) if direction > 0 else np.maximum(env, target)
+    return env, float(env[-1])
+
+
+class Mixer:
+    def __init__(self, rate=MIX_RATE, channels=MIX_CHANNELS, max_voices=MAX_VOICES, duck_level=DUCK_LEVEL):
+        self.rate = rate
+        self.channels = channels
+        self.max_voices = max_voices
+        self.duck_level = duck_level
+        self.step = 1.0 / (RAMP_SECONDS * rate)
+        self.lock = threading.Lock()
+        self.voices = []
+
+        self.master_volume = 1.0
+        self.muted = False
+        self.gain = 1.0  # master gain actually applied, ramps toward volume/mute
+
+        self.started = 0
+        self.finished = 0
+        self.frames_mixed = 0
+        self.silence = b""
+
+    # --- VOICES ---
+    def play(self, clip, priority=0, gain=1.0, key=None):
+        voice = Voice(clip, priority, gain, key)
+        with self.lock:
+            self.voices.append(voice)
+            self.started += 1
+        return voice
+
+    def stop_all(self):
+        with self.lock:
+            self.voices.clear()
+
+    def stop_lowest(self):
+        with self.lock:
+            if not self.voices: return None
+            voice = min(self.voices, key=lambda v: v.priority)
+            self.voices.remove(voice)
+            return voice
+
+    def active(self):
+        return len(self.voices)
+
+    def lowest_priority(self):
+        with self.lock:
+            return min((v.priority for v in self.voices), default=None)
+
+    def next_end(self):
+        """Seconds until the first voice finishes (a slot frees up), None if nothing is playing."""
+        with self.lock:
+            if not self.voices: return None
+            return min(len(v.clip.samples) - v.pos for v in self.voices) / float(self.rate)
+
+    def start_floor(self):
+        """
+        Priority a new clip needs to start right now, or None if every slot is taken.
+        Only something more important than everything playing may talk over it (ducking
+        the rest); equal or lower priority waits its turn, as before.
+        """
+        with self.lock:
+            if len(self.voices) >= self.max_voices: return None
+            if not self.voices: return 0
+            return max(v.priority for v in self.voices) + 1
+
+    # --- MIXING ---
+    def mix(self, frames):
+        """Mixes the next block, float32 (frames, channels)."""
+        out = np.zeros((frames, self.channels), dtype=np.float32)
+        with self.lock:
+            if self.voices:
+                top = max(v.priority for v in self.voices)
+                alive = []
+                for v in self.voices:
+                    samples = v.clip.samples
+                    n = min(frames, len(samples) - v.pos)
+                    target = 1.0 if v.priority >= top else self.duck_level
+                    env, v.duck = ramp(v.duck, target, n, self.step)
+                    chunk = samples[v.pos:v.pos + n]
+                    gain = np.float32(v.gain * v.clip.scale)
+                    if env is None:
+                        out[:n] += chunk * (v.duck * gain)
+                    else:
+                        out[:n] += chunk * (env[:, None] * gain)
+                    v.pos += n
+                    if v.pos < len(samples):
+                        alive.append(v)
+                    else:
+                        self.finished += 1
+                self.voices = alive
+
+        target = 0.0 if self.muted else self.master_volume
+        env, self.gain = ramp(self.gain, target, frames, self.step)
+        if env is None:
+            out *= self.gain
+        else:
+            out *= env[:, None]
+        np.clip(out, -1.0, 1.0, out=out)
+        self.frames_mixed += frames
+        return out
+
+    def advance(self, frames):
+        """Null output: moves the voices on by frames, skipping the mix when nothing plays."""
+        if self.voices:
+            self.mix(frames)
+        else:
+            self.frames_mixed += frames
+
+    def mix_bytes(self, frames):
+        """Mixes the next block as interleaved int16 bytes."""
+        if not self.voices and (self.gain == 0.0 or self.gain == (0.0 if self.muted else self.master_volume)):
+            # Nothing playing and no ramp in flight: reuse a silent block
+            size = frames * self.channels * 2
+            if len(self.silence) != size:
+                self.silence = bytes(size)
+            self.frames_mixed += frames
+            return self.silence
+        return (self.mix(frames) * 32767.0).astype("<i2").tobytes()
+
+    def stats(self):
+        return {"started": self.started, "finished": self.finished, "active": len(self.voices),
+                "seconds_mixed": self.frames_mixed / float(self.rate)}
+
+
+def make_stream_source(mixer):
+    """Endless pyglet source pulling blocks from the mixer (pyglet imported lazily)."""
+    from pyglet.media.codecs.base import AudioData, AudioFormat, StreamingSource
+    from pyglet.media.drivers.base import AbstractAudioPlayer
+
+    AbstractAudioPlayer.audio_buffer_length = STREAM_BUFFER_SECONDS
+
+    class MixerSource(StreamingSource):
+        def __init__(self):
+            self.audio_format = AudioFormat(channels=mixer.channels, sample_size=16, sample_rate=mixer.rate)
+            self.video_format = None
+            self._duration = None
+
+        def is_precise(self):
+            return True
+
+        def get_audio_data(self, num_bytes, compensation_time=0.0):
+            frames = max(int(num_bytes) // self.audio_format.bytes_per_frame, 1)
+            data = mixer.mix_bytes(frames)
+            return AudioData(data, len(data))
+
+    return MixerSource()
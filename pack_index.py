@@ -0,0 +1,121 @@
+"""
+In-memory index of the voice packs under assets/, so the pack list, the test button and
+"is this clip there?" never list or stat files while a match is running.
+
+A pack folder is listed once and again only when its mtime changes (a file added,
+removed or renamed), so refresh() costs one stat per pack. Only a change to the audio
+files themselves (names, sizes, mtimes) counts as the pack changing: the app writes
+loudness.json and voicepack.rxvp into the folder itself. Coverage of the events.json
+sounds is worked out at the same time, which lets gaps show up when a pack is selected
+instead of as "File Missing" in the middle of a match.
+"""
+import logging
+import os
+
+from voice_pack import event_index
+
+log = logging.getLogger(__name__)
+
+AUDIO_EXTENSIONS = (".wav", ".mp3")
+
+
+def audio_fingerprint(entries):
+    """What a pack's sound is made of: (name, size, mtime_ns) of each audio file among the DirEntries."""
+    stamps = []
+    for e in entries:
+        if e.name.lower().endswith(AUDIO_EXTENSIONS):
+            st = e.stat()
+            stamps.append((e.name, st.st_size, st.st_mtime_ns))
+    return frozenset(stamps)
+
+
+class Pack:
+    """One pack folder as of its last listing."""
+    __slots__ = ("name", "path", "mtime_ns", "fingerprint", "files", "clips", "present", "missing", "total")
+
+    def __init__(self, name, path, mtime_ns, fingerprint, files, sounds):
+        self.name = name
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.fingerprint = fingerprint  # (name, size, mtime_ns) of every audio file
+        self.files = frozenset(files)
+        # Every audio file, for the test button; present/missing are the events.json sounds
+        self.clips = sorted(f for f in files if f.lower().endswith(AUDIO_EXTENSIONS))
+        self.present = sorted({f for f in sounds.values() if f in self.files})
+        self.missing = sorted(sound for sound, f in sounds.items() if f not in self.files)
+        self.total = len(sounds)
+
+    def coverage(self):
+        """(sounds covered, sounds in events.json)."""
+        return self.total - len(self.missing), self.total
+
+
+class PackIndex:
+    def __init__(self, assets_dir, event_map):
+        self.assets_dir = assets_dir
+        self.sounds = event_index(event_map)  # "category/key" -> filename
+        self.packs = {}                       # name -> Pack (None until first listed)
+        self.mtime_ns = None
+        self.scans = 0
+
+    def refresh(self):
+        """Re-lists whatever changed on disk. True if the pack list or any pack's audio files did."""
+        try:
+            mtime_ns = os.stat(self.assets_dir).st_mtime_ns
+        except OSError:
+            changed = bool(self.packs)
+            self.packs, self.mtime_ns = {}, None
+            return changed
+
+        changed = False
+        if mtime_ns != self.mtime_ns:
+            self.mtime_ns = mtime_ns
+            with os.scandir(self.assets_dir) as entries:
+                names = {e.name for e in entries if e.is_dir()}
+            for name in set(self.packs) - names:
+                del self.packs[name]
+                changed = True
+            for name in names - set(self.packs):
+                self.packs[name] = None
+        for name in list(self.packs):
+            changed = self._refresh_pack(name) or changed
+        return changed
+
+    def _refresh_pack(self, name):
+        path = os.path.join(self.assets_dir, name)
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            self.packs.pop(name, None)
+            return True
+        pack = self.packs.get(name)
+        if pack is not None and pack.mtime_ns == mtime_ns: return False
+        with os.scandir(path) as entries:
+            files = [e for e in entries if e.is_file()]
+        self.scans += 1
+        fingerprint = audio_fingerprint(files)
+        names = [e.name for e in files]
+        if pack is not None and pack.fingerprint == fingerprint:
+            # Only our own sidecars (or other non-audio files) came or went: same pack
+            pack.mtime_ns, pack.files = mtime_ns, frozenset(names)
+            return False
+        self.packs[name] = Pack(name, path, mtime_ns, fingerprint, names, self.sounds)
+        return True
+
+    def names(self):
+        return sorted(self.packs)
+
+    def pack(self, name):
+        """The Pack called name, re-listed first if its folder changed; None if it doesn't exist."""
+        if name not in self.packs and not os.path.isdir(os.path.join(self.assets_dir, name)):
+            return None
+        self._refresh_pack(name)
+        return self.packs.get(name)
+
+
+def report_coverage(pack, limit=8):
+    """Console note for a pack that doesn't cover every events.json sound."""
+    covered, total = pack.coverage()
+    if not pack.missing: return
+    shown = ", ".join(pack.missing[:limit]) + (f" (+{len(pack.missing) - limit} more)" if len(pack.missing) > limit else "")
+    log.warning("[Pack] %s covers %d/%d sounds. Missing: %s", pack.name, covered, total, shown)
@@ -0,0 +1,490 @@
+"""
+Record and replay Live Client API sessions, so RiftBackend can be exercised without the game.
+
+    python replay.py record match.rec.gz                  # while in a game
+    python replay.py synth match.rec.gz --minutes 40      # synthetic match
+    python replay.py serve match.rec.gz --speed 10        # 1x, 10x ... or --speed max
+
+A recording is gzip'd JSON lines: one header, the static endpoints, the first full
+allgamedata document (without events) and then ticks of (wall time, game time, new events).
+The stand-in server rebuilds allgamedata / eventdata / gamestats from that at any point.
+"""
+import argparse
+import bisect
+import gzip
+import json
+import os
+import random
+import shutil
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+FORMAT_VERSION = 1
+STATIC_ENDPOINTS = ("activeplayer", "activeplayername", "playerlist")
+
+
+class Recording:
+    def __init__(self, static=None, base=None, ticks=None):
+        self.static = static or {}  # endpoint -> body
+        self.base = base or {}      # allgamedata without "events"
+        self.ticks = ticks or []    # [(t, game_time, [new events])]
+        self.reindex()
+
+    def reindex(self):
+        """Flattens the event stream; event_counts[i] = events known at tick i."""
+        self.events = []
+        self.event_ids = []
+        self.event_counts = []
+        self.tick_times = []
+        for t, _, new_events in self.ticks:
+            self.events.extend(new_events)
+            self.event_ids.extend(ev.get("EventID", 0) for ev in new_events)
+            self.event_counts.append(len(self.events))
+            self.tick_times.append(t)
+
+    @property
+    def duration(self):
+        return self.ticks[-1][0] if self.ticks else 0.0
+
+    def tick_at(self, t):
+        """Index of the last tick at or before wall offset t, or -1."""
+        return bisect.bisect_right(self.tick_times, t) - 1
+
+    def game_time_at(self, t, index):
+        """Game clock at wall offset t, advancing between ticks but never past the next one."""
+        tick_t, game_time, _ = self.ticks[index]
+        game_time += t - tick_t
+        if index + 1 < len(self.ticks):
+            game_time = min(game_time, self.ticks[index + 1][1])
+        return game_time
+
+    def save(self, path):
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            writer = RecordingWriter(f)
+            for endpoint, body in self.static.items():
+                writer.static(endpoint, body)
+            writer.base(self.base)
+            for t, game_time, new_events in self.ticks:
+                writer.tick(t, game_time, new_events)
+
+    @classmethod
+    def load(cls, path):
+        rec = cls()
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                item = json.loads(line)
+                kind = item.get("type")
+                if kind == "header":
+                    if item.get("version") != FORMAT_VERSION:
+                        raise ValueError(f"Unsupported recording version: {item.get('version')}")
+                elif kind == "static":
+                    rec.static[item["endpoint"]] = item["body"]
+                elif kind == "base":
+                    rec.base = item["body"]
+                elif kind == "tick":
+                    rec.ticks.append((item["t"], item["gt"], item.get("ev", [])))
+        rec.reindex()
+        return rec
+
+
+class RecordingWriter:
+    def __init__(self, f):
+        self.f = f
+        self.write({"type": "header", "version": FORMAT_VERSION, "recorded_at": time.time()})
+
+    def write(self, item):
+        self.f.write(json.dumps(item, separators=(",", ":")) + "\n")
+
+    def static(self, endpoint, body):
+        self.write({"type": "static", "endpoint": endpoint, "body": body})
+
+    def base(self, body):
+        self.write({"type": "base", "body": body})
+
+    def tick(self, t, game_time, new_events):
+        item = {"type": "tick", "t": round(t, 3), "gt": game_time}
+        if new_events:
+            item["ev"] = new_events
+        self.write(item)
+
+
+# --- RECORDER ---
+
+def record(path, base_url, interval=0.25, keepalive=1.0):
+    import requests
+    import urllib3
+    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+    session = requests.Session()
+
+    def get(endpoint):
+        try:
+            resp = session.get(f"{base_url}/{endpoint}", verify=False, timeout=(0.25, 1.0))
+            resp.raise_for_status()
+            return resp.json()
+        except Exception:
+            return None
+
+    print("[Recorder] Waiting for game...")
+    while True:
+        full = get("allgamedata")
+        if full and "events" in full: break
+        time.sleep(1)
+
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        writer = RecordingWriter(f)
+        for endpoint in STATIC_ENDPOINTS:
+            body = get(endpoint)
+            if body is not None:
+                writer.static(endpoint, body)
+
+        events = full.pop("events").get("Events", [])
+        writer.base(full)
+        start = time.monotonic()
+        writer.tick(0.0, full["gameData"]["gameTime"], events)
+        event_index = events[-1]["EventID"] + 1 if events else 0
+        last_written, failures, ticks = 0.0, 0, 1
+        print(f"[Recorder] Recording to {path} (Ctrl+C to stop)")
+
+        try:
+            while failures < 20:
+                time.sleep(interval)
+                stats = get("gamestats")
+                data = get(f"eventdata?eventID={event_index}")
+                if not stats or data is None:
+                    failures += 1
+                    continue
+                failures = 0
+                t = time.monotonic() - start
+                new_events = [ev for ev in data.get("Events", []) if ev.get("EventID", 0) >= event_index]
+                # Quiet ticks are only kept once a second, replay interpolates in between
+                if new_events or t - last_written >= keepalive:
+                    writer.tick(t, stats["gameTime"], new_events)
+                    last_written = t
+                    ticks += 1
+                if new_events:
+                    event_index = new_events[-1]["EventID"] + 1
+        except KeyboardInterrupt:
+            pass
+    print(f"[Recorder] Saved {ticks} ticks, {event_index} events")
+
+
+# --- SYNTHETIC MATCH ---
+
+def synthetic_match(minutes=40, seed=0, teamfight_start=900.0, teamfight_gap=(150.0, 260.0)):
+    """
+    A plausible match: laning kills, objectives on their real timers and teamfights.
+    Lower teamfight_start/teamfight_gap for burst-heavy load.
+    """
+    rng = random.Random(seed)
+    order = [f"Ally{i}" for i in range(5)]
+    chaos = [f"Enemy{i}" for i in range(5)]
+    me = order[0]
+    players = [fake_player(name, "ORDER", i, rng) for i, name in enumerate(order)]
+    players += [fake_player(name, "CHAOS", i, rng) for i, name in enumerate(chaos)]
+
+    timeline = []  # (game_time, event without EventID)
+
+    def add(game_time, name, **fields):
+        timeline.append((round(game_time, 3), dict(EventName=name, EventTime=round(game_time, 3), **fields)))
+
+    def side():
+        return (order, chaos) if rng.random() < 0.5 else (chaos, order)
+
+    end = minutes * 60.0
+    add(0.05, "GameStart")
+    add(65.0, "MinionsSpawning")
+
+    # Skirmishes and laning kills, denser as the game goes on
+    t = 150.0
+    while t < end - 30:
+        t += rng.expovariate(1 / (45.0 if t < 840 else 25.0))
+        winners, losers = side()
+        add(t, "ChampionKill", KillerName=rng.choice(winners), VictimName=rng.choice(losers), Assisters=[])
+        if rng.random() < 0.05:
+            add(t + 0.2, "ChampionKill", KillerName="Minion", VictimName=rng.choice(winners + losers), Assisters=[])
+
+    # Teamfights: 4-5 kills inside a few seconds, sometimes an ace
+    t = teamfight_start
+    while t < end - 60:
+        t += rng.uniform(*teamfight_gap)
+        winners, losers = side()
+        victims = rng.sample(losers, rng.randint(3, 5))
+        killer = rng.choice(winners)
+        for i, victim in enumerate(victims):
+            add(t + i * rng.uniform(0.5, 2.5), "ChampionKill", KillerName=killer if i % 2 == 0 else rng.choice(winners),
+                VictimName=victim, Assisters=[])
+        if len(victims) >= 3:
+            add(t + len(victims) * 1.5, "Multikill", KillerName=killer, KillStreak=min(len(victims) - 1, 5))
+        if len(victims) == 5:
+            add(t + 12, "Ace", Acer=killer, AcingTeam="ORDER" if winners is order else "CHAOS")
+
+    # Objectives
+    for i in range(3):
+        winners, _ = side()
+        add(330 + i * 20, "HordeKill", KillerName=rng.choice(winners), Stolen="False")
+    t = 300.0
+    while t < end:
+        t += rng.uniform(20, 120)
+        winners, _ = side()
+        add(t, "DragonKill", KillerName=rng.choice(winners), DragonType="Fire", Stolen="False")
+        t += 300.0
+    if end > 960:
+        add(960, "HeraldKill", KillerName=rng.choice(side()[0]), Stolen="False")
+    t = 1200.0
+    while t < end:
+        t += rng.uniform(30, 200)
+        add(t, "BaronKill", KillerName=rng.choice(side()[0]), Stolen="False")
+        t += 360.0
+    for i in range(int(min(end, 1800) // 90)):
+        winners, _ = side()
+        add(420 + i * 90 + rng.uniform(0, 60), "TurretKilled", KillerName=rng.choice(winners), TurretKilled=f"Turret_T{i % 2 + 1}_L_{i}_A")
+    if end > 1500:
+        add(end - 200, "InhibKilled", KillerName=rng.choice(order), InhibKilled="Barracks_T2_L1")
+        add(end - 150, "InhibKilled", KillerName=rng.choice(chaos), InhibKilled="Barracks_T1_C1")
+    add(end, "GameEnd", Result="Win" if rng.random() < 0.5 else "Lose")
+
+    timeline = [item for item in timeline if item[0] <= end]
+    timeline.sort(key=lambda item: item[0])
+    events = []
+    for event_id, (_, ev) in enumerate(timeline):
+        ev["EventID"] = event_id
+        events.append(ev)
+
+    # Ticks: one per distinct event time, plus a keep-alive every 10s so the clock keeps moving
+    ticks = [(0.0, 0.0, [])]
+    t, i = 0.0, 0
+    while t < end or i < len(events):
+        if i < len(events) and events[i]["EventTime"] <= t + 10.0:
+            t = events[i]["EventTime"]
+            batch = []
+            while i < len(events) and events[i]["EventTime"] == t:
+                batch.append(events[i])
+                i += 1
+            ticks.append((t, t, batch))
+        else:
+            t = round(t + 10.0, 3)
+            ticks.append((t, t, []))
+
+    active = {"summonerName": me, "riotIdGameName": me, "level": 18, "currentGold": 1234.5,
+              "championStats": {k: rng.uniform(0, 500) for k in ("abilityPower", "armor", "attackDamage", "attackSpeed",
+                                                                  "currentHealth", "maxHealth", "moveSpeed", "magicResist")},
+              "abilities": {k: {"abilityLevel": 5, "displayName": f"Ability{k}", "id": f"Champ{k}"} for k in "QWER"},
+              "fullRunes": {"generalRunes": [{"displayName": f"Rune{i}", "id": 8000 + i} for i in range(6)]}}
+    base = {"activePlayer": active, "allPlayers": players,
+            "gameData": {"gameMode": "CLASSIC", "gameTime": 0.0, "mapName": "Map11", "mapNumber": 11, "mapTerrain": "Default"}}
+    static = {"activeplayer": active, "activeplayername": me, "playerlist": players}
+    return Recording(static, base, ticks)
+
+
+def fake_player(name, team, index, rng):
+    return {
+        "championName": f"Champion{index}", "isBot": False, "isDead": False, "level": rng.randint(10, 18),
+        "position": ("TOP", "JUNGLE", "MIDDLE", "BOTTOM", "UTILITY")[index], "rawChampionName": f"game_character_displayname_Champ{index}",
+        "respawnTimer": 0.0, "skinID": 0, "summonerName": name, "riotIdGameName": name, "riotId": f"{name}#EUW", "team": team,
+        "items": [{"canUse": False, "consumable": False, "count": 1, "displayName": f"Item {j}", "itemID": 3000 + j,
+                   "price": 1000 + j, "rawDescription": f"GeneratedTip_Item_{3000 + j}_Description",
+                   "rawDisplayName": f"Item_{3000 + j}_Name", "slot": j} for j in range(6)],
+        "runes": {"keystone": {"displayName": "Conqueror", "id": 8010, "rawDescription": "perk_tooltip_Conqueror",
+                               "rawDisplayName": "perk_displayname_Conqueror"},
+                  "primaryRuneTree": {"displayName": "Precision", "id": 8000}, "secondaryRuneTree": {"displayName": "Resolve", "id": 8400}},
+        "scores": {"assists": rng.randint(0, 20), "creepScore": rng.randint(0, 300), "deaths": rng.randint(0, 10),
+                   "kills": rng.randint(0, 15), "wardScore": rng.uniform(0, 60)},
+        "summonerSpells": {"summonerSpellOne": {"displayName": "Flash"}, "summonerSpellTwo": {"displayName": "Ignite"}},
+    }
+
+
+# --- STAND-IN SERVER ---
+
+class ReplayClock:
+    """
+    Maps wall time to a position in the recording. speed=None is step mode: every
+    clock-bearing request (allgamedata / gamestats) advances exactly one tick.
+    """
+    def __init__(self, recording, speed=1.0):
+        self.rec = recording
+        self.speed = speed
+        self.lock = threading.Lock()
+        self.start = None
+        self.step_index = -1
+
+    def position(self, advance):
+        """(tick index, game time) or None before the first / after the last tick."""
+        with self.lock:
+            if self.speed is None:
+                if advance:
+                    self.step_index += 1
+                index = max(self.step_index, 0)
+                if index >= len(self.rec.ticks): return None
+                return index, self.rec.ticks[index][1]
+
+            if self.start is None:
+                self.start = time.monotonic()
+            t = (time.monotonic() - self.start) * self.speed
+            if t > self.rec.duration + 5.0: return None  # game over, API goes away
+            index = self.rec.tick_at(t)
+            if index < 0: return None
+            return index, self.rec.game_time_at(t, index)
+
+    @property
+    def finished(self):
+        if self.speed is None:
+            return self.step_index >= len(self.rec.ticks)
+        return self.start is not None and (time.monotonic() - self.start) * self.speed > self.rec.duration + 5.0
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the game client
+    disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        endpoint = url.path.rstrip("/").rsplit("/", 1)[-1]
+        rec = server.recording
+
+        if endpoint in rec.static:
+            return self.send_json(rec.static[endpoint])
+
+        position = server.clock.position(advance=endpoint in ("allgamedata", "gamestats"))
+        if position is None:
+            return self.send_json({"errorCode": "RESOURCE_NOT_FOUND", "httpStatus": 404}, status=404)
+        index, game_time = position
+        count = rec.event_counts[index]
+
+        if endpoint == "gamestats":
+            stats = dict(rec.base.get("gameData", {}))
+            stats["gameTime"] = game_time
+            return self.send_json(stats)
+        if endpoint == "eventdata":
+            first = int(parse_qs(url.query).get("eventID", ["0"])[0])
+            lo = bisect.bisect_left(rec.event_ids, first, 0, count)
+            return self.send_json({"Events": rec.events[lo:count]})
+        if endpoint == "allgamedata":
+            body = dict(rec.base)
+            body["gameData"] = dict(rec.base.get("gameData", {}), gameTime=game_time)
+            body["events"] = {"Events": rec.events[:count]}
+            return self.send_json(body)
+        return self.send_json({"errorCode": "RESOURCE_NOT_FOUND", "httpStatus": 404}, status=404)
+
+    def send_json(self, body, status=200):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ReplayServer:
+    """
+    Local stand-in for 127.0.0.1:2999/liveclientdata. Serves HTTPS when a
+    certificate is given (or openssl can make a throwaway one), plain HTTP otherwise;
+    pass server.base_url to RiftBackend(base_url=...).
+    """
+    def __init__(self, recording, speed=1.0, host="127.0.0.1", port=0, certfile=None, keyfile=None, tls=True):
+        self.recording = recording
+        self.clock = ReplayClock(recording, speed)
+        self.httpd = ThreadingHTTPServer((host, port), ReplayHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.recording = recording
+        self.httpd.clock = self.clock
+        self.tempdir = None
+
+        scheme = "http"
+        if tls:
+            if not certfile:
+                certfile, keyfile = self.make_self_signed()
+            if certfile:
+                ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+                ctx.load_cert_chain(certfile, keyfile)
+                self.httpd.socket = ctx.wrap_socket(self.httpd.socket, server_side=True)
+                scheme = "https"
+        self.base_url = f"{scheme}://{host}:{self.httpd.server_address[1]}/liveclientdata"
+        self.thread = None
+
+    def make_self_signed(self):
+        if not shutil.which("openssl"):
+            print("[Replay] openssl not found, serving plain HTTP")
+            return None, None
+        self.tempdir = tempfile.mkdtemp(prefix="riftecho-replay-")
+        cert, key = os.path.join(self.tempdir, "cert.pem"), os.path.join(self.tempdir, "key.pem")
+        try:
+            subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                            "-subj", "/CN=127.0.0.1", "-keyout", key, "-out", cert],
+                           check=True, capture_output=True)
+        except (OSError, subprocess.CalledProcessError):
+            print("[Replay] Could not create a certificate, serving plain HTTP")
+            return None, None
+        return cert, key
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self.base_url
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self.tempdir:
+            shutil.rmtree(self.tempdir, ignore_errors=True)
+
+
+def parse_speed(value):
+    return None if value == "max" else float(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record / replay Live Client API sessions")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_rec = sub.add_parser("record", help="record the running game")
+    p_rec.add_argument("path")
+    p_rec.add_argument("--url", default="https://127.0.0.1:2999/liveclientdata")
+    p_rec.add_argument("--interval", type=float, default=0.25)
+
+    p_syn = sub.add_parser("synth", help="write a synthetic match")
+    p_syn.add_argument("path")
+    p_syn.add_argument("--minutes", type=float, default=40)
+    p_syn.add_argument("--seed", type=int, default=0)
+
+    p_srv = sub.add_parser("serve", help="replay a recording as a local Live Client API")
+    p_srv.add_argument("path")
+    p_srv.add_argument("--speed", type=parse_speed, default=1.0, help="1, 10, 100 ... or 'max' (one tick per poll)")
+    p_srv.add_argument("--port", type=int, default=2999)
+    p_srv.add_argument("--cert")
+    p_srv.add_argument("--key")
+    p_srv.add_argument("--http", action="store_true", help="plain HTTP instead of HTTPS")
+
+    args = parser.parse_args(argv)
+    if args.command == "record":
+        record(args.path, args.url, args.interval)
+    elif args.command == "synth":
+        rec = synthetic_match(args.minutes, args.seed)
+        rec.save(args.path)
+        print(f"[Replay] Wrote {len(rec.events)} events, {len(rec.ticks)} ticks to {args.path}")
+    elif args.command == "serve":
+        rec = Recording.load(args.path)
+        server = ReplayServer(rec, args.speed, port=args.port, certfile=args.cert, keyfile=args.key, tls=not args.http)
+        print(f"[Replay] Serving {len(rec.events)} events at {server.base_url} (speed {args.speed or 'max'})")
+        server.start()
+        try:
+            while not server.clock.finished:
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            pass
+        server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
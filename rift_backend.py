@@ -1,88 +1,427 @@
+import heapq
+import logging
 import requests
 import urllib3
 import time
 import threading
+from requests.adapters import HTTPAdapter
+import live_json
+import logs
+import metrics
+from event_rules import load_rules
+from warmup import ClipPredictor
+
+log = logging.getLogger(__name__)
 
 # Disable SSL warnings
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
-class GameStateTracker:
+LIVE_CLIENT_URL = "https://127.0.0.1:2999/liveclientdata"
+
+# (connect, read) timeouts for the local Live Client API
+CONNECT_TIMEOUT = 0.25
+READ_TIMEOUT = 0.5
+
+# Poll eventdata + gamestats once connected instead of the whole allgamedata document
+INCREMENTAL_POLLING = True
+
+FETCH_SECONDS = metrics.histogram("rift_fetch_seconds", "Live Client API request time", ("endpoint",))
+FETCH_FAILURES = metrics.counter("rift_fetch_failures_total", "Live Client API requests that failed", ("endpoint", "reason"))
+PAYLOAD_BYTES = metrics.histogram("rift_payload_bytes", "Live Client API response size", ("endpoint",),
+                                  buckets=(1024, 4096, 16384, 65536, 262144, 1048576, 4194304))
+PARSE_SECONDS = metrics.histogram("rift_parse_seconds", "JSON parse time per response", ("endpoint",))
+EVENT_SECONDS = metrics.histogram("rift_event_seconds", "process_event time per EventName", ("event",))
+
+def failure_reason(e):
+    if isinstance(e, requests.exceptions.Timeout): return "timeout"
+    if isinstance(e, requests.exceptions.ConnectionError): return "connection"
+    if isinstance(e, requests.exceptions.HTTPError): return "http"
+    if isinstance(e, ValueError): return "json"
+    return "error"
+
+class LatencyHistogram:
+    """Fixed-bucket histogram of request latencies (milliseconds)."""
+    BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 250, 500, 1000)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS_MS) + 1)  # last bucket is overflow
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, ms):
+        for i, bound in enumerate(self.BUCKETS_MS):
+            if ms <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.total_ms += ms
+        if ms > self.max_ms: self.max_ms = ms
+
+    def percentile(self, p):
+        """Upper bucket bound containing the p-th percentile."""
+        if not self.count: return 0.0
+        target = self.count * p / 100.0
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= target:
+                return float(self.BUCKETS_MS[i]) if i < len(self.BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def summary(self):
+        if not self.count: return "no requests"
+        avg = self.total_ms / self.count
+        return (f"n={self.count} avg={avg:.1f}ms p50<={self.percentile(50):.0f}ms "
+                f"p95<={self.percentile(95):.0f}ms p99<={self.percentile(99):.0f}ms max={self.max_ms:.1f}ms")
+
+class PayloadStats:
+    """Bytes downloaded and JSON parse time, per endpoint and per poll tick."""
+    def __init__(self):
+        self.endpoints = {}  # name -> {"requests", "bytes", "parse_ms", "last_bytes", "last_parse_ms"}
+        self.ticks = 0
+        self.total_bytes = 0
+        self.total_parse_ms = 0.0
+
+    def record(self, endpoint, nbytes, parse_ms):
+        name = endpoint.split("?", 1)[0]
+        e = self.endpoints.setdefault(name, {"requests": 0, "bytes": 0, "parse_ms": 0.0, "last_bytes": 0, "last_parse_ms": 0.0})
+        e["requests"] += 1
+        e["bytes"] += nbytes
+        e["parse_ms"] += parse_ms
+        e["last_bytes"] = nbytes
+        e["last_parse_ms"] = parse_ms
+        self.total_bytes += nbytes
+        self.total_parse_ms += parse_ms
+
+    def summary(self, mode):
+        if not self.ticks: return "no polls"
+        line = (f"{mode}: {self.total_bytes / self.ticks / 1024:.1f} KB/tick, "
+                f"{self.total_parse_ms / self.ticks:.2f} ms parse/tick")
+        full = self.endpoints.get("allgamedata")
+        if full:
+            # Latest full document is what a non-incremental tick would have cost
+            line += f" | allgamedata: {full['last_bytes'] / 1024:.1f} KB, {full['last_parse_ms']:.2f} ms parse (last full fetch)"
+        return line
+
+class PollPolicy:
+    """Tunables for PollScheduler (seconds)."""
+    def __init__(self, base=0.25, burst=0.1, burst_window=3.0, quiet=0.4, quiet_after=30.0,
+                 backoff_min=0.25, backoff_max=5.0, backoff_factor=2.0, deadline_slack=0.02):
+        self.base = base
+        self.burst = burst                    # while events keep arriving
+        self.burst_window = burst_window      # how long after the last event we stay in burst
+        self.quiet = quiet                    # nothing happened for quiet_after seconds
+        self.quiet_after = quiet_after
+        self.backoff_min = backoff_min        # disconnected: min * factor^n, capped at max
+        self.backoff_max = backoff_max
+        self.backoff_factor = backoff_factor
+        self.deadline_slack = deadline_slack  # wake just past a timer so game_time >= trigger
+
+class PollScheduler:
+    """Picks the next poll interval from connection state, event activity and timer deadlines."""
+    def __init__(self, policy=None):
+        self.policy = policy or PollPolicy()
+        self.failures = 0
+        self.last_event_at = None
+        self.last_logged = None
+        self.game_time = None  # game clock of the last successful poll
+        self.paused = False    # it didn't move since the one before
+        self.wake = threading.Event()
+
+    def on_failure(self):
+        self.failures += 1
+
+    def on_success(self, new_events=0, game_time=None):
+        self.failures = 0
+        if new_events:
+            self.last_event_at = time.monotonic()
+        if game_time is not None:
+            self.paused = game_time == self.game_time
+            self.game_time = game_time
+
+    def reset(self):
+        self.failures = 0
+        self.last_event_at = None
+        self.game_time = None
+        self.paused = False
+
+    def next_interval(self, connected, game_time=None, next_deadline=None):
+        """Returns (seconds, reason)."""
+        p = self.policy
+        if not connected:
+            steps = min(max(self.failures - 1, 0), 32)
+            return min(p.backoff_max, p.backoff_min * (p.backoff_factor ** steps)), "backoff"
+
+        now = time.monotonic()
+        idle = None if self.last_event_at is None else now - self.last_event_at
+        if idle is not None and idle < p.burst_window:
+            interval, reason = p.burst, "burst"
+        elif idle is None or idle >= p.quiet_after:
+            interval, reason = p.quiet, "quiet"
+        else:
+            interval, reason = p.base, "base"
+
+        # Game clock runs at wall speed, so a timer due in N game seconds is N wall seconds away.
+        # Not while it stands still (game paused): the deadline would stay imminent for the whole pause.
+        if next_deadline is not None and game_time is not None:
+            until = max(next_deadline - game_time, 0.0) + p.deadline_slack
+            if until <= interval:
+                if self.paused: reason = "paused"
+                else: interval, reason = until, "deadline"
+        return interval, reason
+
+    def wait(self, connected, game_time=None, next_deadline=None):
+        interval, reason = self.next_interval(connected, game_time, next_deadline)
+        # Only log changes (and every deadline wake) to keep the console readable
+        logged = (reason, round(interval, 2))
+        if logged != self.last_logged or reason == "deadline":
+            log.debug("[Poll] Next in %.2fs (%s)", interval, reason)
+            self.last_logged = logged
+        self.wake.wait(interval)
+
+    def stop(self):
+        self.wake.set()
+
+class TimerWheel:
+    """
+    Min-heap of timers with one slot per key. Scheduling a slot again replaces
+    the pending timer; replaced/cancelled entries are dropped lazily when they
+    reach the top of the heap.
+    """
     def __init__(self):
+        self.heap = []    # [trigger_time, seq, slot, category, key, alive]
+        self.slots = {}   # slot -> heap entry
+        self.seq = 0
+
+    def __len__(self):
+        return len(self.slots)
+
+    def schedule(self, slot, trigger_time, category, key):
+        """Returns True if an existing timer in the slot was replaced."""
+        old = self.slots.get(slot)
+        if old is not None:
+            old[5] = False
+        entry = [trigger_time, self.seq, slot, category, key, True]
+        self.seq += 1
+        self.slots[slot] = entry
+        heapq.heappush(self.heap, entry)
+        # Keep dead entries from piling up if the same slots keep getting replaced
+        if len(self.heap) > 2 * len(self.slots) + 16:
+            self.heap = [e for e in self.heap if e[5]]
+            heapq.heapify(self.heap)
+        return old is not None
+
+    def cancel(self, slot):
+        entry = self.slots.pop(slot, None)
+        if entry is None: return False
+        entry[5] = False
+        return True
+
+    def _drop_dead(self):
+        while self.heap and not self.heap[0][5]:
+            heapq.heappop(self.heap)
+
+    def pop_due(self, now):
+        """(category, key) of every timer due at `now`, in trigger order."""
+        due = []
+        self._drop_dead()
+        while self.heap and self.heap[0][0] <= now:
+            entry = heapq.heappop(self.heap)
+            if entry[5]:
+                del self.slots[entry[2]]
+                due.append((entry[3], entry[4]))
+            self._drop_dead()
+        return due
+
+    def peek_time(self):
+        self._drop_dead()
+        return self.heap[0][0] if self.heap else None
+
+    def upcoming(self, n):
+        """The next n pending timers as (trigger_time, category, key)."""
+        live = heapq.nsmallest(n, self.slots.values())
+        return [(e[0], e[3], e[4]) for e in live]
+
+    def due_before(self, until):
+        """Every pending timer due at or before `until` as (trigger_time, category, key)."""
+        return [(e[0], e[3], e[4]) for e in self.slots.values() if e[0] <= until]
+
+class EventDeduper:
+    """
+    Constant-memory EventID de-duplication. EventIDs only go up, so we keep the
+    highest ID seen plus a bitmask of the `window` IDs below it for stragglers.
+    Anything older than the window counts as already processed.
+    """
+    def __init__(self, window=64):
+        self.window = window
+        self.full_mask = (1 << window) - 1
+        self.high = None
+        self.mask = 0  # bit i set -> (high - i) was seen
+
+    def is_duplicate(self, event_id):
+        """Records event_id and returns True if it was already processed."""
+        if self.high is None:
+            self.high, self.mask = event_id, 1
+            return False
+        offset = self.high - event_id
+        if offset < 0:
+            self.mask = ((self.mask << -offset) | 1) & self.full_mask if -offset < self.window else 1
+            self.high = event_id
+            return False
+        if offset >= self.window:
+            return True
+        bit = 1 << offset
+        if self.mask & bit:
+            return True
+        self.mask |= bit
+        return False
+
+class GameStateTracker:
+    def __init__(self, static_timers=()):
         self.streaks = {} 
-        self.timers = []   
-        self.processed_events = set()
+        self.timers = TimerWheel()
+        self.processed_events = EventDeduper()
+        self.tallies = {}  # rule name -> [events, ally, enemy] (e.g. grubs)
+        self.quiet = False  # no timer logging while rebuilding state from history
         
-        self.grubs_killed = 0
-        self.grubs_ally_score = 0
-        self.grubs_enemy_score = 0
-        
-        self.static_timers = [
-            {"time": 270, "category": "warnings", "key": "grubs_spawning", "announced": False},
-            {"time": 300, "category": "warnings", "key": "grubs_live", "announced": False},     
-            {"time": 270, "category": "warnings", "key": "dragon_spawning", "announced": False},
-            {"time": 300, "category": "warnings", "key": "dragon_live", "announced": False},     
-            {"time": 870, "category": "warnings", "key": "herald_spawning", "announced": False},
-            {"time": 900, "category": "warnings", "key": "herald_live", "announced": False},     
-            {"time": 1170, "category": "warnings", "key": "baron_spawning", "announced": False},
-            {"time": 1200, "category": "warnings", "key": "baron_live", "announced": False},     
-        ]
+        # Objective spawns that don't depend on events: (game_time, category, key)
+        for trigger_time, category, key in static_timers:
+            self.timers.schedule(key, trigger_time, category, key)
 
     def add_kill(self, killer):
         self.streaks[killer] = self.streaks.get(killer, 0) + 1
         return self.streaks[killer]
 
-    def reset_streak(self, victim):
-        was_shutdown = self.streaks.get(victim, 0) >= 3
+    def reset_streak(self, victim, shutdown_streak=3):
+        was_shutdown = self.streaks.get(victim, 0) >= shutdown_streak
         self.streaks[victim] = 0
         return was_shutdown
 
-    def schedule_timer(self, current_time, delay, category, key):
+    def schedule_timer(self, current_time, delay, category, key, slot=None):
+        # One pending timer per slot (defaults to the sound key), newer replaces older
         trigger_time = current_time + delay
-        self.timers.append({"trigger_time": trigger_time, "category": category, "key": key})
-        print(f"[Timer] Scheduled '{key}' for T+{delay}s")
+        replaced = self.timers.schedule(slot or key, trigger_time, category, key)
+        if not self.quiet:
+            log.debug("[Timer] %s '%s' for T+%ss", "Rescheduled" if replaced else "Scheduled", key, delay)
+
+    def cancel_timer(self, slot):
+        return self.timers.cancel(slot)
 
     def check_timers(self, current_game_time):
-        triggered = []
-        remaining = []
-        for t in self.timers:
-            if current_game_time >= t["trigger_time"]:
-                triggered.append((t["category"], t["key"]))
-            else:
-                remaining.append(t)
-        self.timers = remaining
-        
-        for st in self.static_timers:
-            if not st["announced"] and current_game_time >= st["time"]:
-                triggered.append((st["category"], st["key"]))
-                st["announced"] = True
-        return triggered
+        return self.timers.pop_due(current_game_time)
+
+    def next_deadline(self):
+        """Game time of the earliest pending timer, or None."""
+        return self.timers.peek_time()
+
+    def upcoming_timers(self, n=3):
+        return self.timers.upcoming(n)
+
+    def timers_before(self, until):
+        return self.timers.due_before(until)
 
 class RiftBackend(threading.Thread):
-    def __init__(self, app_interface, config_map):
+    def __init__(self, app_interface, config_map, incremental=INCREMENTAL_POLLING, poll_policy=None, base_url=LIVE_CLIENT_URL, rules=None):
         super().__init__()
         self.app = app_interface
         self.event_map = config_map
         self.running = True
         self.connected = False
-        self.base_url = "https://127.0.0.1:2999/liveclientdata"
+        self.base_url = base_url
         self.event_index = 0
         self.my_summoner = None
         self.my_team = None
         self.player_team_cache = {}
-        self.tracker = GameStateTracker()
+        self.roles = {}  # player name -> self/ally/enemy, see event_rules
+        self.rules = rules or load_rules()
+        self.dispatch = self.rules.dispatch
+        self.event_seconds = {}  # EventName -> its EVENT_SECONDS series
+        self.tracker = GameStateTracker(self.rules.static_timers)
         
         # New: Connection Resilience
         self.failure_count = 0
 
-    def fetch_api(self, endpoint):
+        # Keep-alive session, created lazily and reset on connection loss
+        self.session = None
+        self.latency = LatencyHistogram()
+
+        # Incremental polling: full document only on connect/resync
+        self.incremental = incremental
+        self.needs_resync = False
+        self.payload = PayloadStats()
+
+        # Adaptive poll interval (backoff / burst / timer deadlines)
+        self.scheduler = PollScheduler(poll_policy)
+        self.last_game_time = None
+
+        # Clips likely to be announced soon, for apps that warm them up (see warmup.py)
+        self.prepare_audio = getattr(app_interface, "prepare_audio", None)
+        self.predictor = ClipPredictor(self.rules) if self.prepare_audio else None
+        self.predicted = frozenset()
+
+    def create_session(self):
+        session = requests.Session()
+        # One host, one poller: a tiny pool is enough, and retries are handled by run()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=0)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def reset_session(self):
+        if self.session is not None:
+            try: self.session.close()
+            except: pass
+        self.session = None
+
+    def fetch_raw(self, endpoint):
+        """Response body of a Live Client endpoint, or None."""
+        if self.session is None:
+            self.session = self.create_session()
+        name = endpoint.split("?", 1)[0]
         try:
-            resp = requests.get(f"{self.base_url}/{endpoint}", verify=False, timeout=0.5)
+            start = time.perf_counter()
+            # verify per request: a session-level verify=False loses to REQUESTS_CA_BUNDLE
+            resp = self.session.get(f"{self.base_url}/{endpoint}", verify=False, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+            elapsed = time.perf_counter() - start
+            self.latency.record(elapsed * 1000.0)
+            FETCH_SECONDS.labels(name).observe(elapsed)
             resp.raise_for_status()
             self.failure_count = 0 # Reset failure count on success
-            return resp.json()
-        except:
+            body = resp.content
+            logs.trace("fetch", endpoint=name, ms=round(elapsed * 1000.0, 3), bytes=len(body))
+            return body
+        except requests.exceptions.ConnectionError as e:
+            # Pooled socket is dead (game closed/restarted), start fresh next time
+            FETCH_FAILURES.labels(name, failure_reason(e)).inc()
+            self.reset_session()
+            return None
+        except Exception as e:
+            FETCH_FAILURES.labels(name, failure_reason(e)).inc()
             return None
 
+    def parse(self, endpoint, body, parser=live_json.loads, *args):
+        """parser(body, *args), timed into the payload stats; None if the body isn't valid JSON."""
+        name = endpoint.split("?", 1)[0]
+        start = time.perf_counter()
+        try:
+            data = parser(body, *args)
+        except ValueError as e:
+            FETCH_FAILURES.labels(name, failure_reason(e)).inc()
+            return None
+        parse = time.perf_counter() - start
+        self.payload.record(endpoint, len(body), parse * 1000.0)
+        PAYLOAD_BYTES.labels(name).observe(len(body))
+        PARSE_SECONDS.labels(name).observe(parse)
+        logs.trace("parse", endpoint=name, ms=round(parse * 1000.0, 3))
+        return data
+
+    def fetch_api(self, endpoint):
+        body = self.fetch_raw(endpoint)
+        return None if body is None else self.parse(endpoint, body)
+
     def setup_identity(self):
         active = self.fetch_api("activeplayer")
         players = self.fetch_api("playerlist")
@@ -97,160 +436,174 @@ class RiftBackend(threading.Thread):
                     if r_name: self.player_team_cache[r_name] = team
                     if s_name == self.my_summoner or r_name == self.my_summoner:
                         self.my_team = team
-                print(f"[Backend] Identity: {self.my_summoner} ({self.my_team})")
+                self.update_roles()
+                log.info("[Backend] Identity: %s (%s)", self.my_summoner, self.my_team)
                 self.app.set_status(True)
                 return True
             except: pass
         return False
 
-    def handle_kill_logic(self, killer, victim):
-        sounds = []
-        killer_team = self.player_team_cache.get(killer)
-        victim_team = self.player_team_cache.get(victim)
-        is_execution = killer not in self.player_team_cache
-        
-        if is_execution:
-            if victim == self.my_summoner: sounds.append(("player", "executed"))
-            elif victim_team == self.my_team: sounds.append(("team", "executed_ally"))
-            else: sounds.append(("team", "executed_enemy"))
-            return sounds
-
-        current_streak = self.tracker.add_kill(killer)
-        was_shutdown = self.tracker.reset_streak(victim)
-
-        if victim == self.my_summoner: sounds.append(("player", "death"))
-        elif killer == self.my_summoner: sounds.append(("player", "kill"))
-        elif victim_team == self.my_team: sounds.append(("team", "ally_slain"))
-        elif killer_team == self.my_team: sounds.append(("team", "enemy_slain"))
-
-        spree_key = None
-        if current_streak == 3: spree_key = "rampage"
-        elif current_streak == 6: spree_key = "godlike"
-        elif current_streak >= 8: spree_key = "legendary"
-
-        if spree_key:
-            if killer == self.my_summoner: sounds.append(("player", spree_key))
-            elif killer_team == self.my_team: sounds.append(("team", f"ally_{spree_key}"))
-            else: sounds.append(("team", f"enemy_{spree_key}"))
-
-        if was_shutdown:
-            if killer == self.my_summoner: sounds.append(("player", "shutdown"))
-            elif killer_team == self.my_team: sounds.append(("team", "shutdown_enemy"))
-            else: sounds.append(("team", "shutdown_ally"))
-        return sounds
+    def update_roles(self):
+        """Resolves every known player to self/ally/enemy once, for the rule table."""
+        self.roles = {name: "ally" if team == self.my_team else "enemy" for name, team in self.player_team_cache.items()}
+        if self.my_summoner: self.roles[self.my_summoner] = "self"
 
     def process_event(self, event, game_time):
-        name = event["EventName"]
         event_id = event.get("EventID")
         if event_id is not None:
-            if event_id in self.tracker.processed_events: return
-            self.tracker.processed_events.add(event_id)
+            if self.tracker.processed_events.is_duplicate(event_id): return
+        self.dispatch_event(event, game_time)
 
-        category, key = None, None
-        
-        if name == "GameStart":
-            # Don't schedule if we are reconnecting late
-            if game_time < 30: 
-                category, key = "global", "GameStart"
-                self.tracker.schedule_timer(game_time, 15.0, "global", "minions_soon")
-        elif name == "MinionsSpawning":
-            category, key = "global", "MinionsSpawning"
-        elif name == "GameEnd":
-            result = event.get("Result")
-            key = "victory" if result == "Win" else "defeat"
-            category = "global"
-        elif name == "InhibKilled":
-            killer_team = self.player_team_cache.get(event["KillerName"])
-            if killer_team == self.my_team: category, key = "team", "inhib_destroy"
-            else: category, key = "team", "inhib_lost"
-            self.tracker.schedule_timer(game_time, 285.0, "warnings", "inhib_respawning")
-            self.tracker.schedule_timer(game_time, 300.0, "warnings", "inhib_live")
-        elif name == "DragonKill":
-            killer_team = self.player_team_cache.get(event["KillerName"])
-            if killer_team == self.my_team: category, key = "team", "dragon_taken"
-            else: category, key = "team", "dragon_lost"
-            self.tracker.schedule_timer(game_time, 270.0, "warnings", "dragon_spawning")
-            self.tracker.schedule_timer(game_time, 300.0, "warnings", "dragon_live")
-        elif name == "BaronKill":
-            killer_team = self.player_team_cache.get(event["KillerName"])
-            if killer_team == self.my_team: category, key = "team", "baron_taken"
-            else: category, key = "team", "baron_lost"
-            self.tracker.schedule_timer(game_time, 330.0, "warnings", "baron_spawning")
-            self.tracker.schedule_timer(game_time, 360.0, "warnings", "baron_live")
-        elif name == "HordeKill":
-            killer_team = self.player_team_cache.get(event["KillerName"])
-            if killer_team == self.my_team: self.tracker.grubs_ally_score += 1
-            else: self.tracker.grubs_enemy_score += 1
-            self.tracker.grubs_killed += 1
-            if self.tracker.grubs_killed >= 3:
-                if self.tracker.grubs_ally_score > self.tracker.grubs_enemy_score: category, key = "team", "grubs_taken"
-                else: category, key = "team", "grubs_lost"
-                self.tracker.grubs_killed = 0
-                self.tracker.grubs_ally_score = 0
-                self.tracker.grubs_enemy_score = 0
-            else: return 
-        elif name == "HeraldKill":
-            if self.player_team_cache.get(event["KillerName"]) == self.my_team: category, key = "team", "herald_taken"
-            else: category, key = "team", "herald_lost"
-        elif name == "TurretKilled":
-            killer = event["KillerName"]
-            killer_team = self.player_team_cache.get(killer)
-            if killer == self.my_summoner or killer_team == self.my_team: category, key = "team", "turret_destroy"
-            else: category, key = "team", "turret_lost"
-        elif name == "Multikill":
-            if event["KillerName"] == self.my_summoner: category, key = "player", f"multikill_{event['KillStreak']}"
-        elif name == "Ace":
-            acing_team = event.get("AcingTeam")
-            key = "ace_enemy" if acing_team == self.my_team else "ace_us"
-            category = "global"
-        elif name == "ChampionKill":
-            kill_sounds = self.handle_kill_logic(event["KillerName"], event["VictimName"])
-            for cat, k in kill_sounds: self.app.trigger_audio(cat, k)
-            return
-        if category and key:
+    def process_events(self, events, game_time):
+        """process_event for each new event of a tick, timed per EventName and traced."""
+        clock, timers, tracing = time.perf_counter, self.event_seconds, logs.tracing
+        for event in events:
+            start = clock()
+            self.process_event(event, game_time)
+            elapsed = clock() - start
+            name = event.get("EventName", "")
+            timer = timers.get(name)
+            if timer is None:
+                timer = timers[name] = EVENT_SECONDS.labels(name)
+            timer.observe(elapsed)
+            if tracing:
+                logs.trace("event", name=name, id=event.get("EventID"), game_time=game_time, us=round(elapsed * 1e6, 1))
+
+    def dispatch_event(self, event, game_time):
+        fire = self.dispatch.get(event["EventName"])
+        if fire is None: return
+        for category, key in fire(self, event, game_time):
             self.app.trigger_audio(category, key)
 
+    def rebuild_state(self, events, game_time):
+        """
+        Late connect: runs the match so far through the rules into a fresh tracker
+        without announcing anything, so streaks, tallies and respawn timers carry on
+        from where the game is. Timers that would already have fired are dropped.
+        """
+        tracker = GameStateTracker(self.rules.static_timers)
+        tracker.quiet = True
+        self.tracker = tracker
+        dispatch, processed = self.dispatch, tracker.processed_events
+        for event in events:
+            event_id = event.get("EventID")
+            if event_id is not None and processed.is_duplicate(event_id): continue
+            fire = dispatch.get(event.get("EventName"))
+            if fire is None: continue
+            try:
+                # Sounds are discarded; only the state the rules keep on the tracker matters
+                fire(self, event, event.get("EventTime", game_time))
+            except (KeyError, TypeError, ValueError):
+                pass
+        tracker.check_timers(game_time)
+        tracker.quiet = False
+        return tracker
+
+    def poll(self):
+        """One tick of game data: (game_time, new_events, next_index) or None on failure."""
+        if self.incremental and self.connected and not self.needs_resync:
+            return self.poll_incremental()
+        return self.poll_full()
+
+    def poll_full(self):
+        body = self.fetch_raw("allgamedata")
+        if body is None: return None
+        # Only the clock and the events past event_index are decoded (see live_json)
+        snapshot = self.parse("allgamedata", body, live_json.parse_allgamedata, self.event_index)
+        if snapshot is None: return None
+        self.needs_resync = False
+        return snapshot
+
+    def poll_incremental(self):
+        stats = self.fetch_api("gamestats")
+        if not stats or "gameTime" not in stats: return None
+        data = self.fetch_api(f"eventdata?eventID={self.event_index}")
+        if not data:
+            # Lost track of the event stream, next tick refetches the full document
+            self.needs_resync = True
+            return None
+        events = [ev for ev in data.get("Events", []) if ev.get("EventID", self.event_index) >= self.event_index]
+        next_index = events[-1].get("EventID", self.event_index) + 1 if events else self.event_index
+        return stats["gameTime"], events, next_index
+
+    def log_stats(self):
+        mode = "incremental" if self.incremental else "allgamedata"
+        log.info("[Backend] Request latency: %s", self.latency.summary())
+        log.info("[Backend] Payload %s", self.payload.summary(mode))
+
     def run(self):
         while self.running:
-            all_data = self.fetch_api("allgamedata")
+            snapshot = self.poll()
             
             # --- CONNECTION LOSS LOGIC ---
-            if not all_data:
+            if not snapshot:
                 self.failure_count += 1
+                self.scheduler.on_failure()
                 if self.connected and self.failure_count > 5:
-                    print("[Backend] Connection lost.")
+                    log.info("[Backend] Connection lost.")
+                    self.log_stats()
                     self.app.set_status(False)
                     self.connected = False
                     self.event_index = 0
-                    self.tracker = GameStateTracker() # Reset state
-                time.sleep(0.25)
+                    self.tracker = GameStateTracker(self.rules.static_timers) # Reset state
+                    self.reset_session()
+                    self.scheduler.reset()
+                    self.last_game_time = None
+                    self.predict(None)
+                self.wait()
                 continue
             
+            game_time, new_events, next_index = snapshot
+            self.payload.ticks += 1
+            self.scheduler.on_success(len(new_events), game_time)
+
             # --- CONNECT LOGIC ---
             if not self.connected:
                 if self.setup_identity(): 
                     self.connected = True
-                    # FIX: Fast-forward event index so we don't replay the whole game
-                    events = all_data.get("events", {}).get("Events", [])
-                    if events:
-                        self.event_index = len(events)
-                        print(f"[Backend] Synced {self.event_index} existing events. Listening for new...")
+                    # Don't announce the whole game again, but pick up its state silently
+                    if new_events:
+                        start = time.perf_counter()
+                        self.rebuild_state(new_events, game_time)
+                        log.info("[Backend] Rebuilt state from %d existing events in %.1f ms. Listening for new...",
+                                 len(new_events), (time.perf_counter() - start) * 1000.0)
+                    new_events = []
+                    if next_index:
+                        self.event_index = next_index
                 else:
-                    time.sleep(1)
+                    self.scheduler.on_failure()
+                    self.wait()
                     continue
 
             try:
-                game_time = all_data["gameData"]["gameTime"]
-                for cat, key in self.tracker.check_timers(game_time):
-                    self.app.trigger_audio(cat, key)
+                self.last_game_time = game_time
+                self.fire_timers(game_time)
                 
-                events = all_data["events"]["Events"]
-                if len(events) > self.event_index:
-                    for ev in events[self.event_index:]:
-                        self.process_event(ev, game_time)
-                    self.event_index = len(events)
+                self.process_events(new_events, game_time)
+                self.event_index = max(self.event_index, next_index)
+                self.predict(game_time)
             except: pass 
-            time.sleep(0.25)
+            self.wait()
+
+    def predict(self, game_time):
+        """Tells the app which clips to have ready whenever that changes; None releases them all."""
+        if self.predictor is None: return
+        sounds = self.predictor.predict(self, game_time) if game_time is not None else frozenset()
+        if sounds != self.predicted:
+            self.predicted = sounds
+            self.prepare_audio(sorted(sounds))
+
+    def fire_timers(self, game_time):
+        for cat, key in self.tracker.check_timers(game_time):
+            self.app.trigger_audio(cat, key)
+
+    def wait(self):
+        if not self.running: return
+        deadline = self.tracker.next_deadline() if self.connected else None
+        self.scheduler.wait(self.connected, self.last_game_time, deadline)
 
     def stop(self):
-        self.running = False
\ No newline at end of file
+        self.running = False
+        self.scheduler.stop()
+        self.log_stats()
+        self.reset_session()
\ No newline at end of file
@@ -0,0 +1,258 @@
+"""
+Compiled voice packs: every clip of a pack folder normalized to one PCM format and
+stored in a single container next to the WAVs, read back through mmap.
+
+    python voice_pack.py compile ["The Ancient Archmage" ...]   # all packs by default
+    python voice_pack.py verify  [pack ...]
+    python voice_pack.py info    [pack ...]
+
+Layout (little-endian):
+
+    header   MAGIC, version, JSON length, data offset        (struct HEADER)
+    JSON     format, index "category/key" -> file, clips file -> [offset, bytes, crc32],
+             sources file -> [size, mtime_ns] of the WAVs it was built from
+    data     int16 interleaved PCM at MIX_RATE / MIX_CHANNELS, each clip DATA_ALIGN aligned
+
+Reading needs neither numpy nor pyglet: clips come back as memoryview slices of the
+map, so switching packs is a stat() per source file plus one mmap.
+"""
+import argparse
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import time
+import zlib
+
+log = logging.getLogger(__name__)
+
+COMPILED_NAME = "voicepack.rxvp"
+MAGIC = b"RXVP"
+VERSION = 1
+HEADER = struct.Struct("<4sHII")  # magic, version, JSON length, data offset
+DATA_ALIGN = 64
+SAMPLE_WIDTH = 2
+
+
+def compiled_path(pack_dir):
+    return os.path.join(pack_dir, COMPILED_NAME)
+
+
+def event_index(event_map):
+    """"category/key" -> filename for every sound in the event map (skips "scheduling")."""
+    index = {}
+    for category, sounds in event_map.items():
+        if not isinstance(sounds, dict): continue
+        for key, filename in sounds.items():
+            if isinstance(filename, str):
+                index[f"{category}/{key}"] = filename
+    return index
+
+
+def source_stamp(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+class VoicePackError(Exception):
+    pass
+
+
+class VoicePack:
+    """
+    Read-only view of a compiled pack. Slices stay valid after the pack is dropped or
+    closed: the file stays mapped until the last one is gone.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if len(self.map) < HEADER.size:
+                raise VoicePackError(f"{path}: truncated header")
+            magic, version, json_len, data_offset = HEADER.unpack_from(self.map, 0)
+            if magic != MAGIC:
+                raise VoicePackError(f"{path}: not a compiled voice pack")
+            if version != VERSION:
+                raise VoicePackError(f"{path}: format version {version}, expected {VERSION}")
+            header = json.loads(bytes(self.map[HEADER.size:HEADER.size + json_len]))
+            self.rate = header["rate"]
+            self.channels = header["channels"]
+            self.sample_width = header["sample_width"]
+            self.index = header["index"]
+            self.clips = header["clips"]
+            self.sources = header["sources"]
+            self.data_offset = data_offset
+            last = max((offset + size for offset, size, _ in self.clips.values()), default=0)
+            if data_offset + last > len(self.map):
+                raise VoicePackError(f"{path}: truncated data ({len(self.map)} bytes, needs {data_offset + last})")
+        except BaseException:
+            # Nothing has a slice yet; an open map would also block replacing the file on Windows
+            self.map.close()
+            raise
+        self.view = memoryview(self.map)
+
+    def close(self):
+        """Unmaps the file, or leaves that to the last clip slice still playing from it."""
+        self.view.release()
+        try:
+            self.map.close()
+        except BufferError:
+            pass
+
+    @property
+    def bytes_per_second(self):
+        return self.rate * self.channels * self.sample_width
+
+    def file_pcm(self, filename):
+        """PCM of one source file as a zero-copy memoryview, or None if it isn't in the pack."""
+        clip = self.clips.get(filename)
+        if clip is None: return None
+        start = self.data_offset + clip[0]
+        return self.view[start:start + clip[1]]
+
+    def warm(self, filename, page=4096):
+        """Reads one byte per page of a clip so it is in memory before it plays. False if it isn't in the pack."""
+        pcm = self.file_pcm(filename)
+        if pcm is None: return False
+        sum(pcm[i] for i in range(0, len(pcm), page))
+        return True
+
+    def pcm(self, category, key):
+        filename = self.index.get(f"{category}/{key}")
+        return self.file_pcm(filename) if filename else None
+
+    def is_current(self, pack_dir, event_map):
+        """True if the pack still matches the WAVs on disk and the events.json mapping."""
+        if self.index != {name: f for name, f in event_index(event_map).items() if f in self.clips}:
+            return False
+        for filename, stamp in self.sources.items():
+            try:
+                if source_stamp(os.path.join(pack_dir, filename)) != stamp: return False
+            except OSError:
+                return False
+        # A clip that was missing at compile time may have been added since
+        for filename in set(event_index(event_map).values()) - set(self.clips):
+            if os.path.exists(os.path.join(pack_dir, filename)): return False
+        return True
+
+    def verify(self):
+        """Names of clips whose data no longer matches the stored checksum."""
+        return [f for f, (_, _, crc) in self.clips.items() if zlib.crc32(self.file_pcm(f)) != crc]
+
+
+def open_current(pack_dir, event_map):
+    """The compiled pack for pack_dir if it exists and is up to date, else None."""
+    path = compiled_path(pack_dir)
+    if not os.path.exists(path): return None
+    try:
+        pack = VoicePack(path)
+    except (OSError, ValueError, KeyError, VoicePackError) as e:
+        log.warning("[Pack] Ignoring %s: %s", COMPILED_NAME, e)
+        return None
+    if pack.is_current(pack_dir, event_map): return pack
+    pack.close()
+    return None
+
+
+def to_pcm16(samples, channels):
+    """float32 (frames, n) in [-1, 1] -> interleaved int16 bytes with exactly `channels` channels."""
+    import numpy as np
+    if samples.shape[1] != channels:
+        samples = np.repeat(samples.mean(axis=1, keepdims=True), channels, axis=1)
+    return (np.clip(samples, -1.0, 1.0) * 32767.0).round().astype("<i2").tobytes()
+
+
+def compile_pack(pack_dir, event_map, out_path=None):
+    """Decodes every clip the event map references and writes the container. Returns (path, missing)."""
+    from mixer import MIX_CHANNELS, MIX_RATE, decode_wav
+
+    out_path = out_path or compiled_path(pack_dir)
+    index = event_index(event_map)
+    clips, sources, chunks, missing = {}, {}, [], []
+    offset = 0
+    for filename in sorted(set(index.values())):
+        path = os.path.join(pack_dir, filename)
+        if not os.path.exists(path):
+            missing.append(filename)
+            continue
+        try:
+            pcm = to_pcm16(decode_wav(path).samples, MIX_CHANNELS)
+        except Exception as e:
+            log.warning("[Pack] Failed to decode %s: %s", filename, e)
+            missing.append(filename)
+            continue
+        sources[filename] = source_stamp(path)
+        clips[filename] = [offset, len(pcm), zlib.crc32(pcm)]
+        pad = -len(pcm) % DATA_ALIGN
+        chunks.append(pcm + bytes(pad))
+        offset += len(pcm) + pad
+
+    header = json.dumps({
+        "rate": MIX_RATE, "channels": MIX_CHANNELS, "sample_width": SAMPLE_WIDTH,
+        "index": {name: f for name, f in index.items() if f in clips},
+        "clips": clips, "sources": sources,
+    }, separators=(",", ":")).encode()
+    data_offset = HEADER.size + len(header)
+    data_offset += -data_offset % DATA_ALIGN
+
+    # Written next to the target and swapped in, a half-written pack is never visible
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(header), data_offset))
+        f.write(header)
+        f.write(bytes(data_offset - HEADER.size - len(header)))
+        for chunk in chunks:
+            f.write(chunk)
+    os.replace(tmp_path, out_path)
+    return out_path, missing
+
+
+def main(argv=None):
+    from audio_engine import ASSETS_DIR, load_event_map
+
+    parser = argparse.ArgumentParser(description="Compile voice pack folders into one memory-mapped file")
+    parser.add_argument("command", choices=("compile", "verify", "info"))
+    parser.add_argument("packs", nargs="*", help="pack folders under assets/ (default: all)")
+    args = parser.parse_args(argv)
+
+    event_map = load_event_map()
+    packs = args.packs or sorted(d for d in os.listdir(ASSETS_DIR) if os.path.isdir(os.path.join(ASSETS_DIR, d)))
+    status = 0
+    for name in packs:
+        pack_dir = os.path.join(ASSETS_DIR, name)
+        if args.command == "compile":
+            start = time.perf_counter()
+            path, missing = compile_pack(pack_dir, event_map)
+            pack = VoicePack(path)
+            print(f"[Pack] {name}: {len(pack.clips)} clips, {os.path.getsize(path) / 1048576:.1f} MB "
+                  f"in {time.perf_counter() - start:.2f}s")
+            for filename in missing:
+                print(f"[Pack]   Missing: {filename}")
+            continue
+
+        try:
+            pack = VoicePack(compiled_path(pack_dir))
+        except (OSError, VoicePackError) as e:
+            print(f"[Pack] {name}: {e}")
+            status = 1
+            continue
+        if args.command == "verify":
+            corrupt = pack.verify()
+            current = pack.is_current(pack_dir, event_map)
+            print(f"[Pack] {name}: {'OK' if not corrupt else f'{len(corrupt)} corrupt clips'}"
+                  f"{'' if current else ' (stale, recompile)'}")
+            for filename in corrupt:
+                print(f"[Pack]   Corrupt: {filename}")
+            status = status or int(bool(corrupt))
+        else:
+            seconds = sum(size for _, size, _ in pack.clips.values()) / float(pack.bytes_per_second)
+            print(f"[Pack] {name}: {len(pack.clips)} clips / {len(pack.index)} keys, {seconds:.1f}s audio, "
+                  f"{pack.rate} Hz x{pack.channels}, {len(pack.map) / 1048576:.1f} MB")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,27 @@
+"""
+Predictive clip warm-up: which announcements are likely in the next few seconds, worked
+out from the backend's state, so the audio engine can have their clips ready before
+they fire instead of opening and decoding them at that moment.
+
+    timers   everything on the tracker's timer wheel due within WARM_AHEAD game seconds
+             (baron_spawning, dragon_live, inhib_live ...)
+    kills    what the next kill by or of a player on a streak would announce: the next
+             spree (a streak of 2 is one kill from rampage) and the shutdown for ending it
+
+The backend passes the set to app.prepare_audio() whenever it changes. The engine warms
+the clips that joined it and releases the ones that left (fired, or no longer likely).
+"""
+WARM_AHEAD = 20.0  # game seconds
+
+
+class ClipPredictor:
+    def __init__(self, rules, ahead=WARM_AHEAD):
+        self.ahead = ahead
+        self.kill_rules = [rule for rule in rules.rules.values() if hasattr(rule, "next_sounds")]
+
+    def predict(self, ctx, game_time):
+        """frozenset of (category, key) likely to be announced soon; ctx is the RiftBackend."""
+        sounds = {(category, key) for _, category, key in ctx.tracker.timers_before(game_time + self.ahead)}
+        for rule in self.kill_rules:
+            sounds.update(rule.next_sounds(ctx))
+        return frozenset(sounds)